@@ -0,0 +1,152 @@
+"""
+    File name: bench_chords.py
+    Author: Emek Kırarslan (bozbulanik)
+    License: GNU-GPLv3
+
+    Per keypress latency of the old list based log_key against the ChordEncoder.
+    Run from the repository root: python benchmarks/bench_chords.py
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if not os.environ.get("DISPLAY"):
+    os.environ.setdefault("PYNPUT_BACKEND", "dummy")
+
+from chords import ChordEncoder, SYMBOLS, LOCKED_IN_GARBAGE_COLLECTION_LIMIT, key_is_a_symbol, key_to_str
+
+EVENTS = 200_000
+ROUNDS = 5
+
+
+class SpecialKey:
+    """Stands in for a pynput Key member, the dummy backend gives them all the same value."""
+    def __init__(self, name):
+        self.name = name
+
+    def __str__(self):
+        return f"Key.{self.name}"
+
+
+class CharKey:
+    """Stands in for a pynput KeyCode."""
+    def __init__(self, char=None, vk=None):
+        self.char = char
+        self.vk = vk
+
+    def __str__(self):
+        return f"<{self.vk}>" if self.char is None else repr(self.char)
+
+
+SPECIAL = {name: SpecialKey(name) for name in (
+    "alt", "alt_r", "alt_l", "cmd", "cmd_r", "cmd_l", "ctrl", "ctrl_r", "ctrl_l",
+    "shift", "shift_r", "shift_l", "space", "enter", "backspace", "tab", "left", "right")}
+MODIFIERS = [SPECIAL[name] for name in (
+    "alt", "alt_r", "alt_l", "cmd", "cmd_r", "cmd_l", "ctrl", "ctrl_r", "ctrl_l", "shift", "shift_r", "shift_l")]
+ALTGR_KEY = CharKey(vk=65027)
+CHARS = {c: CharKey(c) for c in "abcdefghijklmnopqrstuvwxyzçğıöşüABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789.,;:!?'\"()-+*/%=<>"}
+
+
+class LegacyKeys:
+    """The list based key handling Tracker used before the ChordEncoder."""
+    def __init__(self):
+        self.keys_currently_down = []
+
+    def log_key(self, key):
+        modifiers_down = [k for k in self.keys_currently_down if k in MODIFIERS]
+
+        if SPECIAL["shift"] in modifiers_down and key_is_a_symbol(key):
+            modifiers_down.clear()
+
+        keys_down_str = [str(k) for k in self.keys_currently_down]
+        if "<65027>" in keys_down_str:
+            try:
+                char = SYMBOLS.get(key.char, "")
+                if char:
+                    log_entry = str(char)
+                else:
+                    log_entry = ' + '.join(map(key_to_str, self.keys_currently_down)).lower()
+            except AttributeError:
+                if modifiers_down:
+                    log_entry = ' + '.join(map(key_to_str, self.keys_currently_down)).lower()
+                else:
+                    log_entry = "<altgr> + " + f'<{str(key)[4:]}>'
+        else:
+            log_entry = ' + '.join(map(key_to_str, modifiers_down + [key]))
+        return log_entry
+
+    def press(self, key):
+        if key in self.keys_currently_down:
+            return None
+        self.keys_currently_down.append(key)
+        if key not in MODIFIERS and str(key) != "<65027>":
+            return self.log_key(key)
+        return None
+
+    def release(self, key):
+        try:
+            self.keys_currently_down.remove(key)
+        except ValueError:
+            if len(self.keys_currently_down) >= LOCKED_IN_GARBAGE_COLLECTION_LIMIT and not any(k in self.keys_currently_down for k in MODIFIERS):
+                self.keys_currently_down.clear()
+
+
+def chord_events(rng, count):
+    """(pressed, key) events of mostly plain typing with shortcuts, shifted and AltGr chords."""
+    letters = [CHARS[c] for c in "etaoinshrdlucmfwypvbgkqjxz"]
+    symbols = list(CHARS.values())
+    events = []
+    while len(events) < count:
+        roll = rng.random()
+        if roll < 0.80:
+            held = []
+            key = rng.choice(letters if rng.random() < 0.9 else [SPECIAL["space"], SPECIAL["backspace"]])
+        elif roll < 0.90:
+            held = [SPECIAL["shift"]]
+            key = rng.choice(symbols)
+        elif roll < 0.97:
+            held = rng.choice([[SPECIAL["ctrl"]], [SPECIAL["ctrl_l"], SPECIAL["shift_l"]], [SPECIAL["alt"]], [SPECIAL["cmd"]]])
+            key = rng.choice(letters + [SPECIAL["tab"], SPECIAL["left"], SPECIAL["right"]])
+        else:
+            held = [ALTGR_KEY] + ([SPECIAL["shift"]] if rng.random() < 0.3 else [])
+            key = rng.choice(symbols + [SPECIAL["enter"]])
+        events += [(True, k) for k in held]
+        events.append((True, key))
+        if rng.random() < 0.05:
+            events.append((True, key))  # Key repeat
+        events.append((False, key))
+        events += [(False, k) for k in reversed(held)]
+    return events
+
+
+def replay(handler, events):
+    chords = []
+    start = time.perf_counter()
+    for pressed, key in events:
+        if pressed:
+            chord = handler.press(key)
+            if chord is not None:
+                chords.append(chord)
+        else:
+            handler.release(key)
+    return time.perf_counter() - start, chords
+
+
+def main():
+    events = chord_events(random.Random(1), EVENTS)
+    results = {}
+    for name, make in (("legacy", LegacyKeys),
+                       ("encoder", lambda: ChordEncoder(modifier_keys=MODIFIERS, shift_key=SPECIAL["shift"]))):
+        best, chords = min(replay(make(), events) for _ in range(ROUNDS))
+        results[name] = (best, chords)
+        print(f"{name:8} {best / len(events) * 1e9:8.1f} ns/event")
+    if results["legacy"][1] != results["encoder"][1]:
+        sys.exit("encoder output differs from the legacy key handling")
+    print(f"speedup  {results['legacy'][0] / results['encoder'][0]:8.2f}x, identical chords for {len(results['encoder'][1])} presses")
+
+
+if __name__ == "__main__":
+    main()
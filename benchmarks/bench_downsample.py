@@ -0,0 +1,67 @@
+"""
+    File name: bench_downsample.py
+    Author: Emek Kırarslan (bozbulanik)
+    License: GNU-GPLv3
+
+    Cost of plotting a long per minute history into a 70 column graph: plot_point for every
+    sample against the binned plot_series modes.
+    Run from the repository root: python benchmarks/bench_downsample.py [minutes]
+"""
+
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if not os.environ.get("DISPLAY"):
+    os.environ.setdefault("PYNPUT_BACKEND", "dummy")
+
+from plotter import TerminalGraph
+from downsample import np
+
+WIDTH, HEIGHT = 76, 20  # 70 plot columns
+
+
+def history(minutes, rng):
+    """Keys per minute, a daily cycle with noise and the odd burst."""
+    xs = list(range(minutes))
+    ys = [max(0.0, 60 + 50 * math.sin(i / 1440 * 2 * math.pi) + rng.gauss(0, 10) + (400 if rng.random() < 0.0005 else 0))
+          for i in xs]
+    return xs, ys
+
+
+def point_by_point(graph, xs, ys):
+    graph.x_min, graph.x_max = min(xs), max(xs)
+    graph.y_min, graph.y_max = min(ys), max(ys)
+    x_range = graph.x_max - graph.x_min
+    y_range = graph.y_max - graph.y_min
+    for x, y in zip(xs, ys):
+        plot_x = (x - graph.x_min) / x_range * (graph.plot_width - 1)
+        plot_y = (y - graph.y_min) / y_range * (graph.plot_height - 1)
+        if 0 <= plot_x < graph.plot_width and 0 <= plot_y < graph.plot_height:
+            graph.plot_point(plot_x, plot_y)
+
+
+def timed(plot):
+    graph = TerminalGraph(width=WIDTH, height=HEIGHT)
+    start = time.perf_counter()
+    plot(graph)
+    return time.perf_counter() - start, graph
+
+
+def main():
+    minutes = int(sys.argv[1]) if len(sys.argv) > 1 else 60 * 24 * 180
+    xs, ys = history(minutes, random.Random(1))
+    print(f"{minutes} points, numpy {'on' if np is not None else 'off'}")
+    base, reference = timed(lambda graph: point_by_point(graph, xs, ys))
+    print(f"{'per point':10} {base * 1e3:8.1f} ms")
+    for mode in ("points", "minmax", "lttb"):
+        seconds, graph = timed(lambda graph: graph.plot_series(xs, ys, mode=mode))
+        note = "  identical" if mode == "points" and graph.chars == reference.chars else ""
+        print(f"{mode:10} {seconds * 1e3:8.1f} ms  {base / seconds:6.1f}x{note}")
+
+
+if __name__ == "__main__":
+    main()
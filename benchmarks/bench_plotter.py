@@ -0,0 +1,98 @@
+"""
+    File name: bench_plotter.py
+    Author: Emek Kırarslan (bozbulanik)
+    License: GNU-GPLv3
+
+    Frame cost of the LivePage graphs: the old list of ANSI strings canvas, joined and
+    stripped into one urwid Text per graph, against the diffed per row markup.
+    Run from the repository root: python benchmarks/bench_plotter.py
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if not os.environ.get("DISPLAY"):
+    os.environ.setdefault("PYNPUT_BACKEND", "dummy")
+
+import urwid
+
+from plotter import TerminalGraph, RESET
+from trackertui import TerminalGraphWidget
+
+GRAPHS = 4  # As many as LivePage shows
+FRAMES = 600  # A minute at 10 Hz
+WIDTH, HEIGHT = 45, 10
+
+
+class LegacyGraph(TerminalGraph):
+    """The old canvas, a fresh list of lists per frame with the colors embedded in the cells."""
+    def clear(self):
+        self.grid = [[' ' for _ in range(self.width)] for _ in range(self.height)]
+
+    def set_cell(self, x, y, char, color=None):
+        self.grid[y][x] = f'{color}{char}{RESET}' if color else char
+
+
+class LegacyGraphWidget:
+    def __init__(self, graph):
+        self.graph = graph
+        self.text = urwid.Text("", align="center")
+
+    def update(self):
+        canvas = "\n".join("".join(row).replace('\033[96m', '').replace('\033[0m', '') for row in self.graph.grid)
+        self.text.set_text(canvas)
+
+    def render_frame(self):
+        # Hold on to the canvas like the screen does, urwid only caches canvases that are still referenced
+        self.canvas = self.text.render((WIDTH + 2,))
+
+
+class DiffGraphWidget(TerminalGraphWidget):
+    def render_frame(self):
+        self.canvas = self.text.render((WIDTH + 2,))
+
+
+def live_frames(rng):
+    """Per second values of a live page minute, a new second every 10 frames like the feed."""
+    values = [rng.randint(0, 8) for _ in range(60)]
+    for frame in range(FRAMES):
+        if frame % 10 == 0:
+            values = values[1:] + [rng.randint(0, 8)]
+        yield [(i - 59, v) for i, v in enumerate(values)]
+
+
+def run(graph_class, widget_class):
+    graphs = [graph_class(title="Keys / s", width=WIDTH, height=HEIGHT, x_label="", y_label="keys", x_divisions=5, y_divisions=3)
+              for _ in range(GRAPHS)]
+    widgets = [widget_class(graph) for graph in graphs]
+    timings = []
+    for points in live_frames(random.Random(1)):
+        start = time.perf_counter()
+        for graph, widget in zip(graphs, widgets):
+            graph.clear()
+            graph.x_min, graph.x_max = -60, 0
+            graph.y_min, graph.y_max = 0, 8
+            graph.plot_scatter(points, fixed=True)
+            graph.add_axes(time_chart=True)
+            widget.update()
+            widget.render_frame()
+        timings.append(time.perf_counter() - start)
+    mean = sum(timings) / len(timings)
+    timings.sort()
+    return mean, timings[len(timings) // 2], timings[int(len(timings) * 0.99)]
+
+
+def main():
+    results = {}
+    for name, graph_class, widget_class in (("legacy", LegacyGraph, LegacyGraphWidget), ("diffed", TerminalGraph, DiffGraphWidget)):
+        results[name] = run(graph_class, widget_class)
+        mean, p50, p99 = results[name]
+        print(f"{name:8} mean {mean * 1e3:6.3f}  p50 {p50 * 1e3:6.3f}  p99 {p99 * 1e3:6.3f} ms/frame ({GRAPHS} graphs)")
+    print(f"speedup  {results['legacy'][0] / results['diffed'][0]:6.2f}x on average")
+
+
+if __name__ == "__main__":
+    main()
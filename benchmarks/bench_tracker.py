@@ -0,0 +1,257 @@
+"""
+    File name: bench_tracker.py
+    Author: Emek Kırarslan (bozbulanik)
+    License: GNU-GPLv3
+
+    Overhead of the tracker itself: per callback latency percentiles and events/s of an
+    input stream replayed straight into the Tracker callbacks (no X server, no listeners),
+    and Reader.report() on generated logs of 1, 5 and 10 years.
+    Run from the repository root: python benchmarks/bench_tracker.py [--events FILE] [--json FILE] [--compare FILE]
+"""
+
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if not os.environ.get("DISPLAY"):
+    os.environ.setdefault("PYNPUT_BACKEND", "dummy")
+
+from pynput import mouse
+
+from events import PRESS, RELEASE, MOVE, CLICK, SCROLL, BUTTONS, KeyTable, load_events, synthetic_events
+from chords import ChordEncoder
+from records import LogRow
+from storage import CSV_HEADER, row_to_csv
+from daemon import Tracker, MOTION_DRAIN_INTERVAL
+from reader import Reader
+
+SECONDS = 60  # Of synthetic input
+REPORT_YEARS = (1, 5, 10)
+ROWS_PER_DAY = 16  # Eight active hours of 30 minute intervals
+PERCENTILES = (50, 90, 99, 99.9)
+RESULTS_VERSION = 1
+
+
+def percentile(sorted_values, p):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p / 100))]
+
+
+def latency_stats(samples, overhead):
+    samples = sorted(max(0, s - overhead) for s in samples)
+    stats = {"count": len(samples)}
+    for p in PERCENTILES:
+        stats[f"p{p:g}_ns"] = percentile(samples, p)
+    stats["max_ns"] = samples[-1]
+    return stats
+
+
+def timer_overhead():
+    """Median cost of an empty timed call, taken off every sample."""
+    clock = time.perf_counter_ns
+    noop = lambda *args: None
+    samples = []
+    for _ in range(20000):
+        start = clock()
+        noop()
+        samples.append(clock() - start)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+def new_tracker(log_dir, keys):
+    tracker = Tracker(log_dir=log_dir)
+    # The stand-in keys are not pynput's Key members the default encoder knows as modifiers
+    tracker.chord_encoder = ChordEncoder(modifier_keys=keys.modifiers(), shift_key=keys.key("Key.shift"))
+    return tracker
+
+
+def calls(tracker, events, keys):
+    """(callback name, callback, args) of every event in order, plus a motion drain every MOTION_DRAIN_INTERVAL."""
+    buttons = [getattr(mouse.Button, name, mouse.Button.unknown) for name in BUTTONS]
+    result = []
+    next_drain = MOTION_DRAIN_INTERVAL
+    for t, kind, args in events:
+        if t >= next_drain:
+            result.append(("drain_mouse_motion", tracker.drain_mouse_motion, ()))
+            next_drain += MOTION_DRAIN_INTERVAL
+        if kind == PRESS:
+            result.append(("on_keyboard_press", tracker.on_keyboard_press, (keys.key(args),)))
+        elif kind == RELEASE:
+            result.append(("on_keyboard_release", tracker.on_keyboard_release, (keys.key(args),)))
+        elif kind == MOVE:
+            result.append(("on_mouse_move", tracker.on_mouse_move, args))
+        elif kind == CLICK:
+            x, y, button, pressed = args
+            result.append(("on_mouse_click", tracker.on_mouse_click, (x, y, buttons[button], bool(pressed))))
+        elif kind == SCROLL:
+            result.append(("on_mouse_scroll", tracker.on_mouse_scroll, args))
+    return result
+
+
+def bench_callbacks(events, log_dir):
+    keys = KeyTable()
+    overhead = timer_overhead()
+    clock = time.perf_counter_ns
+
+    tracker = new_tracker(log_dir, keys)
+    replay = calls(tracker, events, keys)
+    # log_key is no longer on the press path, it is timed on its own over the same presses
+    replay += [("log_key", tracker.log_key, (keys.key(args),)) for _, kind, args in events if kind == PRESS]
+    samples = {}
+    for name, callback, args in replay:
+        start = clock()
+        callback(*args)
+        samples.setdefault(name, []).append(clock() - start)
+
+    # Throughput untimed, on a fresh tracker
+    tracker = new_tracker(log_dir, keys)
+    replay = calls(tracker, events, keys)
+    start = time.perf_counter()
+    for _, callback, args in replay:
+        callback(*args)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "timer_overhead_ns": overhead,
+        "events": len(events),
+        "events_per_second": len(replay) / elapsed,
+        "callbacks": {name: latency_stats(values, overhead) for name, values in sorted(samples.items())},
+    }
+
+
+def log_rows(years, rng, rows_per_day=ROWS_PER_DAY):
+    """LogRows of years of 30 minute intervals, rows_per_day of them per day."""
+    keys = [repr(c) for c in "etaoinshrdlucmfwypvbgkqjxz0123456789"] + ["Key.space", "Key.backspace", "Key.enter", "Key.ctrl + 'c'", "Key.ctrl + 'v'"]
+    apps = ["firefox", "code", "alacritty", "slack", "thunderbird", "vlc", "gimp", "libreoffice"]
+    day = datetime(2000, 1, 1, 9, 0)
+    for _ in range(365 * years):
+        for i in range(rows_per_day):
+            keypress = rng.randint(0, 4000)
+            row_keys = {key: rng.randint(1, 200) for key in rng.sample(keys, rng.randint(10, len(keys)))}
+            row_apps = {app: rng.randint(1, 900) for app in rng.sample(apps, rng.randint(1, 4))}
+            inter_key = {str(b): rng.randint(1, 300) for b in range(100, 150, 2)}
+            key_hold = {str(b): rng.randint(1, 300) for b in range(90, 120, 2)}
+            yield LogRow.from_timestamp((day + timedelta(minutes=30 * i)).timestamp(), rng.randint(0, 500), rng.randint(0, 50), rng.randint(0, 10), keypress,
+                                        rng.uniform(0, 40), rng.uniform(0, 20), row_keys, row_apps, None, None, inter_key, key_hold,
+                                        keypress * 8 // 10, rng.uniform(0, 900))
+        day += timedelta(days=1)
+
+
+def write_log(path, years, rng):
+    with open(path, 'w', newline='') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(CSV_HEADER)
+        rows = 0
+        for row in log_rows(years, rng):
+            writer.writerow(row_to_csv(row))
+            rows += 1
+    return rows
+
+
+def timed_report(log_dir, **kwargs):
+    reader = Reader(log_dir=log_dir)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        reader.report(**kwargs)
+    return time.perf_counter() - start
+
+
+def bench_report(years, work_dir):
+    results = {}
+    for year_count in years:
+        log_dir = os.path.join(work_dir, f"{year_count}y")
+        os.makedirs(log_dir)
+        rows = write_log(os.path.join(log_dir, "log.csv"), year_count, random.Random(year_count))
+        cold = timed_report(log_dir)  # No rollup checkpoint yet, every row is parsed
+        warm = timed_report(log_dir)
+        last_year = timed_report(log_dir, since=datetime(2000 + year_count - 1, 1, 1).date())
+        results[f"{year_count}y"] = {
+            "rows": rows,
+            "bytes": os.path.getsize(os.path.join(log_dir, "log.csv")),
+            "cold_seconds": cold,
+            "warm_seconds": warm,
+            "last_year_seconds": last_year,
+        }
+        shutil.rmtree(log_dir)
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results, baseline=None):
+    def change(path, value):
+        old = baseline
+        for part in path:
+            old = (old or {}).get(part)
+        return f"  {value / old:5.2f}x" if old else ""
+
+    callbacks = results["callbacks"]
+    print(f"{callbacks['events']} events, {callbacks['events_per_second']:,.0f} events/s{change(('callbacks', 'events_per_second'), callbacks['events_per_second'])}")
+    print(f"{'callback':22}{'count':>8}" + "".join(f"{f'p{p:g}':>9}" for p in PERCENTILES) + f"{'max':>10}  ns")
+    for name, stats in callbacks["callbacks"].items():
+        print(f"{name:22}{stats['count']:8}" + "".join(f"{stats[f'p{p:g}_ns']:9}" for p in PERCENTILES) + f"{stats['max_ns']:10}"
+              + change(("callbacks", "callbacks", name, "p99_ns"), stats["p99_ns"]))
+    for name, stats in results.get("report", {}).items():
+        print(f"report {name:4} {stats['rows']:8} rows {stats['bytes'] / 1e6:7.1f} MB  cold {stats['cold_seconds']:7.3f}s"
+              f"{change(('report', name, 'cold_seconds'), stats['cold_seconds'])}  warm {stats['warm_seconds']:7.3f}s"
+              f"{change(('report', name, 'warm_seconds'), stats['warm_seconds'])}  last year {stats['last_year_seconds']:7.3f}s"
+              f"{change(('report', name, 'last_year_seconds'), stats['last_year_seconds'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the tracker callbacks and report().")
+    parser.add_argument("--events", help="Replay this recording (benchmarks/events.py record) instead of synthetic input.")
+    parser.add_argument("--seconds", type=int, default=SECONDS, help="Seconds of synthetic input.")
+    parser.add_argument("--years", default=",".join(map(str, REPORT_YEARS)), help="Comma separated log lengths for report(), empty to skip.")
+    parser.add_argument("--json", help="Write the results to this file.")
+    parser.add_argument("--compare", help="Results of an earlier run, changes are printed as new / old.")
+    args = parser.parse_args()
+
+    events = load_events(args.events) if args.events else synthetic_events(args.seconds, random.Random(1))
+    work_dir = tempfile.mkdtemp(prefix="tracker-bench-")
+    try:
+        results = {
+            "version": RESULTS_VERSION,
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "input": args.events or f"synthetic {args.seconds}s",
+            "callbacks": bench_callbacks(events, os.path.join(work_dir, "callbacks")),
+        }
+        years = [int(y) for y in args.years.split(",") if y.strip()]
+        if years:
+            results["report"] = bench_report(years, work_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""
+    File name: events.py
+    Author: Emek Kırarslan (bozbulanik)
+    License: GNU-GPLv3
+
+    Input event streams for the benchmarks: recorded from pynput, loaded from a compact
+    binary file or generated (1000 Hz mouse, 15 keys/s typing bursts, shortcuts and AltGr
+    chords). Keys are replayed as stand-in objects, so no X server is needed.
+    Record with: python benchmarks/events.py record events.trke
+"""
+
+import ast
+import math
+import os
+import struct
+import sys
+import time
+
+MAGIC = b"TRKE\x01"
+PRESS, RELEASE, MOVE, CLICK, SCROLL = range(5)
+BUTTONS = ("unknown", "left", "middle", "right")
+
+EVENT = struct.Struct("<IB")  # Microseconds since the previous event, kind
+PAYLOADS = {
+    PRESS: struct.Struct("<H"),  # Index into the key table
+    RELEASE: struct.Struct("<H"),
+    MOVE: struct.Struct("<hh"),  # x, y
+    CLICK: struct.Struct("<hhBB"),  # x, y, button, pressed
+    SCROLL: struct.Struct("<hhbb"),  # x, y, dx, dy
+}
+MAX_DELTA_US = 0xffffffff
+
+MOUSE_HZ = 1000
+TYPING_KEYS_PER_SECOND = 15
+ALTGR_VK = 65027
+
+
+class SpecialKey:
+    """Stands in for a pynput Key member, the dummy backend gives them all the same value."""
+    def __init__(self, name):
+        self.name = name
+
+    def __str__(self):
+        return f"Key.{self.name}"
+
+
+class CharKey:
+    """Stands in for a pynput KeyCode."""
+    def __init__(self, char=None, vk=None):
+        self.char = char
+        self.vk = vk
+
+    def __str__(self):
+        return f"<{self.vk}>" if self.char is None else repr(self.char)
+
+
+MODIFIER_NAMES = ("alt", "alt_r", "alt_l", "cmd", "cmd_r", "cmd_l", "ctrl", "ctrl_r", "ctrl_l", "shift", "shift_r", "shift_l")
+
+
+class KeyTable:
+    """Interns key tokens (str() of a pynput key) to indices and stand-in key objects."""
+    def __init__(self, tokens=()):
+        self.tokens = []
+        self.index = {}
+        self.keys = {}
+        for token in tokens:
+            self.intern(token)
+
+    def intern(self, token):
+        i = self.index.get(token)
+        if i is None:
+            i = self.index[token] = len(self.tokens)
+            self.tokens.append(token)
+        return i
+
+    def key(self, token):
+        key = self.keys.get(token)
+        if key is None:
+            if token.startswith("Key."):
+                key = SpecialKey(token[4:])
+            elif token.startswith("<") and token.endswith(">"):
+                key = CharKey(vk=int(token[1:-1]))
+            elif token.startswith("["):
+                key = CharKey(token[1:-1])  # Dead key
+            else:
+                key = CharKey(ast.literal_eval(token))
+            self.keys[token] = key
+        return key
+
+    def modifiers(self):
+        return [self.key(f"Key.{name}") for name in MODIFIER_NAMES]
+
+
+def save_events(path, events):
+    """Writes (t, kind, args) events, args being a key token for key events, as a .trke file."""
+    table = KeyTable()
+    body = bytearray()
+    previous = events[0][0] if events else 0.0
+    for t, kind, args in events:
+        delta = min(max(int(round((t - previous) * 1e6)), 0), MAX_DELTA_US)
+        previous += delta / 1e6
+        body += EVENT.pack(delta, kind)
+        if kind in (PRESS, RELEASE):
+            body += PAYLOADS[kind].pack(table.intern(args))
+        else:
+            body += PAYLOADS[kind].pack(*args)
+    with open(path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<H", len(table.tokens)))
+        for token in table.tokens:
+            encoded = token.encode('utf-8')
+            f.write(struct.pack("<B", len(encoded)) + encoded)
+        f.write(body)
+
+
+def load_events(path):
+    """Reads a .trke file back into (t, kind, args) events, t starting at 0."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(f"{path} is not an event recording")
+    offset = len(MAGIC)
+    (count,) = struct.unpack_from("<H", data, offset)
+    offset += 2
+    tokens = []
+    for _ in range(count):
+        length = data[offset]
+        tokens.append(data[offset + 1:offset + 1 + length].decode('utf-8'))
+        offset += 1 + length
+    events = []
+    t = 0.0
+    while offset < len(data):
+        delta, kind = EVENT.unpack_from(data, offset)
+        offset += EVENT.size
+        payload = PAYLOADS[kind]
+        args = payload.unpack_from(data, offset)
+        offset += payload.size
+        t += delta / 1e6
+        events.append((t, kind, tokens[args[0]] if kind in (PRESS, RELEASE) else args))
+    return events
+
+
+def typing_events(seconds, rng):
+    """Bursts of typing at about TYPING_KEYS_PER_SECOND with shifted symbols, shortcuts and AltGr chords."""
+    letters = [repr(c) for c in "etaoinshrdlucmfwypvbgkqjxz"]
+    symbols = [repr(c) for c in "ABCDEFGHIJ0123456789.,;:!?'\"()-+*/%=<>çğıöşü"]
+    events = []
+    t = rng.uniform(0, 1)
+    while t < seconds:
+        burst_end = t + rng.uniform(2, 8)
+        while t < min(burst_end, seconds):
+            roll = rng.random()
+            if roll < 0.80:
+                held = []
+                key = rng.choice(letters if rng.random() < 0.9 else ["Key.space", "Key.backspace"])
+            elif roll < 0.90:
+                held = ["Key.shift"]
+                key = rng.choice(symbols)
+            elif roll < 0.97:
+                held = rng.choice([["Key.ctrl"], ["Key.ctrl_l", "Key.shift_l"], ["Key.alt"], ["Key.cmd"]])
+                key = rng.choice(letters + ["Key.tab", "Key.left", "Key.right"])
+            else:
+                held = [f"<{ALTGR_VK}>"] + (["Key.shift"] if rng.random() < 0.3 else [])
+                key = rng.choice(symbols + ["Key.enter"])
+            hold = rng.uniform(0.05, 0.12)
+            for i, modifier in enumerate(held):
+                events.append((t - 0.03 * (len(held) - i), PRESS, modifier))
+            events.append((t, PRESS, key))
+            if rng.random() < 0.02:
+                for repeat in range(1, 6):
+                    events.append((t + 0.5 + repeat * 0.03, PRESS, key))  # Held long enough to auto repeat
+                hold = 0.7
+            events.append((t + hold, RELEASE, key))
+            for i, modifier in enumerate(reversed(held)):
+                events.append((t + hold + 0.02 * (i + 1), RELEASE, modifier))
+            t += rng.expovariate(TYPING_KEYS_PER_SECOND)
+        t += rng.uniform(1, 6)  # Pause between bursts
+    return events
+
+
+def mouse_events(seconds, rng, hz=MOUSE_HZ):
+    """A MOUSE_HZ stream of motion along smooth random strokes with clicks and scroll bursts."""
+    events = []
+    x, y = 960.0, 540.0
+    heading = 0.0
+    step = 1.0 / hz
+    t = 0.0
+    while t < seconds:
+        # Strokes of a few hundred milliseconds, the mouse rests in between
+        stroke_end = t + rng.uniform(0.2, 1.5)
+        speed = rng.uniform(200, 2500)  # Pixels per second
+        while t < min(stroke_end, seconds):
+            heading += rng.gauss(0, 0.05)
+            x = min(max(x + math.cos(heading) * speed * step, 0), 3839)
+            y = min(max(y + math.sin(heading) * speed * step, 0), 2159)
+            events.append((t, MOVE, (int(x), int(y))))
+            t += step
+        roll = rng.random()
+        if roll < 0.4:
+            button = rng.choice((1, 1, 1, 3, 2))
+            events.append((t, CLICK, (int(x), int(y), button, 1)))
+            events.append((t + rng.uniform(0.06, 0.15), CLICK, (int(x), int(y), button, 0)))
+        elif roll < 0.6:
+            for notch in range(rng.randint(3, 20)):
+                events.append((t + notch * 0.02, SCROLL, (int(x), int(y), 0, rng.choice((-1, 1)))))
+        t += rng.uniform(0.1, 2.0)
+    return events
+
+
+def synthetic_events(seconds, rng):
+    """Typing and mouse streams of seconds seconds, merged in time order."""
+    events = typing_events(seconds, rng) + mouse_events(seconds, rng)
+    events.sort(key=lambda event: event[0])
+    start = events[0][0] if events else 0.0
+    return [(t - start, kind, args) for t, kind, args in events]
+
+
+def record_events(path):
+    """Records the real input until Ctrl-C, needs pynput with a working backend."""
+    from pynput import keyboard, mouse
+
+    events = []
+    clock = time.monotonic
+
+    def button_index(button):
+        return BUTTONS.index(button.name) if button.name in BUTTONS else 0
+
+    keyboard_listener = keyboard.Listener(on_press=lambda key: events.append((clock(), PRESS, str(key))),
+                                          on_release=lambda key: events.append((clock(), RELEASE, str(key))))
+    mouse_listener = mouse.Listener(
+        on_move=lambda x, y: events.append((clock(), MOVE, (int(x), int(y)))),
+        on_click=lambda x, y, button, pressed: events.append((clock(), CLICK, (int(x), int(y), button_index(button), int(pressed)))),
+        on_scroll=lambda x, y, dx, dy: events.append((clock(), SCROLL, (int(x), int(y), max(-128, min(127, dx)), max(-128, min(127, dy))))))
+    keyboard_listener.start()
+    mouse_listener.start()
+    print(f"Recording to {path}, stop with Ctrl-C.")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    keyboard_listener.stop()
+    mouse_listener.stop()
+    events.sort(key=lambda event: event[0])
+    save_events(path, events)
+    print(f"Saved {len(events)} events, {os.path.getsize(path)} bytes.")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] != "record":
+        sys.exit("Usage: python benchmarks/events.py record OUTPUT")
+    record_events(sys.argv[2])
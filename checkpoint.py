@@ -0,0 +1,89 @@
+"""
+    File name: checkpoint.py
+    Author: Emek Kırarslan (bozbulanik)
+    License: GNU-GPLv3
+"""
+
+import hashlib
+import json
+import os
+
+from records import Totals
+
+
+class LogCursor:
+    """Position in an append-only log file.
+
+    Remembers the byte offset consumed so far and a hash of the last consumed row, so a
+    truncated or rewritten log can be told apart from one that only grew. generation is
+    the log segment the offset belongs to.
+    """
+    def __init__(self, offset=0, last_row_start=0, last_row_hash=None, generation=0):
+        self.generation = generation
+        self.offset = offset
+        self.last_row_start = last_row_start
+        self.last_row_hash = last_row_hash
+
+    @staticmethod
+    def hash_row(line):
+        return hashlib.sha1(line).hexdigest()
+
+    def to_dict(self):
+        return {"generation": self.generation, "offset": self.offset, "last_row_start": self.last_row_start, "last_row_hash": self.last_row_hash}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["offset"], data["last_row_start"], data["last_row_hash"], data.get("generation", 0))
+
+    def is_valid_for(self, log_file):
+        """Checks that log_file still contains the rows this cursor consumed."""
+        log_file.seek(0, os.SEEK_END)
+        if log_file.tell() < self.offset:
+            return False  # Truncated
+        if self.last_row_hash is None:
+            return self.offset == 0
+        log_file.seek(self.last_row_start)
+        return self.hash_row(log_file.read(self.offset - self.last_row_start)) == self.last_row_hash
+
+    def consume(self, line, start, end, generation=None):
+        if generation is not None:
+            self.generation = generation
+        self.last_row_start = start
+        self.last_row_hash = self.hash_row(line)
+        self.offset = end
+
+
+class ReportCheckpoint:
+    """Running report totals of a log file, persisted next to it along with the LogCursor they go up to."""
+    def __init__(self, path):
+        self.path = path
+        self.cursor = LogCursor()
+        self.totals = Totals()
+
+    @property
+    def offset(self):
+        return self.cursor.offset
+
+    def load(self):
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            self.cursor = LogCursor.from_dict(data)
+        except (OSError, ValueError, KeyError):
+            return False
+        self.totals = Totals.from_dict(data["totals"])
+        return True
+
+    def save(self):
+        data = self.cursor.to_dict()
+        data["totals"] = self.totals.to_dict()
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+
+    def reset(self):
+        self.__init__(self.path)
+
+    def consume(self, line, start, end, generation=None):
+        self.cursor.consume(line, start, end, generation)
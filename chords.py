@@ -0,0 +1,156 @@
+"""
+    File name: chords.py
+    Author: Emek Kırarslan (bozbulanik)
+    License: GNU-GPLv3
+"""
+
+from pynput.keyboard import Key
+
+ALTGR = "<65027>"
+MODIFIER_BITS = 4  # Modifier ids are 1..12, one nibble each in the held sequence
+KEY_ID_BITS = 20
+
+MODIFIER_KEYS = [
+    Key.alt, Key.alt_r, Key.alt_l, Key.cmd, Key.cmd_r, Key.cmd_l,
+    Key.ctrl, Key.ctrl_r, Key.ctrl_l, Key.shift, Key.shift_r, Key.shift_l
+]
+
+LOCKED_IN_GARBAGE_COLLECTION_LIMIT = 5
+
+SYMBOLS = {
+    'a': "â", 'b': "“", 'c': "¢", 'ç': "·", 'e': "€", 'f': "ª", 'ı': "î",
+    'i': "'", 'm': "µ", 'n': "”", 'o': "ô", 'ö': "×", 'r': "¶", 's': "ß",
+    'ş': "´", 't': "₺", 'u': "û", 'ü': "~", 'v': "„", 'y': "←", 'z': "«", 
+    'x': "»", 'q': "@", 'A': "Â", 'C': "©", 'Ç': "÷", 'I': "Î", 'M': "º", 
+    'N': "’", 'O': "Ô", 'R': "®", 'U': "Û", 'Ü': "¯", 'V': "‚", 'Y': "¥", 
+    'Z': "<", 'X': ">", 'Q': "Ω", '.': "˙", ',': "`", '<': "|", '>': "¦", 
+    '"': "<", 'é': "°", '1': ">", '2': "£", '3': "#", '4': "$", '5': "½", 
+    '6': "¾", '7': "{", '8': "[", '9': "]", '0': "}", '*': "\\", '-': "|", 
+    '!': "¡", "'": "²", '^': "³", '+': "¼", '%': "⅜", '(': "", ')': "±", 
+    '=': "°", '?': "¿"
+}
+
+
+
+def key_is_a_symbol(key):
+    return str(key)[:4] != 'Key.'
+
+
+def key_to_str(key):
+    s = str(key)
+    if s == ALTGR:
+        return "<altgr>"
+    return f'<{s[4:]}>' if not key_is_a_symbol(key) else s[1:-1]
+
+
+class KeyInfo:
+    """What the encoder needs to know about a key, worked out once per distinct key."""
+    __slots__ = ("key", "id", "is_modifier", "is_altgr", "is_symbol", "name")
+
+    def __init__(self, key, key_id, is_modifier):
+        self.key = key
+        self.id = key_id
+        self.is_modifier = is_modifier
+        self.is_altgr = str(key) == ALTGR
+        self.is_symbol = key_is_a_symbol(key)
+        self.name = key_to_str(key)
+
+
+class ChordEncoder:
+    """Turns key presses into chord strings like "<ctrl> + c" for the key counts.
+
+    Keys are interned to small integer ids. The held modifiers are packed into one int,
+    a nibble per modifier id in press order (the chord lists them in press order), so
+    (held modifiers, key id) is a single int and each chord string is built only once.
+    Chords with AltGr held are rare and go through the slow path with the SYMBOLS table.
+    """
+    def __init__(self, modifier_keys=None, shift_key=Key.shift):
+        self.keys = {}
+        self.infos = [None]
+        self.keys_down = {}  # Insertion ordered, key -> KeyInfo
+        self.modifiers_down = 0
+        self.altgr_down = 0
+        self.chords = {}
+        self.shift_key = shift_key
+        for key in MODIFIER_KEYS if modifier_keys is None else modifier_keys:
+            self.intern(key, True)
+        self.shift_id = self.keys[shift_key].id
+
+    def intern(self, key, is_modifier=False):
+        info = self.keys.get(key)
+        if info is None:
+            info = self.keys[key] = KeyInfo(key, len(self.infos), is_modifier)
+            self.infos.append(info)
+        return info
+
+    def press(self, key):
+        """Marks key as held down, returns its chord or None for modifiers and repeats."""
+        info = self.keys.get(key) or self.intern(key)
+        if key in self.keys_down:
+            return None
+        self.keys_down[key] = info
+        if info.is_modifier:
+            self.modifiers_down = (self.modifiers_down << MODIFIER_BITS) | info.id
+            return None
+        if info.is_altgr:
+            self.altgr_down += 1
+            return None
+        return self.encode(key, info)
+
+    def release(self, key):
+        info = self.keys_down.pop(key, None)
+        if info is None:
+            # Missed a press or release, drop stuck keys once nothing is being held on purpose
+            if len(self.keys_down) >= LOCKED_IN_GARBAGE_COLLECTION_LIMIT and self.modifiers_down == 0:
+                self.clear()
+        elif info.is_modifier:
+            self.modifiers_down = 0
+            for held in self.keys_down.values():
+                if held.is_modifier:
+                    self.modifiers_down = (self.modifiers_down << MODIFIER_BITS) | held.id
+        elif info.is_altgr:
+            self.altgr_down -= 1
+
+    def clear(self):
+        self.keys_down.clear()
+        self.modifiers_down = 0
+        self.altgr_down = 0
+
+    def encode(self, key, info=None):
+        """Chord string of key with the keys held down right now."""
+        info = info or self.keys.get(key) or self.intern(key)
+        if self.altgr_down:
+            return self.encode_altgr(key, info)
+        chord_id = (self.modifiers_down << KEY_ID_BITS) | info.id
+        chord = self.chords.get(chord_id)
+        if chord is None:
+            chord = self.chords[chord_id] = self.build_chord(info)
+        return chord
+
+    def held_modifiers(self):
+        ids = []
+        sequence = self.modifiers_down
+        while sequence:
+            ids.append(sequence & ((1 << MODIFIER_BITS) - 1))
+            sequence >>= MODIFIER_BITS
+        return [self.infos[i] for i in reversed(ids)]
+
+    def build_chord(self, info):
+        modifiers = self.held_modifiers()
+        if info.is_symbol and any(m.id == self.shift_id for m in modifiers):
+            modifiers = []
+        return ' + '.join([m.name for m in modifiers] + [info.name])
+
+    def encode_altgr(self, key, info):
+        modifiers_down = [k for k, held in self.keys_down.items() if held.is_modifier]
+        if self.shift_key in modifiers_down and info.is_symbol:
+            modifiers_down.clear()
+        try:
+            char = SYMBOLS.get(key.char, "")
+            if char:
+                return str(char)
+            return ' + '.join(map(key_to_str, self.keys_down)).lower()
+        except AttributeError:
+            if modifiers_down:
+                return ' + '.join(map(key_to_str, self.keys_down)).lower()
+            return "<altgr> + " + f'<{str(key)[4:]}>'
@@ -0,0 +1,58 @@
+"""
+    File name: counters.py
+    Author: Emek Kırarslan (bozbulanik)
+    License: GNU-GPLv3
+"""
+
+import time
+
+from sketch import SpaceSaving, KEY_SKETCH_CAPACITY, APP_SKETCH_CAPACITY
+from rhythm import LatencyHistogram
+
+EPOCH_GRACE_PERIOD = 0.05  # Seconds a retired epoch is left alone for in-flight callbacks, a heuristic
+
+
+class Epoch:
+    """Counters of one log interval.
+
+    Listener callbacks only ever write to the active epoch. Tracker.swap_epoch()
+    replaces it with a fresh one, so the retired epoch can be read without a lock once
+    its grace period is over (best effort, see Tracker.checkpoint()).
+    """
+    def __init__(self, key_capacity=KEY_SKETCH_CAPACITY, app_capacity=APP_SKETCH_CAPACITY):
+        self.started_at = time.time()
+        self.key_press_count: int = 0
+        self.left_mouse_click_count: int = 0
+        self.right_mouse_click_count: int = 0
+        self.middle_mouse_click_count: int = 0
+        self.mouse_movement_distance: float = 0.0
+        self.mouse_scroll_distance: float = 0.0
+        self.key_counts = SpaceSaving(key_capacity)
+        self.app_counts = SpaceSaving(app_capacity)
+        self.inter_key = LatencyHistogram()
+        self.key_hold = LatencyHistogram()
+        self.typed_chars: int = 0
+        self.typing_seconds: float = 0.0
+
+
+    def activity(self):
+        """Key presses, clicks, mouse meters and scroll, the numbers of the live feed."""
+        return (self.key_press_count,
+                self.left_mouse_click_count + self.right_mouse_click_count + self.middle_mouse_click_count,
+                self.mouse_movement_distance, self.mouse_scroll_distance)
+
+    def merge(self, other):
+        """Adds the counters of a later epoch of the same interval."""
+        self.key_press_count += other.key_press_count
+        self.left_mouse_click_count += other.left_mouse_click_count
+        self.right_mouse_click_count += other.right_mouse_click_count
+        self.middle_mouse_click_count += other.middle_mouse_click_count
+        self.mouse_movement_distance += other.mouse_movement_distance
+        self.mouse_scroll_distance += other.mouse_scroll_distance
+        self.key_counts.merge(other.key_counts)
+        self.app_counts.merge(other.app_counts)
+        self.inter_key.merge(other.inter_key)
+        self.key_hold.merge(other.key_hold)
+        self.typed_chars += other.typed_chars
+        self.typing_seconds += other.typing_seconds
+        return self
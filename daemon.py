@@ -0,0 +1,407 @@
+"""
+    File name: daemon.py
+    Author: Emek Kırarslan (bozbulanik)
+    License: GNU-GPLv3
+"""
+
+from pynput import keyboard, mouse
+import os
+import time
+from datetime import datetime
+import subprocess
+from rich.console import Console
+from rich import print
+import signal
+import sys
+import threading
+from reader import Reader
+from focus import FocusWatcher, FocusWatcherUnavailable, AppUsage
+from proctree import ProcessResolver, UNKNOWN_APP
+from ringbuffer import MotionBuffer
+from counters import Epoch, EPOCH_GRACE_PERIOD
+from sketch import KEY_SKETCH_CAPACITY
+from records import LogRow, Totals, merge_dict
+from chords import ChordEncoder
+from rhythm import TypingRhythm
+from journal import Journal, JOURNAL_INTERVAL, FSYNC_INTERVAL
+from scheduler import Scheduler
+from ipc import IpcServer, AlreadyRunning, UntrustedSocket
+from livefeed import LiveFeedWriter
+from metrics import Metrics, METRICS_INTERVAL, prometheus_text, write_textfile
+from profiling import Profiler
+
+DPI = 96
+INCH_TO_METER = 0.0254  # 1 inch = 0.0254 meters
+LOG_INTERVAL = 1800  # 30 minutes / 1800
+APP_POLL_INTERVAL = 1  # Focus is only sampled when there is no focus watcher
+MOTION_DRAIN_INTERVAL = 5
+LIVE_FEED_INTERVAL = 1  # Seconds per slot of the shared memory live feed
+COMPACTION_INTERVAL = 86400  # Compact old raw rows at most once a day
+
+
+class Tracker(Reader):
+    """The capturing daemon: listeners, counters, journal and the run loop of tracker start."""
+    def __init__(self, log_dir=None, print_log=None, storage="csv", keep_raw_days=None, storage_options=None, key_sketch_size=KEY_SKETCH_CAPACITY,
+                 journal_interval=JOURNAL_INTERVAL, fsync_interval=FSYNC_INTERVAL, metrics_textfile=None):
+        self.key_sketch_size = key_sketch_size
+        self.epoch = Epoch(key_capacity=self.key_sketch_size)
+        # Counters of the current log interval, the epoch is moved in here every journal_interval
+        self.interval = Epoch(key_capacity=self.key_sketch_size)
+        self.journal_interval = journal_interval
+        self.interval_lock = threading.Lock()  # Keeps snapshots from seeing an epoch in neither place
+        self.retiring: Epoch = None  # Swapped out epoch in its grace period, not in the interval yet
+        self.started_at = time.time()
+        self.live_feed: LiveFeedWriter = None
+        self.logged_activity = (0, 0, 0.0, 0.0)  # Activity of the logged intervals, the live feed publishes differences
+        self.published_activity = (0, 0, 0.0, 0.0)
+        self.motion = MotionBuffer()
+        self.app_usage = AppUsage()
+        self.focused_app: str = None
+        self.focus_watcher: FocusWatcher = None
+        self.process_resolver = ProcessResolver()
+
+        self.chord_encoder = ChordEncoder()
+        self.rhythm = TypingRhythm()
+        self.metrics = Metrics()
+        self.metrics_textfile = metrics_textfile  # node_exporter textfile collector file, rewritten every METRICS_INTERVAL
+
+        super().__init__(log_dir, print_log, storage, storage_options)
+        self.journal = Journal(self.storage.path + ".journal", fsync_interval)
+        self.profiler = Profiler(os.path.dirname(self.storage.path) or ".", self.describe_counters)
+        self.scheduler = Scheduler()
+        self.storage_lock = threading.Lock()
+        self.keep_raw_days = keep_raw_days
+        self.last_compaction = None
+        self.compression_thread: threading.Thread = None
+        self.console = Console()
+
+    def start_listeners(self):
+        # Only tracker start listens, benchmarks call the callbacks directly
+        counted = self.metrics.wrap
+        keyboard_listener = keyboard.Listener(on_press=counted("on_keyboard_press", self.on_keyboard_press),
+                                              on_release=counted("on_keyboard_release", self.on_keyboard_release))
+        mouse_listener = mouse.Listener(on_click=counted("on_mouse_click", self.on_mouse_click), on_move=counted("on_mouse_move", self.on_mouse_move),
+                                        on_scroll=counted("on_mouse_scroll", self.on_mouse_scroll))
+
+        keyboard_listener.start()
+        mouse_listener.start()
+
+    def install_signal_handlers(self):
+        # A handler interrupts the main thread anywhere, possibly holding interval_lock in
+        # checkpoint(), so it only queues the toggle for the scheduler loop to run outside any lock
+        if hasattr(signal, "SIGUSR1"):
+            signal.signal(signal.SIGUSR1, lambda signum, frame: self.scheduler.call_soon(lambda: self.toggle_profiling("cpu")))
+            signal.signal(signal.SIGUSR2, lambda signum, frame: self.scheduler.call_soon(lambda: self.toggle_profiling("memory")))
+
+    def toggle_profiling(self, kind):
+        log_time = datetime.now().strftime("%H:%M:%S")
+        name = "CPU" if kind == "cpu" else "Memory"
+        try:
+            written = self.profiler.toggle_cpu() if kind == "cpu" else self.profiler.toggle_memory()
+        except Exception as e:
+            print(f"[{log_time}] - {name} profiling failed: {e}")
+            return
+        if written:
+            print(f"[{log_time}] - {name} profiling stopped, wrote {', '.join(written)}.")
+        else:
+            print(f"[{log_time}] - {name} profiling started, signal again to stop.")
+
+    def describe_counters(self):
+        with self.interval_lock:
+            return [
+                f"Epoch: {len(self.epoch.key_counts.counts)} key chords, {len(self.epoch.app_counts.counts)} apps",
+                f"Interval: {len(self.interval.key_counts.counts)} key chords, {len(self.interval.app_counts.counts)} apps",
+                f"Chord encoder: {len(self.chord_encoder.keys)} keys, {len(self.chord_encoder.chords)} chords",
+                f"App usage: {len(self.app_usage.intervals)} focus intervals not logged yet",
+            ]
+
+    def swap_epoch(self):
+        # Rebinding self.epoch is atomic, listeners pick up the new epoch on their next event
+        self.drain_mouse_motion()
+        epoch, self.epoch = self.epoch, Epoch(key_capacity=self.key_sketch_size)
+        for app, seconds in self.app_usage.cut().items():
+            epoch.app_counts.add(app, seconds)
+        return epoch
+     
+    def get_current_focused_app(self) -> str:
+        start = time.perf_counter()
+        try:
+            terminal_pid = subprocess.check_output(['xdotool', 'getwindowfocus', 'getwindowpid'], stderr=subprocess.STDOUT).strip().decode("utf-8")
+        except subprocess.CalledProcessError:
+            return UNKNOWN_APP
+        finally:
+            self.metrics.observe("focus_subprocess", time.perf_counter() - start)
+        return self.get_app_name(terminal_pid)
+
+    def get_app_name(self, pid) -> str:
+        return self.process_resolver.resolve(pid, os.environ.get('TERM'))
+
+    def on_focus_change(self, pid):
+        # Called from the focus watcher thread, only when focus actually changes
+        self.focused_app = self.get_app_name(pid) if pid else UNKNOWN_APP
+        self.app_usage.switch(self.focused_app)
+
+    def start_focus_watcher(self):
+        try:
+            self.focus_watcher = FocusWatcher(self.on_focus_change, on_lost=self.on_focus_watcher_lost)
+        except FocusWatcherUnavailable:
+            # No X connection (or no python-xlib), fall back to polling xdotool/ps
+            self.focus_watcher = None
+            return
+        self.focus_watcher.start()
+
+    def focus_is_event_driven(self):
+        return self.focus_watcher is not None and self.focus_watcher.is_alive()
+
+    def on_focus_watcher_lost(self):
+        # Called from the dying watcher thread, the scheduler adds the polling job on its own thread
+        self.scheduler.call_soon(self.start_focus_polling)
+
+    def start_focus_polling(self):
+        if "focus" not in self.scheduler.jobs:
+            self.scheduler.add("focus", APP_POLL_INTERVAL, self.log_app_usage)
+
+    def log_app_usage(self):
+        self.focused_app = self.get_current_focused_app()
+        self.app_usage.switch(self.focused_app)
+
+
+    # Idea and key logging snippets from the github user Ga68 (https://github.com/Ga68). Thank you :)
+
+    def log_key(self, key):
+        self.epoch.key_counts.add(self.chord_encoder.encode(key))
+
+    def on_keyboard_press(self, key):
+        epoch = self.epoch
+        epoch.key_press_count += 1
+        self.rhythm.press(epoch, key, time.monotonic())
+        chord = self.chord_encoder.press(key)
+        if chord is not None:
+            epoch.key_counts.add(chord)
+
+    def on_keyboard_release(self, key):
+        self.rhythm.release(self.epoch, key, time.monotonic())
+        self.chord_encoder.release(key)
+
+    def on_mouse_click(self, x, y, button, pressed):
+        if pressed:
+            if button == mouse.Button.left:
+                self.epoch.left_mouse_click_count += 1
+            elif button == mouse.Button.right:
+                self.epoch.right_mouse_click_count += 1
+            elif button == mouse.Button.middle:
+                self.epoch.middle_mouse_click_count += 1
+
+    def on_mouse_move(self, x, y):
+        # Hot path, the distance is computed in batches by drain_mouse_motion()
+        self.motion.append(x, y)
+
+    def drain_mouse_motion(self):
+        stats = self.motion.drain()
+        self.epoch.mouse_movement_distance += (stats.pixel_distance / DPI) * INCH_TO_METER
+
+    def on_mouse_scroll(self,x, y, dx, dy):
+        self.epoch.mouse_scroll_distance += (abs(dx) + abs(dy)) * 0.001
+
+    def checkpoint(self):
+        """Journals the counters since the last checkpoint and adds them to the interval."""
+        with self.interval_lock:
+            epoch = self.retiring = self.swap_epoch()
+        # Best effort, not a guarantee: a callback that fetched the old epoch just before the
+        # swap gets EPOCH_GRACE_PERIOD to finish with it, one stalled for longer loses its count.
+        # Snapshots keep reading the retiring epoch meanwhile, the lock is not held.
+        try:
+            time.sleep(EPOCH_GRACE_PERIOD)
+        finally:
+            # Also on a Ctrl-C during the sleep, the log() that follows it would lose the epoch otherwise
+            self.journal.append(epoch)
+            with self.interval_lock:
+                self.interval.merge(epoch)
+                self.retiring = None
+
+    def log(self):
+        start = time.perf_counter()
+        self.checkpoint()
+        with self.interval_lock:
+            interval, self.interval = self.interval, Epoch(key_capacity=self.key_sketch_size)
+            self.logged_activity = tuple(map(sum, zip(self.logged_activity, interval.activity())))
+        self.write_log(interval)
+        self.journal.reset()
+        self.metrics.observe("log", time.perf_counter() - start)
+
+    def write_log(self, epoch, now=None):
+        with self.storage_lock:
+            self.metrics.bytes_written += self.storage.append(LogRow.from_epoch(epoch, now)) or 0
+            self.rollups.sync(self.storage)
+
+    def recover(self):
+        """Logs the interval a crashed tracker left in the journal."""
+        replayed = self.journal.replay(key_capacity=self.key_sketch_size)
+        self.journal.open()
+        if replayed is None:
+            return
+        epoch, logged_at = replayed
+        self.write_log(epoch, datetime.fromtimestamp(logged_at))
+        self.journal.reset()
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] - Recovered {epoch.key_press_count} key presses of an interval that was not logged.")
+
+    def compact(self):
+        with self.storage_lock:
+            cutoff = self.rollups.compact(self.storage, self.keep_raw_days)
+        if(self.print_log):
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] - Compacted raw logs before {cutoff}.")
+
+    def maybe_compact(self):
+        if self.keep_raw_days is None:
+            return
+        now = time.monotonic()
+        if self.last_compaction is not None and now - self.last_compaction < COMPACTION_INTERVAL:
+            return
+        self.last_compaction = now
+        # Rewriting the raw log can take a while, keep it off the run loop
+        threading.Thread(target=self.compact, name="compaction", daemon=True).start()
+
+    def compress_segments(self):
+        written = self.storage.compress_segments(self.storage_lock)
+        if written and self.print_log:
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] - Compressed {', '.join(written)}.")
+
+    def maybe_compress(self):
+        # Rotation only renames the log, compressing a month of it stays off the run loop
+        if self.compression_thread is not None and self.compression_thread.is_alive():
+            return
+        self.compression_thread = threading.Thread(target=self.compress_segments, name="compression", daemon=True)
+        self.compression_thread.start()
+
+    def start_ipc_server(self):
+        # The socket also keeps a second tracker from starting
+        try:
+            server = IpcServer(self)
+        except AlreadyRunning:
+            print("Another instance is already running.")
+            sys.exit()
+        except UntrustedSocket as e:
+            print(f"Can not serve the tracker socket: {e}")
+            sys.exit(1)
+        server.start()
+        return server
+
+    def start_live_feed(self):
+        try:
+            self.live_feed = LiveFeedWriter()
+        except OSError as e:
+            print(f"Live feed is not available: {e}")
+
+    def publish_live(self):
+        self.drain_mouse_motion()
+        with self.interval_lock:
+            activity = tuple(map(sum, zip(self.logged_activity, *(epoch.activity() for epoch in self.unlogged_epochs()))))
+        delta = [now - last for now, last in zip(activity, self.published_activity)]
+        self.published_activity = activity
+        self.live_feed.publish(int(time.time()), *delta, self.app_usage.current_app)
+
+    def unlogged_epochs(self):
+        """The interval, the retiring and the active epoch, call with interval_lock held."""
+        return [epoch for epoch in (self.interval, self.retiring, self.epoch) if epoch is not None]
+
+    def snapshot(self, top=None):
+        """Counters of the interval that is not logged yet, read while the listeners keep counting."""
+        totals = Totals()
+        with self.interval_lock:
+            since = self.interval.started_at
+            for epoch in self.unlogged_epochs():
+                totals.add(LogRow.from_epoch(epoch))
+            # Under the lock too, a checkpoint cuts the app usage into the epoch it swaps out
+            merge_dict(totals.app_counts, self.app_usage.peek())
+        totals.rows = 0
+        if top is not None:
+            totals.key_counts = dict(sorted(totals.key_counts.items(), key=lambda x: x[1], reverse=True)[:top])
+        return {
+            "since": since,
+            "now": time.time(),
+            "focused_app": self.app_usage.current_app,
+            "live_wpm": self.rhythm.live_wpm(time.monotonic()),
+            "totals": totals.to_dict(),
+        }
+
+    def status(self):
+        return {
+            "pid": os.getpid(),
+            "started_at": self.started_at,
+            "uptime": time.time() - self.started_at,
+            "log_file": self.log_file_path,
+            "focus": "events" if self.focus_is_event_driven() else "polling",
+            "motion_dropped": self.motion.dropped,
+            "scheduler": self.scheduler.stats(),
+        }
+
+    def metrics_snapshot(self):
+        return {
+            **self.metrics.snapshot(),
+            "motion_dropped": self.motion.dropped,
+            "scheduler": self.scheduler.stats(),
+        }
+
+    def publish_metrics(self):
+        self.metrics.tick()
+        if self.metrics_textfile:
+            try:
+                write_textfile(self.metrics_textfile, prometheus_text(self.metrics_snapshot()))
+            except OSError as e:
+                print(f"[{datetime.now().strftime('%H:%M:%S')}] - Could not write {self.metrics_textfile}: {e}")
+        
+    def flush(self):
+        self.log()
+        if(self.print_log):
+            now = datetime.now()
+            log_time = now.strftime("%H:%M:%S")
+            #self.console.log("Logged", log_locals=False, highlight=True)
+
+            print(f"[{log_time}] - Logged {self.scheduler.jobs['flush'].last_lag:.3f}s after the deadline. Typing at {self.rhythm.live_wpm(time.monotonic()):.0f} wpm.")
+            if self.motion.dropped:
+                print(f"[{log_time}] - Mouse buffer overflowed {self.motion.overflows} times, {self.motion.dropped} samples dropped.")
+            for name, stats in self.scheduler.stats().items():
+                if stats["overruns"]:
+                    print(f"[{log_time}] - {name} missed {stats['overruns']} deadlines, max lag {stats['max_lag']:.3f}s, max duration {stats['max_duration']:.3f}s.")
+        self.maybe_compact()
+        self.maybe_compress()
+
+    def run(self):
+        server = self.start_ipc_server()
+        self.recover()
+        self.maybe_compress()
+        self.install_signal_handlers()
+        self.start_listeners()
+        self.start_focus_watcher()
+        self.start_live_feed()
+        if not self.focus_is_event_driven():
+            # Focus changes are pushed by the watcher when there is one, no 1 Hz wakeups then
+            self.start_focus_polling()
+        if self.live_feed is not None:
+            self.scheduler.add("live", LIVE_FEED_INTERVAL, self.publish_live)
+        self.scheduler.add("motion", MOTION_DRAIN_INTERVAL, self.drain_mouse_motion)
+        self.scheduler.add("metrics", METRICS_INTERVAL, self.publish_metrics)
+        self.scheduler.add("journal", self.journal_interval, self.checkpoint)
+        if self.journal.fsync_interval:
+            self.scheduler.add("fsync", self.journal.fsync_interval, lambda: self.journal.sync(force=True))
+        # Intervals end on the :00 and :30 of the wall clock
+        self.scheduler.add("flush", LOG_INTERVAL, self.flush, align=True)
+        try:
+            self.scheduler.run()
+        except KeyboardInterrupt:
+            self.log()
+            now = datetime.now()
+            log_time = now.strftime("%H:%M:%S")
+            print(f"\n[{log_time}] Tracker stopped. Last activities are logged.")
+
+        if self.focus_watcher is not None:
+            self.focus_watcher.stop()
+        self.profiler.close()
+        self.journal.close()
+        if self.live_feed is not None:
+            self.live_feed.close()
+        server.close()
+        
+    def run_tui(self):
+        print("Log: " + str(self.print_log))
+        print("Path: " + self.log_file_path)
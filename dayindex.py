@@ -0,0 +1,83 @@
+"""
+    File name: dayindex.py
+    Author: Emek Kırarslan (bozbulanik)
+    License: GNU-GPLv3
+"""
+
+import bisect
+import os
+
+from records import day_key
+
+
+class DayIndex:
+    """Sparse index of a log file: YYYY-MM-DD -> byte offset of the first row of that day.
+
+    Kept as a small text file next to the log and appended to whenever a row of a new
+    day is written, so range queries can seek straight to the first matching row.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.days = []
+        self.offsets = []
+
+    def load(self):
+        self.days, self.offsets = [], []
+        try:
+            with open(self.path, 'r') as f:
+                for line in f:
+                    day, offset = line.split()
+                    self.days.append(day)
+                    self.offsets.append(int(offset))
+        except (OSError, ValueError):
+            self.days, self.offsets = [], []
+            return False
+        return True
+
+    @property
+    def last_day(self):
+        return self.days[-1] if self.days else None
+
+    def add(self, day, offset):
+        if day == self.last_day:
+            return
+        self.days.append(day)
+        self.offsets.append(offset)
+        with open(self.path, 'a') as f:
+            f.write(f"{day} {offset}\n")
+
+    def is_valid_for(self, log_file):
+        """Spot checks the first and last entries against the rows they point at."""
+        if not self.days:
+            return False
+        size = log_file.seek(0, os.SEEK_END)
+        for i in {0, len(self.days) - 1}:
+            if self.offsets[i] >= size:
+                return False
+            log_file.seek(self.offsets[i])
+            try:
+                if day_key(log_file.read(10).decode('utf-8')) != self.days[i]:
+                    return False
+            except ValueError:
+                return False
+        return True
+
+    def rebuild(self, entries):
+        """Rewrites the index from (day, offset) pairs, one per row in file order."""
+        self.days, self.offsets = [], []
+        for day, offset in entries:
+            if day != self.last_day:
+                self.days.append(day)
+                self.offsets.append(offset)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            f.writelines(f"{day} {offset}\n" for day, offset in zip(self.days, self.offsets))
+        os.replace(tmp_path, self.path)
+
+    def byte_range(self, since, until, end):
+        """Byte range [start, stop) holding the rows of since..until (YYYY-MM-DD keys, inclusive)."""
+        first = bisect.bisect_left(self.days, since) if since else 0
+        last = bisect.bisect_right(self.days, until) if until else len(self.days)
+        start = self.offsets[first] if first < len(self.offsets) else end
+        stop = self.offsets[last] if last < len(self.offsets) else end
+        return start, max(start, stop)
@@ -0,0 +1,110 @@
+"""
+    File name: downsample.py
+    Author: Emek Kırarslan (bozbulanik)
+    License: GNU-GPLv3
+"""
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DOWNSAMPLE_MODES = ("points", "minmax", "lttb")
+
+
+def column_ranges(xs, ys, x_min, x_max, columns):
+    """Lowest and highest y of the points falling into each of columns pixel columns.
+
+    Returns two lists, None for the columns without points. A point goes to column
+    int((x - x_min) / (x_max - x_min) * (columns - 1)), the same as plot_scatter.
+    """
+    span = (x_max - x_min) or 1
+    if np is not None:
+        x = np.asarray(xs, dtype=np.float64)
+        y = np.asarray(ys, dtype=np.float64)
+        position = (x - x_min) / span * (columns - 1)
+        keep = (position >= 0) & (position < columns)
+        column = position[keep].astype(np.int64)
+        y = y[keep]
+        lows = np.full(columns, np.inf)
+        highs = np.full(columns, -np.inf)
+        np.minimum.at(lows, column, y)
+        np.maximum.at(highs, column, y)
+        empty = np.isinf(lows)
+        return ([None if e else float(v) for e, v in zip(empty, lows)],
+                [None if e else float(v) for e, v in zip(empty, highs)])
+
+    lows = [None] * columns
+    highs = [None] * columns
+    scale = (columns - 1) / span
+    for x, y in zip(xs, ys):
+        position = (x - x_min) * scale
+        if 0 <= position < columns:
+            column = int(position)
+            if lows[column] is None:
+                lows[column] = highs[column] = y
+            elif y < lows[column]:
+                lows[column] = y
+            elif y > highs[column]:
+                highs[column] = y
+    return lows, highs
+
+
+def cells(xs, ys, x_min, x_max, y_min, y_max, columns, rows):
+    """Distinct (column, row) cells the points fall into, the points outside are dropped."""
+    x_scale = (columns - 1) / ((x_max - x_min) or 1)
+    y_scale = (rows - 1) / ((y_max - y_min) or 1)
+    if np is not None:
+        column = (np.asarray(xs, dtype=np.float64) - x_min) * x_scale
+        row = (np.asarray(ys, dtype=np.float64) - y_min) * y_scale
+        keep = (column >= 0) & (column < columns) & (row >= 0) & (row < rows)
+        index = np.unique(column[keep].astype(np.int64) * rows + row[keep].astype(np.int64))
+        return [(int(i // rows), int(i % rows)) for i in index]
+    found = set()
+    for x, y in zip(xs, ys):
+        column = (x - x_min) * x_scale
+        row = (y - y_min) * y_scale
+        if 0 <= column < columns and 0 <= row < rows:
+            found.add((int(column), int(row)))
+    return sorted(found)
+
+
+def lttb(xs, ys, threshold):
+    """Indices of the points Largest-Triangle-Three-Buckets keeps out of xs/ys (sorted by x).
+
+    Keeps the first and last point and, from each of threshold - 2 buckets in between, the
+    one making the largest triangle with the point kept before it and the next bucket's mean.
+    """
+    n = len(xs)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+    if np is not None:
+        x = np.asarray(xs, dtype=np.float64)
+        y = np.asarray(ys, dtype=np.float64)
+    else:
+        x, y = xs, ys
+    bucket_size = (n - 2) / (threshold - 2)
+    kept = [0]
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        if np is not None:
+            mean_x = x[end:next_end].mean()
+            mean_y = y[end:next_end].mean()
+            areas = np.abs((x[a] - mean_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (mean_y - y[a]))
+            a = start + int(areas.argmax())
+        else:
+            count = next_end - end
+            mean_x = sum(x[end:next_end]) / count
+            mean_y = sum(y[end:next_end]) / count
+            best = -1.0
+            for j in range(start, end):
+                area = abs((x[a] - mean_x) * (y[j] - y[a]) - (x[a] - x[j]) * (mean_y - y[a]))
+                if area > best:
+                    best, best_j = area, j
+            a = best_j
+        kept.append(a)
+    kept.append(n - 1)
+    return kept
@@ -0,0 +1,171 @@
+"""
+    File name: focus.py
+    Author: Emek Kırarslan (bozbulanik)
+    License: GNU-GPLv3
+"""
+
+import threading
+import time
+
+try:
+    from Xlib import X, display as xdisplay, error as xerror
+except ImportError:
+    xdisplay = None
+
+
+class FocusWatcherUnavailable(Exception):
+    pass
+
+
+class FocusWatcher(threading.Thread):
+    """Listens for focus changes on the X root window and reports the focused pid.
+
+    on_focus_change(pid) is called from the watcher thread only when the active
+    window, its _NET_WM_PID or its title changes. pid is None when nothing is focused.
+    on_lost() is called from the watcher thread if the X connection closes before stop().
+    """
+    def __init__(self, on_focus_change, display_name=None, on_lost=None):
+        super().__init__(name="focus-watcher", daemon=True)
+        if xdisplay is None:
+            raise FocusWatcherUnavailable("python-xlib is not installed")
+        try:
+            self.display = xdisplay.Display(display_name)
+        except (xerror.DisplayError, xerror.ConnectionClosedError) as e:
+            raise FocusWatcherUnavailable(str(e))
+
+        self.on_focus_change = on_focus_change
+        self.on_lost = on_lost
+        self.root = self.display.screen().root
+        self.NET_ACTIVE_WINDOW = self.display.intern_atom('_NET_ACTIVE_WINDOW')
+        self.NET_WM_PID = self.display.intern_atom('_NET_WM_PID')
+        self.NET_WM_NAME = self.display.intern_atom('_NET_WM_NAME')
+        self.WM_NAME = self.display.intern_atom('WM_NAME')
+        self.window_atoms = (self.NET_WM_PID, self.NET_WM_NAME, self.WM_NAME)
+
+        self.active_window = None
+        self.active_window_id = None
+        self.pid = None
+        self.stopped = False
+
+        self.root.change_attributes(event_mask=X.PropertyChangeMask)
+
+    def get_active_window_id(self):
+        prop = self.root.get_full_property(self.NET_ACTIVE_WINDOW, X.AnyPropertyType)
+        if prop is None or len(prop.value) == 0:
+            return None
+        return int(prop.value[0]) or None
+
+    def get_window_pid(self, window):
+        try:
+            prop = window.get_full_property(self.NET_WM_PID, X.AnyPropertyType)
+        except xerror.XError:
+            return None
+        if prop is None or len(prop.value) == 0:
+            return None
+        return int(prop.value[0])
+
+    def watch_window(self, window_id):
+        if self.active_window is not None:
+            try:
+                self.active_window.change_attributes(event_mask=X.NoEventMask)
+            except xerror.XError:
+                pass  # Window is already gone
+        self.active_window_id = window_id
+        self.active_window = None
+        if window_id is not None:
+            self.active_window = self.display.create_resource_object('window', window_id)
+            try:
+                self.active_window.change_attributes(event_mask=X.PropertyChangeMask)
+            except xerror.XError:
+                self.active_window = None
+
+    def refresh(self, force=False):
+        """Re-reads the active window and notifies if the focused pid changed."""
+        window_id = self.get_active_window_id()
+        if window_id != self.active_window_id:
+            self.watch_window(window_id)
+            force = True
+
+        pid = self.get_window_pid(self.active_window) if self.active_window is not None else None
+        if force or pid != self.pid:
+            self.pid = pid
+            self.on_focus_change(pid)
+
+    def handle_event(self, event):
+        if event.type != X.PropertyNotify:
+            return
+        if event.window.id == self.root.id:
+            if event.atom == self.NET_ACTIVE_WINDOW:
+                self.refresh()
+        elif event.window.id == self.active_window_id and event.atom in self.window_atoms:
+            # A title change usually means a program was started inside a terminal
+            self.refresh(force=True)
+
+    def run(self):
+        self.refresh(force=True)
+        while not self.stopped:
+            try:
+                self.handle_event(self.display.next_event())
+            except xerror.ConnectionClosedError:
+                break
+        if not self.stopped and self.on_lost is not None:
+            self.on_lost()
+
+    def stop(self):
+        self.stopped = True
+        try:
+            self.display.close()
+        except Exception:
+            pass
+
+
+class AppUsage:
+    """Records app usage as focus intervals (app, start, end) on the monotonic clock.
+
+    switch() closes the running interval when focus moves to another app and cut()
+    closes it at a log boundary, returning the seconds spent per app since the last cut.
+    """
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.intervals = []
+        self.current_app = None
+        self.current_start = None
+
+    def switch(self, app, now=None):
+        with self.lock:
+            if app == self.current_app:
+                return
+            now = self.clock() if now is None else now
+            self.close_interval(now)
+            self.current_app = app
+            self.current_start = now if app is not None else None
+
+    def close_interval(self, now):
+        if self.current_app is not None and now > self.current_start:
+            self.intervals.append((self.current_app, self.current_start, now))
+
+    def cut(self, now=None):
+        with self.lock:
+            now = self.clock() if now is None else now
+            self.close_interval(now)
+            if self.current_app is not None:
+                self.current_start = now
+            intervals, self.intervals = self.intervals, []
+
+        durations = {}
+        for app, start, end in intervals:
+            durations[app] = durations.get(app, 0) + (end - start)
+        return {app: round(seconds, 2) for app, seconds in durations.items()}
+
+    def peek(self, now=None):
+        """Seconds per app since the last cut, without cutting."""
+        with self.lock:
+            now = self.clock() if now is None else now
+            intervals = list(self.intervals)
+            if self.current_app is not None and now > self.current_start:
+                intervals.append((self.current_app, self.current_start, now))
+        durations = {}
+        for app, start, end in intervals:
+            durations[app] = durations.get(app, 0) + (end - start)
+        return durations
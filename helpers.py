@@ -13,29 +13,64 @@ Commands:
     start                 Starts the tracker.
     tui                   Start the graphical (TUI) version.
     report                Generate and display a report of the results.
+    stats                 Show runtime metrics of the running tracker.
+    profile               Start or stop profiling the running tracker.
+    export FILE           Export the logs to a CSV file.
     help [COMMAND]        Show general help or help about a specific subcommand.
 
 Options:
     -d, --dir DIRECTORY   Start the program with the specified directory for log file.
     -h, --help            Show this help message and exit.
     -l, --log             Print program logs.
+    -s, --storage TYPE    Storage backend for the logs: csv (log.csv, default) or sqlite (tracker.db).
     -v, --version         Print version.
 
 """
 
 START_HELP_TEXT = r"""
-Usage: tracker [OPTIONS] start 
+Usage: tracker [OPTIONS] start [-k DAYS] [--rotate POLICY] [--rotate-size MB] [--compression TYPE] [--sketch-size N]
+                             [--journal-interval SECONDS] [--fsync-interval SECONDS] [--metrics-textfile FILE]
 
 tracker-start for tracker
 
 Options:
     -d, --dir DIRECTORY   Start the program with the specified directory for log file.
+    -k, --keep-raw DAYS   Once a day, compact raw rows older than DAYS into the hourly, daily
+                          and monthly rollups. Off by default.
+    --rotate POLICY       Rotate log.csv into a compressed segment every month (default),
+                          once it reaches --rotate-size (size) or never.
+    --rotate-size MB      Segment size for --rotate size (default: 64).
+    --compression TYPE    gzip, xz or zstd. Defaults to the best one this Python has.
+    --sketch-size N       Most distinct key chords kept per interval (default: 256, at most
+                          65535). Rarer chords are folded into error bounds, reports show how
+                          much lower a share may be as (-x%).
+    --journal-interval SECONDS
+                          How often the counts are appended to the crash journal, the most
+                          a crash or kill of the tracker can lose (default: 5).
+    --fsync-interval SECONDS
+                          How often the journal is flushed to disk, the most a power loss
+                          can lose (default: 30, 0 flushes every append).
+    --metrics-textfile FILE
+                          Every 15 seconds, atomically replace FILE with the runtime metrics
+                          in the Prometheus text format, for the node_exporter textfile
+                          collector (e.g. /var/lib/node_exporter/textfile/tracker.prom).
     
 Description:
-    Starts the tracking app in the background and logs what it tracked to log.csv file.
+    Starts the tracking app in the background and logs what it tracked to log.csv file
+    every half hour, on the :00 and :30 of the clock.
+    Every log also updates the hourly, daily and monthly rollups (log.csv.tiers.db),
+    ranged reports read those instead of the raw rows.
+    Rotated segments are listed in log.csv.manifest.json, compressed in the background and
+    read transparently by reports.
+    Counts not logged yet are kept in log.csv.journal, after a crash they are logged on the
+    next start. While running, the tracker answers status, snapshot, metrics, top-keys and
+    subscribe requests on $XDG_RUNTIME_DIR/tracker-UID.sock, or in a private /tmp/tracker-UID
+    directory without it (one tracker per user), and
+    publishes the last 5 minutes of per second activity in shared memory for the TUI.
 
 Examples:
     tracker start
+    tracker start -k 90
     tracker -d /path/to/dir start
 """
 TUI_HELP_TEXT = r"""
@@ -55,20 +90,89 @@ Examples:
     tracker -d /path/to/dir tui
 """
 REPORT_HELP_TEXT = r"""
-Usage: tracker [OPTIONS] report 
+Usage: tracker [OPTIONS] report [-j JOBS] [--since DAY] [--until DAY] [--live]
 
 tracker-report for tracker
 
 Options:
     -d, --dir DIRECTORY   Start the program with the specified directory for log file.
+    -j, --jobs JOBS       Number of processes used to parse a large log.csv (default: all cores).
+    --since DAY           Only report from this day on. DAY is YYYY-MM-DD, dd/mm/YYYY, today,
+                          yesterday or relative to today (7d, 2w, 1m, 1y).
+    --until DAY           Only report up to and including this day.
+    --live                Report the interval the running tracker has not logged yet, read
+                          from it directly instead of from the log.
 
 Description:
-    Prints a report from a specified log.csv file to the terminal.
+    Prints a report from a specified log.csv file to the terminal. Besides the counts it shows
+    the typing speed and the p50/p95/p99 inter-key latency and key hold time over the range.
 
 Examples:
     tracker report
+    tracker report -j 4
+    tracker report --since 7d
+    tracker report --since 2024-10-01 --until 2024-10-31
+    tracker report --live
     tracker -d /path/to/dir report
 """
+STATS_HELP_TEXT = r"""
+Usage: tracker stats [--json | --prometheus]
+
+tracker-stats for tracker
+
+Options:
+    --json                Print the metrics as JSON.
+    --prometheus          Print the metrics in the Prometheus text format.
+
+Description:
+    Asks the running tracker how it is doing: events and events per second of every input
+    listener with their callback latencies (one call in 16 is timed), the time spent in
+    focus subprocesses and logging, log bytes written, scheduler lag and overruns, and
+    resident memory.
+
+Examples:
+    tracker stats
+    tracker stats --prometheus
+"""
+PROFILE_HELP_TEXT = r"""
+Usage: tracker profile [-m]
+
+tracker-profile for tracker
+
+Options:
+    -m, --memory          Toggle tracemalloc instead of the CPU profilers.
+
+Description:
+    Starts profiling the running tracker, the next call stops it and writes the results to
+    the log directory. Capture goes on the whole time, the interval is not lost.
+    CPU profiling (SIGUSR1) runs cProfile on the run loop, written as profile-*.pstats, and
+    samples the stacks of every thread, listeners included, every 5 ms into
+    profile-*.collapsed (for flamegraph.pl or speedscope).
+    Memory profiling (SIGUSR2) traces allocations with tracemalloc and writes the snapshot
+    (tracemalloc-*.snapshot) and what the key/app counters and everything else grew by in
+    between (tracemalloc-*.txt).
+    The signals can also be sent directly: kill -USR1 PID
+
+Examples:
+    tracker profile
+    tracker profile --memory
+"""
+EXPORT_HELP_TEXT = r"""
+Usage: tracker [OPTIONS] export FILE
+
+tracker-export for tracker
+
+Options:
+    -d, --dir DIRECTORY   Start the program with the specified directory for log file.
+    -s, --storage TYPE    Storage backend to export from.
+
+Description:
+    Writes every logged interval of the selected storage backend to a CSV file.
+
+Examples:
+    tracker -s sqlite export log.csv
+    tracker -d /path/to/dir -s sqlite export /path/to/export.csv
+"""
 HELP_HELP_TEXT = r"""
 Usage: tracker help [COMMAND]
 
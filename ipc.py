@@ -0,0 +1,212 @@
+"""
+    File name: ipc.py
+    Author: Emek Kırarslan (bozbulanik)
+    License: GNU-GPLv3
+"""
+
+import json
+import math
+import os
+import socket
+import socketserver
+import stat
+import struct
+import tempfile
+import threading
+import time
+
+SUBSCRIBE_INTERVAL = 1.0  # Seconds between snapshots pushed to subscribers
+MIN_SUBSCRIBE_INTERVAL = 0.1  # Shorter intervals are raised to this, a subscriber can not spin the server
+TOP_KEYS = 10
+
+
+class AlreadyRunning(Exception):
+    pass
+
+
+class TrackerNotRunning(Exception):
+    pass
+
+
+class UntrustedSocket(TrackerNotRunning):
+    """The socket is not served by a tracker of this user, its replies are not used."""
+
+
+def runtime_dir():
+    """$XDG_RUNTIME_DIR, or a private tracker-UID directory in the world writable temp dir.
+
+    Anyone can create files in /tmp, the directory has to exist as ours with mode 0700
+    before a socket in it is trusted.
+    """
+    if os.environ.get("XDG_RUNTIME_DIR"):
+        return os.environ["XDG_RUNTIME_DIR"]
+    path = os.path.join(tempfile.gettempdir(), f"tracker-{os.getuid()}")
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise UntrustedSocket(f"{path} is not a private directory of this user")
+    return path
+
+
+def socket_path():
+    """Per user socket of the running tracker."""
+    return os.path.join(runtime_dir(), f"tracker-{os.getuid()}.sock")
+
+
+def peer_credentials(sock):
+    """(pid, uid, gid) of the process on the other end of a Unix socket, None where unsupported."""
+    if not hasattr(socket, "SO_PEERCRED"):
+        return None
+    return struct.unpack("3i", sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i")))
+
+
+def encode(message):
+    return json.dumps(message, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b"\n"
+
+
+def is_running(path):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except OSError:
+        return False
+    finally:
+        sock.close()
+    return True
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    """One client, one request per line: status, snapshot, metrics, top-keys [N] or subscribe [SECONDS]."""
+    def handle(self):
+        for line in self.rfile:
+            # Undecodable bytes become an unknown command, they must not kill the handler
+            command, *args = line.decode('utf-8', 'replace').split() or [""]
+            if command == "subscribe":
+                self.subscribe(args)
+                return
+            self.wfile.write(encode(self.server.dispatch(command, args)))
+
+    def subscribe(self, args):
+        try:
+            interval = float(args[0]) if args else SUBSCRIBE_INTERVAL
+        except ValueError:
+            interval = math.nan
+        if not math.isfinite(interval):
+            self.wfile.write(encode({"error": f"Invalid interval: {args[0]}"}))
+            return
+        interval = max(interval, MIN_SUBSCRIBE_INTERVAL)
+        while not self.server.closed:
+            try:
+                self.wfile.write(encode(self.server.dispatch("snapshot", [])))
+                self.wfile.flush()
+            except OSError:
+                return  # Subscriber went away
+            time.sleep(interval)
+
+
+class IpcServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Serves the live counters of a running Tracker over a Unix socket.
+
+    Binding the socket also makes sure only one tracker runs per user, a second one finds
+    the first answering on it.
+    """
+    daemon_threads = True
+
+    def __init__(self, tracker, path=None):
+        path = path or socket_path()
+        if is_running(path):
+            raise AlreadyRunning(path)
+        try:
+            os.unlink(path)  # Left behind by a tracker that did not exit cleanly
+        except FileNotFoundError:
+            pass
+        # Private from the moment it is bound, a chmod afterwards leaves a window open
+        umask = os.umask(0o177)
+        try:
+            super().__init__(path, RequestHandler)
+        finally:
+            os.umask(umask)
+        self.path = path
+        self.tracker = tracker
+        self.closed = False
+        self.thread = None
+
+    def dispatch(self, command, args):
+        try:
+            if command == "status":
+                return self.tracker.status()
+            if command == "snapshot":
+                return self.tracker.snapshot()
+            if command == "metrics":
+                return self.tracker.metrics_snapshot()
+            if command == "top-keys":
+                return self.tracker.snapshot(top=int(args[0]) if args else TOP_KEYS)
+        except Exception as e:
+            return {"error": f"{command} failed: {e}"}
+        return {"error": f"Unknown command: {command}"}
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, name="ipc", daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.closed = True
+        if self.thread is not None:
+            self.shutdown()
+        self.server_close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class IpcClient:
+    """Queries the running tracker, raises TrackerNotRunning when there is none.
+
+    pid is the tracker's process id as the kernel reports it, not as the tracker claims it.
+    """
+    def __init__(self, path=None, timeout=2.0):
+        self.path = path or socket_path()
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        try:
+            self.sock.connect(self.path)
+        except OSError:
+            self.sock.close()
+            raise TrackerNotRunning(self.path)
+        credentials = peer_credentials(self.sock)
+        if credentials is not None and credentials[1] != os.getuid():
+            self.sock.close()
+            raise UntrustedSocket(f"{self.path} is served by uid {credentials[1]}")
+        self.pid = credentials[0] if credentials is not None else None
+        self.reader = self.sock.makefile('rb')
+
+    def request(self, command, *args):
+        self.sock.sendall(" ".join([command, *map(str, args)]).encode('utf-8') + b"\n")
+        return self.read()
+
+    def read(self):
+        line = self.reader.readline()
+        if not line:
+            raise TrackerNotRunning(self.path)
+        return json.loads(line)
+
+    def subscribe(self, interval=SUBSCRIBE_INTERVAL):
+        """Yields a snapshot every interval seconds until the tracker stops."""
+        self.sock.settimeout(None)
+        self.sock.sendall(f"subscribe {interval}\n".encode('utf-8'))
+        while True:
+            yield self.read()
+
+    def close(self):
+        self.reader.close()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
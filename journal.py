@@ -0,0 +1,156 @@
+"""
+    File name: journal.py
+    Author: Emek Kırarslan (bozbulanik)
+    License: GNU-GPLv3
+"""
+
+import os
+import struct
+import time
+import zlib
+
+from counters import Epoch
+
+JOURNAL_MAGIC = b"TRKJ\x01"
+JOURNAL_INTERVAL = 5  # Seconds between journaled deltas, the most a crash of the tracker can lose
+FSYNC_INTERVAL = 30  # Seconds between fsyncs, the most a power loss can lose
+
+RECORD_HEADER = struct.Struct("<II")  # Payload length, crc32 of the payload
+TOTALS = struct.Struct("<dQQQQddQd")
+COUNT = struct.Struct("<Hdd")
+BUCKET = struct.Struct("<HQ")
+MAX_SKETCH_ITEMS = 0xffff  # Items per sketch a record can hold, the count is a uint16
+
+
+def encode_counts(sketch):
+    parts = [struct.pack("<H", len(sketch.counts))]
+    for item, count in sketch.counts.items():
+        name = item.encode('utf-8')
+        parts.append(COUNT.pack(len(name), count, sketch.errors.get(item, 0)))
+        parts.append(name)
+    return b"".join(parts)
+
+
+def decode_counts(sketch, payload, offset, cast):
+    (n,) = struct.unpack_from("<H", payload, offset)
+    offset += 2
+    for _ in range(n):
+        length, count, error = COUNT.unpack_from(payload, offset)
+        offset += COUNT.size
+        item = payload[offset:offset + length].decode('utf-8')
+        offset += length
+        sketch.counts[item] = cast(count)
+        sketch.errors[item] = cast(error)
+    return offset
+
+
+def encode_histogram(histogram):
+    buckets = [(b, c) for b, c in enumerate(histogram.counts) if c]
+    return struct.pack("<H", len(buckets)) + b"".join(BUCKET.pack(b, c) for b, c in buckets)
+
+
+def decode_histogram(histogram, payload, offset):
+    (n,) = struct.unpack_from("<H", payload, offset)
+    offset += 2
+    for _ in range(n):
+        bucket, count = BUCKET.unpack_from(payload, offset)
+        offset += BUCKET.size
+        histogram.counts[bucket] += count
+    return offset
+
+
+def encode_epoch(epoch, logged_at):
+    return b"".join([
+        TOTALS.pack(logged_at, epoch.key_press_count, epoch.left_mouse_click_count, epoch.right_mouse_click_count,
+                    epoch.middle_mouse_click_count, epoch.mouse_movement_distance, epoch.mouse_scroll_distance,
+                    epoch.typed_chars, epoch.typing_seconds),
+        encode_counts(epoch.key_counts),
+        encode_counts(epoch.app_counts),
+        encode_histogram(epoch.inter_key),
+        encode_histogram(epoch.key_hold),
+    ])
+
+
+def decode_epoch(payload, epoch):
+    (logged_at, epoch.key_press_count, epoch.left_mouse_click_count, epoch.right_mouse_click_count,
+     epoch.middle_mouse_click_count, epoch.mouse_movement_distance, epoch.mouse_scroll_distance,
+     epoch.typed_chars, epoch.typing_seconds) = TOTALS.unpack_from(payload, 0)
+    offset = decode_counts(epoch.key_counts, payload, TOTALS.size, int)
+    offset = decode_counts(epoch.app_counts, payload, offset, float)
+    offset = decode_histogram(epoch.inter_key, payload, offset)
+    decode_histogram(epoch.key_hold, payload, offset)
+    return logged_at
+
+
+class Journal:
+    """Append-only binary journal of the counters of the interval that is not logged yet.
+
+    Every few seconds the tracker appends the counters gathered since the last record.
+    Records reach the OS on every append (safe from a crash of the tracker) and the disk
+    with one fsync per fsync_interval for all of them (group commit). Once the interval
+    is logged the journal is truncated, a journal left behind by a crash is replayed on
+    the next start. A torn record at the end, from a crash while appending, is ignored.
+    """
+    def __init__(self, path, fsync_interval=FSYNC_INTERVAL):
+        self.path = path
+        self.fsync_interval = fsync_interval
+        self.fd = None
+        self.last_fsync = time.monotonic()
+        self.unsynced = 0
+
+    def open(self):
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o600)
+        if os.fstat(self.fd).st_size < len(JOURNAL_MAGIC):
+            self.reset()
+
+    def replay(self, key_capacity=None):
+        """Merges every intact record into one Epoch. Returns (epoch, wall clock time of the last record) or None."""
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        if not data.startswith(JOURNAL_MAGIC):
+            return None
+        merged = None
+        logged_at = None
+        offset = len(JOURNAL_MAGIC)
+        while offset + RECORD_HEADER.size <= len(data):
+            length, crc = RECORD_HEADER.unpack_from(data, offset)
+            payload = data[offset + RECORD_HEADER.size:offset + RECORD_HEADER.size + length]
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                break
+            epoch = Epoch() if key_capacity is None else Epoch(key_capacity=key_capacity)
+            logged_at = decode_epoch(payload, epoch)
+            merged = epoch if merged is None else merged.merge(epoch)
+            offset += RECORD_HEADER.size + length
+        if merged is None:
+            return None
+        return merged, logged_at
+
+    def append(self, epoch, logged_at=None):
+        payload = encode_epoch(epoch, logged_at or time.time())
+        os.write(self.fd, RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload)
+        self.unsynced += 1
+        self.sync()
+
+    def sync(self, force=False):
+        now = time.monotonic()
+        if self.unsynced and (force or now - self.last_fsync >= self.fsync_interval):
+            os.fsync(self.fd)
+            self.unsynced = 0
+            self.last_fsync = now
+
+    def reset(self):
+        """Drops every record, once their interval is safely logged."""
+        os.ftruncate(self.fd, 0)
+        os.write(self.fd, JOURNAL_MAGIC)
+        os.fsync(self.fd)
+        self.unsynced = 0
+        self.last_fsync = time.monotonic()
+
+    def close(self):
+        if self.fd is not None:
+            self.sync(force=True)
+            os.close(self.fd)
+            self.fd = None
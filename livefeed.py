@@ -0,0 +1,145 @@
+"""
+    File name: livefeed.py
+    Author: Emek Kırarslan (bozbulanik)
+    License: GNU-GPLv3
+"""
+
+import os
+import struct
+import time
+from multiprocessing import shared_memory
+
+try:
+    from multiprocessing import resource_tracker
+except ImportError:
+    resource_tracker = None
+
+LIVE_FEED_SECONDS = 300  # Seconds of history kept in the ring
+LIVE_FEED_MAGIC = 0x54524b4c  # "TRKL"
+LIVE_FEED_VERSION = 1
+STALE_AFTER = 5  # Seconds without a published second before the feed counts as dead
+APP_NAME_BYTES = 64
+SLOT_READ_RETRIES = 50  # A slot write takes microseconds, one that stays odd was left by a dead writer
+SLOT_RETRY_SLEEP = 0.0001
+
+HEADER = struct.Struct("<IIIIQ")  # Magic, version, capacity, slot size, seconds published so far
+SLOT = struct.Struct(f"<IqIIdd{APP_NAME_BYTES}s")  # Sequence, second, keys, clicks, meters, scroll, app
+
+
+def feed_name():
+    return f"tracker-live-{os.getuid()}"
+
+
+class LiveSecond:
+    __slots__ = ("second", "keys", "clicks", "mouse_distance", "scroll_distance", "app")
+
+    def __init__(self, second, keys, clicks, mouse_distance, scroll_distance, app):
+        self.second = second
+        self.keys = keys
+        self.clicks = clicks
+        self.mouse_distance = mouse_distance
+        self.scroll_distance = scroll_distance
+        self.app = app
+
+
+class LiveFeedWriter:
+    """Publishes per second counters of the running tracker into a shared memory ring.
+
+    Every slot has its own sequence number, odd while the slot is being written (a seqlock),
+    so readers in other processes never see a half written second and never block the writer.
+    """
+    def __init__(self, name=None, capacity=LIVE_FEED_SECONDS):
+        self.capacity = capacity
+        size = HEADER.size + capacity * SLOT.size
+        name = name or feed_name()
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # Left behind by a tracker that did not exit cleanly
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        self.buf = self.shm.buf
+        self.published = 0
+        HEADER.pack_into(self.buf, 0, LIVE_FEED_MAGIC, LIVE_FEED_VERSION, capacity, SLOT.size, 0)
+
+    def publish(self, second, keys, clicks, mouse_distance, scroll_distance, app):
+        offset = HEADER.size + (self.published % self.capacity) * SLOT.size
+        (sequence,) = struct.unpack_from("<I", self.buf, offset)
+        struct.pack_into("<I", self.buf, offset, (sequence + 1) & 0xffffffff)  # Odd, being written
+        SLOT.pack_into(self.buf, offset, (sequence + 1) & 0xffffffff, second, keys, clicks, mouse_distance, scroll_distance,
+                       (app or "").encode('utf-8')[:APP_NAME_BYTES])
+        struct.pack_into("<I", self.buf, offset, (sequence + 2) & 0xffffffff)
+        self.published += 1
+        struct.pack_into("<Q", self.buf, HEADER.size - 8, self.published)
+
+    def close(self):
+        self.buf = None
+        self.shm.close()
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class LiveFeedReader:
+    """Maps the ring of a running tracker. attach() is cheap to retry until there is one."""
+    def __init__(self, name=None):
+        self.name = name or feed_name()
+        self.shm = None
+        self.buf = None
+        self.capacity = 0
+
+    def attach(self):
+        if self.buf is not None:
+            return True
+        try:
+            shm = shared_memory.SharedMemory(name=self.name)
+        except FileNotFoundError:
+            return False
+        if resource_tracker is not None:
+            # Python < 3.13 would unlink the tracker's segment when this reader exits
+            try:
+                resource_tracker.unregister(shm._name, "shared_memory")
+            except Exception:
+                pass
+        magic, version, capacity, slot_size, _ = HEADER.unpack_from(shm.buf, 0)
+        if magic != LIVE_FEED_MAGIC or version != LIVE_FEED_VERSION or slot_size != SLOT.size:
+            shm.close()
+            return False
+        self.shm, self.buf, self.capacity = shm, shm.buf, capacity
+        return True
+
+    def detach(self):
+        if self.shm is not None:
+            self.buf = None
+            self.shm.close()
+            self.shm = None
+
+    def read_slot(self, index):
+        """The second in slot index, None when no consistent read succeeded in SLOT_READ_RETRIES tries."""
+        offset = HEADER.size + index * SLOT.size
+        for attempt in range(SLOT_READ_RETRIES):
+            if attempt:
+                time.sleep(SLOT_RETRY_SLEEP)
+            sequence, second, keys, clicks, meters, scroll, app = SLOT.unpack_from(self.buf, offset)
+            if sequence & 1:
+                continue  # Being written right now
+            (after,) = struct.unpack_from("<I", self.buf, offset)
+            if after == sequence:
+                return LiveSecond(second, keys, clicks, meters, scroll, app.rstrip(b"\0").decode('utf-8', 'replace'))
+        return None
+
+    def seconds(self, count=60):
+        """The last count published seconds, oldest first. Empty when no tracker is publishing."""
+        if not self.attach():
+            return []
+        published = struct.unpack_from("<Q", self.buf, HEADER.size - 8)[0]
+        count = min(count, published, self.capacity)
+        result = [self.read_slot((published - count + i) % self.capacity) for i in range(count)]
+        if None in result or (result and time.time() - result[-1].second > STALE_AFTER):
+            # The tracker is gone (it may have died mid write), the segment it left behind no longer changes
+            self.detach()
+            return []
+        return result
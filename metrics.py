@@ -0,0 +1,248 @@
+"""
+    File name: metrics.py
+    Author: Emek Kırarslan (bozbulanik)
+    License: GNU-GPLv3
+"""
+
+import math
+import os
+import time
+from array import array
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+METRICS_INTERVAL = 15  # Seconds between event rate windows and textfile writes
+LATENCY_SAMPLE_EVERY = 16  # Callback calls per timed one, counting every call costs less than timing it
+QUANTILES = (50, 90, 99)
+SUB_BUCKETS = 16  # Per power of two, about 3% relative precision
+MIN_EXPONENT = -4  # 1/16 µs, the first bucket holds everything faster
+OCTAVES = 32  # 1/16 µs up to ~268 s
+HISTOGRAM_BUCKETS = 1 + OCTAVES * SUB_BUCKETS
+
+
+def rss_bytes():
+    """Resident set size now (Linux) and at peak, None where it cannot be read."""
+    current = None
+    try:
+        with open("/proc/self/statm") as statm:
+            current = int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 if resource is not None else None  # KiB on Linux
+    return current, peak
+
+
+def bucket_of(us):
+    """Log bucket of a duration in microseconds, the last one holds everything over its range."""
+    if us < 2 ** MIN_EXPONENT:
+        return 0
+    mantissa, exponent = math.frexp(us)  # us = mantissa * 2 ** exponent, 0.5 <= mantissa < 1
+    octave = exponent - 1 - MIN_EXPONENT
+    if octave >= OCTAVES:
+        return HISTOGRAM_BUCKETS - 1
+    return 1 + octave * SUB_BUCKETS + int((mantissa * 2 - 1) * SUB_BUCKETS)
+
+
+def bucket_value(bucket):
+    """Midpoint of a bucket in microseconds."""
+    if bucket == 0:
+        return 2 ** MIN_EXPONENT / 2
+    octave, sub = divmod(bucket - 1, SUB_BUCKETS)
+    return 2 ** (octave + MIN_EXPONENT) * (1 + (sub + 0.5) / SUB_BUCKETS)
+
+
+class DurationHistogram:
+    """Log bucketed histogram of durations from under a microsecond up to minutes.
+
+    rhythm's LatencyHistogram starts at 1 ms, callbacks take microseconds and the
+    focus subprocess or a log write can take seconds.
+    """
+    __slots__ = ("counts",)
+
+    def __init__(self):
+        self.counts = array('Q', [0] * HISTOGRAM_BUCKETS)
+
+    def record(self, us):
+        self.counts[bucket_of(us)] += 1
+
+    def percentiles(self, ps=QUANTILES):
+        """Percentiles in microseconds, None when nothing was recorded."""
+        total = sum(self.counts)
+        if not total:
+            return {p: None for p in ps}
+        result = {}
+        for p in ps:
+            rank = math.ceil(total * p / 100) or 1
+            seen = 0
+            for bucket, count in enumerate(self.counts):
+                seen += count
+                if seen >= rank:
+                    result[p] = bucket_value(bucket)
+                    break
+        return result
+
+
+class Timing:
+    """Count of calls and a microsecond latency histogram of the ones that were timed."""
+    __slots__ = ("count", "timed", "total_us", "max_us", "histogram")
+
+    def __init__(self):
+        self.count = 0
+        self.timed = 0
+        self.total_us = 0.0
+        self.max_us = 0.0
+        self.histogram = DurationHistogram()
+
+    def record(self, us):
+        self.timed += 1
+        self.total_us += us
+        if us > self.max_us:
+            self.max_us = us
+        self.histogram.record(us)
+
+    def stats(self):
+        quantiles = self.histogram.percentiles(QUANTILES)
+        return {
+            "count": self.count,
+            "timed": self.timed,
+            "total_seconds": self.total_us / 1e6,
+            "mean_us": self.total_us / self.timed if self.timed else None,
+            "max_us": self.max_us,
+            # Bucket midpoints can land above the slowest call
+            **{f"p{p}_us": None if quantiles[p] is None else min(quantiles[p], self.max_us) for p in QUANTILES},
+        }
+
+
+class Metrics:
+    """Runtime metrics of the tracker itself, cheap enough to always be on.
+
+    Listener callbacks go through wrap(): every call is counted, one in sample_every is
+    timed. Slower operations (subprocesses, logging) are timed every time with observe().
+    tick() closes a rate window, the events/s of the last window are reported.
+    """
+    def __init__(self, sample_every=LATENCY_SAMPLE_EVERY, clock=time.perf_counter_ns):
+        self.sample_every = sample_every
+        self.clock = clock
+        self.started_at = time.time()
+        self.callbacks = {}
+        self.operations = {}
+        self.bytes_written = 0
+        self.window_start = time.monotonic()
+        self.window_counts = {}
+        self.rates = {}
+
+    def wrap(self, name, callback):
+        timing = self.callbacks.setdefault(name, Timing())
+        sample_every, clock = self.sample_every, self.clock
+
+        def counted(*args):
+            timing.count += 1
+            if timing.count % sample_every:
+                return callback(*args)
+            start = clock()
+            result = callback(*args)
+            timing.record((clock() - start) / 1000)
+            return result
+        return counted
+
+    def observe(self, name, seconds):
+        timing = self.operations.get(name)
+        if timing is None:
+            timing = self.operations[name] = Timing()
+        timing.count += 1
+        timing.record(seconds * 1e6)
+
+    def tick(self, now=None):
+        now = time.monotonic() if now is None else now
+        elapsed = now - self.window_start
+        if elapsed <= 0:
+            return
+        counts = {name: timing.count for name, timing in self.callbacks.items()}
+        self.rates = {name: (count - self.window_counts.get(name, 0)) / elapsed for name, count in counts.items()}
+        self.window_counts = counts
+        self.window_start = now
+
+    def snapshot(self):
+        rss, peak_rss = rss_bytes()
+        return {
+            "started_at": self.started_at,
+            "uptime": time.time() - self.started_at,
+            "rss_bytes": rss,
+            "peak_rss_bytes": peak_rss,
+            "bytes_written": self.bytes_written,
+            "callbacks": {name: {**timing.stats(), "per_second": self.rates.get(name, 0.0)} for name, timing in self.callbacks.items()},
+            "operations": {name: timing.stats() for name, timing in self.operations.items()},
+        }
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def prometheus_text(metrics):
+    """A metrics dict of the daemon (snapshot() plus scheduler stats) in the Prometheus text format."""
+    lines = []
+
+    def sample(name, labels, value):
+        if labels:
+            label_text = ",".join(f'{key}="{escape_label(v)}"' for key, v in labels.items())
+            lines.append(f"{name}{{{label_text}}} {value!r}")
+        else:
+            lines.append(f"{name} {value!r}")
+
+    def family(name, kind, help_text, samples):
+        samples = [(labels, value) for labels, value in samples if value is not None]
+        if not samples:
+            return
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            sample(name, labels, value)
+
+    def summary(name, help_text, label, timings):
+        # Only the timed calls are in the quantiles, _sum and _count
+        timings = {key: stats for key, stats in timings.items() if stats["timed"]}
+        if not timings:
+            return
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} summary")
+        for key, stats in timings.items():
+            for p in QUANTILES:
+                sample(name, {label: key, "quantile": str(p / 100)}, stats[f"p{p}_us"] / 1e6)
+            sample(f"{name}_sum", {label: key}, stats["total_seconds"])
+            sample(f"{name}_count", {label: key}, stats["timed"])
+
+    callbacks = metrics.get("callbacks", {})
+    operations = metrics.get("operations", {})
+    scheduler = metrics.get("scheduler", {})
+    family("tracker_events_total", "counter", "Input events handled per listener callback.",
+           [({"callback": name}, stats["count"]) for name, stats in callbacks.items()])
+    family("tracker_events_per_second", "gauge", "Input events per second over the last metrics window.",
+           [({"callback": name}, stats["per_second"]) for name, stats in callbacks.items()])
+    summary("tracker_callback_latency_seconds", "Latency of the sampled listener callback calls.", "callback", callbacks)
+    summary("tracker_operation_seconds", "Duration of focus subprocesses, logging and other slow operations.", "operation", operations)
+    family("tracker_log_bytes_written_total", "counter", "Bytes appended to the log storage.", [({}, metrics.get("bytes_written"))])
+    family("tracker_scheduler_lag_seconds", "gauge", "How late the last run of a scheduled job started.",
+           [({"job": name}, stats["last_lag"]) for name, stats in scheduler.items()])
+    family("tracker_scheduler_max_lag_seconds", "gauge", "Latest start of a scheduled job so far.",
+           [({"job": name}, stats["max_lag"]) for name, stats in scheduler.items()])
+    family("tracker_scheduler_overruns_total", "counter", "Deadlines a scheduled job missed.",
+           [({"job": name}, stats["overruns"]) for name, stats in scheduler.items()])
+    family("tracker_scheduler_duration_seconds", "gauge", "Duration of the last run of a scheduled job.",
+           [({"job": name}, stats["last_duration"]) for name, stats in scheduler.items()])
+    family("tracker_motion_samples_dropped_total", "counter", "Mouse samples dropped by a full motion buffer.", [({}, metrics.get("motion_dropped"))])
+    family("tracker_resident_memory_bytes", "gauge", "Resident set size.", [({}, metrics.get("rss_bytes"))])
+    family("tracker_peak_resident_memory_bytes", "gauge", "Peak resident set size.", [({}, metrics.get("peak_rss_bytes"))])
+    family("tracker_start_time_seconds", "gauge", "Start time of the tracker since the epoch.", [({}, metrics.get("started_at"))])
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(path, text):
+    """Replaces path atomically, node_exporter never reads a half written file."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
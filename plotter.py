@@ -1,17 +1,33 @@
 import time
 import random
 import math
-import pynput
 
-from pynput import keyboard, mouse
+from timeseries import TimeSeries
+from downsample import cells, column_ranges, lttb, np
+
+RESET = '\033[0m'
+# urwid palette entries of the ANSI colors the plots take
+COLOR_ATTRIBUTES = {'\033[91m': 'graph_red', '\033[92m': 'graph_green', '\033[93m': 'graph_yellow', '\033[96m': 'graph_cyan'}
+
 class TerminalGraph:
-    def __init__(self, title="", width=80, height=20, x_label="X", y_label="Y", x_divisions=5, y_divisions=5, x_min = 0, x_max = 0, y_min = 0, y_max=0):
+    """A plot drawn into flat character and attribute buffers.
+
+    Drawing only writes the back buffers. render() compares them row by row with what it
+    rendered last time and rebuilds the urwid markup of the changed rows only.
+    """
+    def __init__(self, title="", width=80, height=20, x_label="X", y_label="Y", x_divisions=5, y_divisions=5, x_min = 0, x_max = 0, y_min = 0, y_max=0, stream_window=60):
         self.title = title
         self.width = width
         self.height = height
         self.x_label = x_label
         self.y_label = y_label
-        self.canvas = [[' ' for _ in range(width)] for _ in range(height)]
+        self.blank_chars = [' '] * (width * height)
+        self.blank_attrs = [None] * (width * height)
+        self.chars = self.blank_chars[:]
+        self.attrs = self.blank_attrs[:]
+        self.shown_chars = [None] * (width * height)
+        self.shown_attrs = [None] * (width * height)
+        self.row_markup = [[] for _ in range(height)]
         self.x_min = x_min
         self.x_max = x_max
         self.y_min = y_min
@@ -20,16 +36,24 @@ class TerminalGraph:
         self.plot_height = height - 5  # Adjust for x-axis and padding
         self.x_divisions = x_divisions
         self.y_divisions = y_divisions
-        self.stream_data = []
+        self.stream_window = stream_window
+        self.series = {}
+        self.series_colors = {}
                 
     def clear(self):
-        self.canvas = [[' ' for _ in range(self.width)] for _ in range(self.height)]
+        self.chars[:] = self.blank_chars
+        self.attrs[:] = self.blank_attrs
+
+    def set_cell(self, x, y, char, color=None):
+        i = y * self.width + x
+        self.chars[i] = char
+        self.attrs[i] = color
 
     def plot_point(self, x, y, marker='·', color='\033[96m'):
         plot_x = int(x) + 6  # Shift right to make space for y-axis
         plot_y = self.height - 4 - int(y)  # Shift up to make space for x-axis
         if 6 <= plot_x < self.width - 1 and 1 <= plot_y < self.height - 4:
-            self.canvas[plot_y][plot_x] = f'{color}{marker}\033[0m'  # Color + marker + reset
+            self.set_cell(plot_x, plot_y, marker, color)
 
     def plot_function(self, func, x_range, x_shift, y_shift, color='\033[96m', fixed=False):
         if(not fixed):
@@ -54,6 +78,11 @@ class TerminalGraph:
     def plot_scatter(self, points, marker='·', color='\033[96m', fixed=False):
         if not points:
             return
+        if len(points) > self.plot_width:
+            # More points than columns, bin them to cells instead of plotting one by one
+            x_values, y_values = zip(*points)
+            self.plot_series(x_values, y_values, mode="points", marker=marker, color=color, fixed=fixed)
+            return
         marker_color = color
         if not fixed:
             x_values, y_values = zip(*points)
@@ -76,76 +105,129 @@ class TerminalGraph:
                 self.plot_point(plot_x, plot_y, marker, marker_color)
             
                 
+    def plot_series(self, xs, ys, mode="minmax", marker='·', color='\033[96m', fixed=False):
+        """Plots any number of points with a cost bound by the plot size, not by len(xs).
+
+        points draws every cell a point falls into, exactly what plot_scatter draws. minmax
+        bins the points to pixel columns and draws each column from its lowest to its highest
+        value, so no spike is lost. lttb keeps plot_width points (Largest-Triangle-Three-
+        Buckets, xs must be sorted) that preserve the shape of the line.
+        """
+        if len(xs) == 0:
+            return
+        if not fixed:
+            if np is not None:
+                self.x_min, self.x_max = float(np.min(xs)), float(np.max(xs))
+                self.y_min, self.y_max = float(np.min(ys)), float(np.max(ys))
+            else:
+                self.x_min, self.x_max = min(xs), max(xs)
+                self.y_min, self.y_max = min(ys), max(ys)
+        x_range = (self.x_max - self.x_min) or 1
+        y_range = (self.y_max - self.y_min) or 1
+        y_scale = (self.plot_height - 1) / y_range
+
+        if mode == "points":
+            for column, row in cells(xs, ys, self.x_min, self.x_max, self.y_min, self.y_max, self.plot_width, self.plot_height):
+                self.plot_point(column, row, marker, color)
+            return
+
+        if mode == "lttb":
+            for i in lttb(xs, ys, self.plot_width):
+                plot_x = (xs[i] - self.x_min) / x_range * (self.plot_width - 1)
+                plot_y = (ys[i] - self.y_min) * y_scale
+                if 0 <= plot_x < self.plot_width and 0 <= plot_y < self.plot_height:
+                    self.plot_point(plot_x, plot_y, marker, color)
+            return
+
+        lows, highs = column_ranges(xs, ys, self.x_min, self.x_max, self.plot_width)
+        for column, (low, high) in enumerate(zip(lows, highs)):
+            if low is None:
+                continue
+            bottom = max(int((low - self.y_min) * y_scale), 0)
+            top = min(int((high - self.y_min) * y_scale), self.plot_height - 1)
+            for row in range(bottom, top + 1):
+                self.plot_point(column, row, marker, color)
+
     def add_axes(self, time_chart=False):
         # Draw box
         for i in range(6, self.width - 1):
-            self.canvas[1][i] = '─'  # Top border
-            self.canvas[self.height - 4][i] = '─'  # Bottom border
+            self.set_cell(i, 1, '─')  # Top border
+            self.set_cell(i, self.height - 4, '─')  # Bottom border
         for i in range(1, self.height - 3):
-            self.canvas[i][6] = '│'  # Left border
-            self.canvas[i][self.width - 2] = '│'  # Right border
+            self.set_cell(6, i, '│')  # Left border
+            self.set_cell(self.width - 2, i, '│')  # Right border
 
         # Draw corners
-        self.canvas[1][6] = '┌'  # Top-left corner
-        self.canvas[1][self.width - 2] = '┐'  # Top-right corner
-        self.canvas[self.height - 4][6] = '└'  # Bottom-left corner
-        self.canvas[self.height - 4][self.width - 2] = '┘'  # Bottom-right corner
+        self.set_cell(6, 1, '┌')  # Top-left corner
+        self.set_cell(self.width - 2, 1, '┐')  # Top-right corner
+        self.set_cell(6, self.height - 4, '└')  # Bottom-left corner
+        self.set_cell(self.width - 2, self.height - 4, '┘')  # Bottom-right corner
 
         # Add axis labels
         x_label_pos = self.width // 2 - len(self.x_label) // 2
         for i, char in enumerate(self.x_label):
-            self.canvas[self.height - 2][x_label_pos + i] = char
+            self.set_cell(x_label_pos + i, self.height - 2, char)
 
         # Y-axis label in top left corner
         for i, char in enumerate(self.y_label):
             if i < self.height - 5:  # Ensure it doesn't overflow
-                self.canvas[1][i] = char
+                self.set_cell(i, 1, char)
         # Title
         title_label_pos = self.width // 2 - len(self.title) // 2
         for i, char in enumerate(self.title):
-            self.canvas[0][title_label_pos + i] = char
+            self.set_cell(title_label_pos + i, 0, char)
         
         # Add tick marks and values
         for i in range(self.x_divisions):
             x_tick_pos = 6 + (self.plot_width - 1) * i // (self.x_divisions - 1)
             if(time_chart):
-                x_value = f"{60 - (60 * i // (self.x_divisions - 1))}s"
+                x_value = f"{self.stream_window - (self.stream_window * i // (self.x_divisions - 1))}s"
             else:
                 x_value = f"{self.x_min + (self.x_max - self.x_min) * i / (self.x_divisions - 1):.2f}"
                 
             for j, char in enumerate(x_value):
                 if self.height - 3 < self.height and x_tick_pos - len(x_value)//2 + j < self.width:
-                    self.canvas[self.height - 3][x_tick_pos - len(x_value)//2 + j] = char
+                    self.set_cell(x_tick_pos - len(x_value)//2 + j, self.height - 3, char)
 
         for i in range(self.y_divisions):
             y_tick_pos = self.height - 4 - (self.plot_height - 1) * i // (self.y_divisions - 1)
             y_value = f"{self.y_min + (self.y_max - self.y_min) * i / (self.y_divisions - 1):.2f}"
             for j, char in enumerate(y_value):
                 if y_tick_pos < self.height and 1 + j < 6:
-                    self.canvas[y_tick_pos][1 + j] = char
+                    self.set_cell(1 + j, y_tick_pos, char)
 
-    def stream(self, value, fixed=False):
-        current_time = time.time()
-        self.stream_data.append((current_time, value))
-        self.stream_data = [(t, v) for t, v in self.stream_data if current_time - t <= 60]
+    def add_series(self, name, window=None, color='\033[96m'):
+        self.series[name] = TimeSeries(window or self.stream_window)
+        self.series_colors[name] = color
+        return self.series[name]
 
-        if not self.stream_data:
-            return
+    def stream(self, value, fixed=False, series="default", now=None):
+        """Appends a value to a series and plots every series over the last stream_window seconds."""
+        current_time = time.time() if now is None else now
+        if series not in self.series:
+            self.add_series(series)
+        self.series[series].append(current_time, value)
+        for data in self.series.values():
+            data.evict(current_time)
 
-        current_time = time.time()
         if(fixed):
             y_range = self.y_max - self.y_min
-            
         else:
-            y_values = [v for _, v in self.stream_data]
-            self.y_min, self.y_max = min(y_values), max(y_values)
+            bounds = [(data.min(), data.max()) for data in self.series.values() if len(data)]
+            if not bounds:
+                return
+            self.y_min = min(low for low, _ in bounds)
+            self.y_max = max(high for _, high in bounds)
             y_range = max(self.y_max - self.y_min, 0.1)
-        
-        for t, y in self.stream_data:
-            x = self.plot_width - 1 - ((current_time - t) / 60) * (self.plot_width - 1)
-            plot_y = (y - self.y_min) / y_range * (self.plot_height - 1)
-            if 0 <= plot_y < self.plot_height:  # Ensure y is within the plot range
-                self.plot_point(x + 6, plot_y)
+
+        x_scale = (self.plot_width - 1) / self.stream_window
+        for name, data in self.series.items():
+            color = self.series_colors[name]
+            for t, y in data.points():
+                x = self.plot_width - 1 - (current_time - t) * x_scale
+                plot_y = (y - self.y_min) / y_range * (self.plot_height - 1)
+                if 0 <= x and 0 <= plot_y < self.plot_height:  # Ensure the point is within the plot range
+                    self.plot_point(x, plot_y, color=color)
 
         
     def draw(self, time_chart=False):
@@ -153,6 +235,52 @@ class TerminalGraph:
         for row in self.canvas:
             print(''.join(row))
 
+    def render(self):
+        """Rebuilds the markup of the rows that changed since the last render, returns their numbers."""
+        changed = []
+        chars, attrs = self.chars, self.attrs
+        for row in range(self.height):
+            start, end = row * self.width, (row + 1) * self.width
+            if chars[start:end] == self.shown_chars[start:end] and attrs[start:end] == self.shown_attrs[start:end]:
+                continue
+            self.shown_chars[start:end] = chars[start:end]
+            self.shown_attrs[start:end] = attrs[start:end]
+            self.row_markup[row] = self.build_row(start, end)
+            changed.append(row)
+        return changed
+
+    def build_row(self, start, end):
+        chars, attrs = self.chars, self.attrs
+        if attrs[start:end] == self.blank_attrs[start:end]:
+            return ["".join(chars[start:end])]
+        # Runs of cells with the same color become one markup segment
+        markup = []
+        run_start = start
+        for i in range(start + 1, end + 1):
+            if i == end or attrs[i] != attrs[run_start]:
+                text = "".join(chars[run_start:i])
+                color = attrs[run_start]
+                markup.append((COLOR_ATTRIBUTES.get(color, color), text) if color else text)
+                run_start = i
+        return markup
+
+    def markup(self):
+        """urwid markup of the whole canvas as of the last render()."""
+        result = []
+        for row, segments in enumerate(self.row_markup):
+            if row:
+                result.append("\n")
+            result.extend(segments)
+        return result
+
+    @property
+    def canvas(self):
+        """Rows of cells with the ANSI colors embedded, for printing to a terminal."""
+        return [[f'{color}{char}{RESET}' if color else char
+                 for char, color in zip(self.chars[row * self.width:(row + 1) * self.width], self.attrs[row * self.width:(row + 1) * self.width])]
+                for row in range(self.height)]
+
+
     # FOR TUI
     def get_size(self):
         return [self.width, self.height]
@@ -0,0 +1,85 @@
+"""
+    File name: proctree.py
+    Author: Emek Kırarslan (bozbulanik)
+    License: GNU-GPLv3
+"""
+
+import os
+
+UNKNOWN_APP = "<unknown>"
+
+
+class ProcessResolver:
+    """Resolves pids to program names by reading /proc directly.
+
+    Names come from the stat file read on every lookup, nothing is cached: a reused pid
+    or an exec (a shell running exec vim) keeps no stale name, and neither does a shell
+    that starts another program. A lookup is a few small reads, no fork.
+    """
+    def __init__(self, proc_dir="/proc"):
+        self.proc_dir = proc_dir
+        self.has_children_file = os.path.exists(os.path.join(proc_dir, "self", "task", str(os.getpid()), "children"))
+
+    def read_stat(self, pid):
+        """Returns (ppid, comm) of the process or None if it is gone."""
+        try:
+            with open(f"{self.proc_dir}/{pid}/stat", "rb") as f:
+                stat = f.read()
+        except OSError:
+            return None
+        # comm may contain spaces and parentheses, fields start after the last ')'
+        end = stat.rfind(b")")
+        fields = stat[end + 2:].split()
+        comm = stat[stat.find(b"(") + 1:end].decode("utf-8", "replace")
+        return int(fields[1]), comm
+
+    def get_comm(self, pid):
+        stat = self.read_stat(pid)
+        return stat[1] if stat is not None else None
+
+    def get_children(self, pid):
+        if not self.has_children_file:
+            return self.scan_children(pid)
+        children = []
+        try:
+            for tid in os.listdir(f"{self.proc_dir}/{pid}/task"):
+                with open(f"{self.proc_dir}/{pid}/task/{tid}/children", "rb") as f:
+                    children.extend(int(c) for c in f.read().split())
+        except OSError:
+            return []
+        return sorted(children)
+
+    def scan_children(self, pid):
+        # Kernels without CONFIG_PROC_CHILDREN, still cheaper than forking ps
+        children = []
+        for entry in os.listdir(self.proc_dir):
+            if entry.isdigit():
+                stat = self.read_stat(entry)
+                if stat is not None and stat[0] == pid:
+                    children.append(int(entry))
+        return sorted(children)
+
+    def get_first_child(self, pid):
+        children = self.get_children(pid)
+        return children[0] if children else None
+
+    def resolve(self, pid, terminal_app=None):
+        """Returns the program name for pid, looking inside terminal_app for the program it runs."""
+        pid = int(pid)
+        comm = self.get_comm(pid)
+        if comm is None:
+            return UNKNOWN_APP
+        if terminal_app is None or comm != terminal_app:
+            return comm
+
+        child_pid = self.get_first_child(pid)
+        if child_pid is None:
+            return comm
+        child_comm = self.get_comm(child_pid)
+        if child_comm is None:
+            return comm
+
+        grandchild_pid = self.get_first_child(child_pid)
+        if grandchild_pid is None:
+            return child_comm
+        return self.get_comm(grandchild_pid) or child_comm
@@ -0,0 +1,138 @@
+"""
+    File name: profiling.py
+    Author: Emek Kırarslan (bozbulanik)
+    License: GNU-GPLv3
+"""
+
+import cProfile
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+SAMPLE_INTERVAL = 0.005  # Seconds between stack samples of every thread
+TRACEMALLOC_FRAMES = 16
+TRACEMALLOC_TOP = 25
+# Where the per interval counts (sketches, chords, rows) are allocated
+COUNTER_FILES = ("sketch.py", "counters.py", "chords.py", "records.py", "focus.py")
+
+
+def frame_label(code):
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class StackSampler(threading.Thread):
+    """Samples the stacks of all threads into collapsed stacks (flamegraph.pl, speedscope).
+
+    cProfile only sees the thread it was enabled in, the sampler sees the listener threads
+    too and never stops them, it only reads their frames.
+    """
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        super().__init__(name="stack-sampler", daemon=True)
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.stopped = threading.Event()
+
+    def run(self):
+        own_id = threading.get_ident()
+        while not self.stopped.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame_label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class Profiler:
+    """Toggled profiling of a running tracker, its files go to directory.
+
+    toggle_cpu() starts cProfile on the calling thread (the scheduler loop, signal handlers
+    queue the toggles there) and a StackSampler over every thread, the next call writes profile-*.pstats and
+    profile-*.collapsed. toggle_memory() starts tracemalloc, the next call writes the
+    snapshot and what grew since the start to tracemalloc-*.txt and stops tracing.
+    """
+    def __init__(self, directory, describe_counters=None):
+        self.directory = directory
+        self.describe_counters = describe_counters  # Returns lines about the live counters for the memory report
+        self.profile = None
+        self.sampler = None
+        self.started_at = None
+        self.baseline = None
+
+    def path(self, prefix, extension):
+        return os.path.join(self.directory, f"{prefix}-{datetime.now().strftime('%Y%m%d-%H%M%S')}{extension}")
+
+    def toggle_cpu(self):
+        """Returns the files written, nothing when profiling just started."""
+        if self.profile is None:
+            self.profile = cProfile.Profile()
+            self.sampler = StackSampler()
+            self.started_at = time.monotonic()
+            self.sampler.start()
+            self.profile.enable()
+            return []
+        self.profile.disable()
+        self.sampler.stop()
+        pstats_path = self.path("profile", ".pstats")
+        collapsed_path = pstats_path[:-len(".pstats")] + ".collapsed"
+        self.profile.dump_stats(pstats_path)
+        self.sampler.dump(collapsed_path)
+        self.profile = self.sampler = None
+        return [pstats_path, collapsed_path]
+
+    def toggle_memory(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            self.baseline = tracemalloc.take_snapshot()
+            return []
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        snapshot_path = self.path("tracemalloc", ".snapshot")
+        report_path = snapshot_path[:-len(".snapshot")] + ".txt"
+        snapshot.dump(snapshot_path)
+
+        ignore = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap*>")]
+        snapshot = snapshot.filter_traces(ignore)
+        baseline = self.baseline.filter_traces(ignore)
+        counters = [tracemalloc.Filter(True, f"*{os.sep}{name}") for name in COUNTER_FILES]
+        with open(report_path, 'w') as f:
+            f.write(f"Traced memory: {current / 1024:.1f} KiB now, {peak / 1024:.1f} KiB at peak\n")
+            if self.describe_counters is not None:
+                f.write("\nLive counters:\n")
+                for line in self.describe_counters():
+                    f.write(f"    {line}\n")
+            f.write("\nGrowth of the counters (sketch, chords, rows, focus) since tracing started:\n")
+            for stat in snapshot.filter_traces(counters).compare_to(baseline.filter_traces(counters), "lineno")[:TRACEMALLOC_TOP]:
+                f.write(f"    {stat}\n")
+            f.write("\nGrowth of everything since tracing started:\n")
+            for stat in snapshot.compare_to(baseline, "lineno")[:TRACEMALLOC_TOP]:
+                f.write(f"    {stat}\n")
+        self.baseline = None
+        return [snapshot_path, report_path]
+
+    def close(self):
+        if self.profile is not None:
+            self.profile.disable()
+            self.sampler.stop()
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
@@ -0,0 +1,202 @@
+"""
+    File name: reader.py
+    Author: Emek Kırarslan (bozbulanik)
+    License: GNU-GPLv3
+"""
+
+import json
+import os
+import signal
+import sys
+from datetime import datetime
+from functools import cached_property
+from rich import print
+from rich.table import Table
+
+from storage import open_storage
+from tiers import RollupTiers
+from records import Totals
+from rhythm import percentiles, words_per_minute
+from ipc import IpcClient, TrackerNotRunning, UntrustedSocket
+from metrics import prometheus_text
+
+
+class Reader:
+    """Reports and exports the logs. Starts no listeners and needs no X server.
+
+    The storage and rollups are opened on first use, the commands that only query the
+    running tracker over IPC (report --live, stats, profile) leave the log directory alone.
+    """
+    def __init__(self, log_dir=None, print_log=None, storage="csv", storage_options=None):
+        self.log_dir = log_dir
+        self.storage_backend = storage
+        self.storage_options = storage_options or {}
+        self.print_log = print_log
+
+    @cached_property
+    def storage(self):
+        if(self.log_dir != None):
+            os.makedirs(self.log_dir, exist_ok=True)
+        return open_storage(self.log_dir, self.storage_backend, **self.storage_options)
+
+    @cached_property
+    def rollups(self):
+        return RollupTiers(self.storage.path + ".tiers.db")
+
+    @property
+    def log_file_path(self):
+        return self.storage.path
+
+    def report(self, jobs=None, since=None, until=None):
+        if not self.storage.exists():
+            print(f"No log found at {self.storage.path}.")
+            return
+        title = "Tracker Statistics"
+        if since or until:
+            title += f" ({since or 'start'} - {until or 'today'})"
+        if since or until or self.rollups.compacted_before is not None:
+            # Ranges and compacted histories are served by the daily/monthly rollups
+            self.rollups.sync(self.storage)
+            totals = self.rollups.totals(since=since, until=until)
+        else:
+            totals = self.storage.totals(jobs=jobs)
+        self.print_report(totals, title)
+
+    def report_live(self):
+        try:
+            with IpcClient() as client:
+                snapshot = client.request("snapshot")
+        except UntrustedSocket as e:
+            print(f"Not talking to the tracker socket: {e}")
+            return
+        except TrackerNotRunning:
+            print("Tracker is not running, start it with (tracker start).")
+            return
+        if "error" in snapshot:
+            print(snapshot["error"])
+            return
+        since = datetime.fromtimestamp(snapshot["since"]).strftime("%H:%M:%S")
+        self.print_report(Totals.from_dict(snapshot["totals"]), f"Current Interval (since {since}, typing at {snapshot['live_wpm']:.0f} wpm)")
+
+    def stats(self, output="table"):
+        """Prints the runtime metrics of the running tracker as a table, JSON or Prometheus text."""
+        try:
+            with IpcClient() as client:
+                metrics = client.request("metrics")
+        except UntrustedSocket as e:
+            print(f"Not talking to the tracker socket: {e}")
+            return
+        except TrackerNotRunning:
+            print("Tracker is not running, start it with (tracker start).")
+            return
+        if "error" in metrics:
+            print(metrics["error"])
+            return
+        # Machine readable output bypasses rich, it would highlight and wrap it
+        if output == "json":
+            sys.stdout.write(json.dumps(metrics, indent=2) + "\n")
+        elif output == "prometheus":
+            sys.stdout.write(prometheus_text(metrics))
+        else:
+            self.print_stats(metrics)
+
+    def toggle_profiling(self, memory=False):
+        """Signals the running tracker to start or stop CPU (SIGUSR1) or memory (SIGUSR2) profiling."""
+        try:
+            with IpcClient() as client:
+                status = client.request("status")
+                pid = client.pid or status.get("pid")  # The kernel's word for it where there is one
+        except UntrustedSocket as e:
+            print(f"Not talking to the tracker socket: {e}")
+            return
+        except TrackerNotRunning:
+            print("Tracker is not running, start it with (tracker start).")
+            return
+        if "error" in status:
+            print(status["error"])
+            return
+        signum = signal.SIGUSR2 if memory else signal.SIGUSR1
+        os.kill(pid, signum)
+        print(f"Sent {signum.name} to the tracker (pid {pid}). Profiles are written to "
+              f"{os.path.dirname(status['log_file'])} when profiling is toggled off.")
+
+    def print_stats(self, metrics):
+        uptime = metrics["uptime"]
+        grid = Table("Name", "Value", title=f"Tracker Runtime (up {int(uptime // 3600)}h {int(uptime % 3600 // 60)}m)", expand=True, highlight=True, box=None)
+        if metrics["rss_bytes"] is not None:
+            grid.add_row("Resident Memory", f"{metrics['rss_bytes'] / 2**20:.1f} MiB")
+        if metrics["peak_rss_bytes"] is not None:
+            grid.add_row("Peak Resident Memory", f"{metrics['peak_rss_bytes'] / 2**20:.1f} MiB")
+        grid.add_row("Log Bytes Written", str(metrics["bytes_written"]))
+        grid.add_row("Mouse Samples Dropped", str(metrics["motion_dropped"]))
+        print(grid)
+
+        callbacks = Table("Callback", "Events", "Events/s", "p50 µs", "p90 µs", "p99 µs", "Max µs", title="Listener Callbacks", expand=True, box=None)
+        for name, stats in metrics["callbacks"].items():
+            callbacks.add_row(name, str(stats["count"]), f"{stats['per_second']:.1f}", *self.format_micros(stats, ("p50_us", "p90_us", "p99_us", "max_us")))
+        print(callbacks)
+
+        operations = Table("Operation", "Count", "Total s", "p50 µs", "p99 µs", "Max µs", title="Operations", expand=True, box=None)
+        for name, stats in metrics["operations"].items():
+            operations.add_row(name, str(stats["count"]), f"{stats['total_seconds']:.3f}", *self.format_micros(stats, ("p50_us", "p99_us", "max_us")))
+        print(operations)
+
+        scheduler = Table("Job", "Runs", "Overruns", "Last Lag s", "Max Lag s", "Last Duration s", title="Scheduler", expand=True, box=None)
+        for name, stats in metrics["scheduler"].items():
+            scheduler.add_row(name, str(stats["runs"]), str(stats["overruns"]), f"{stats['last_lag']:.3f}", f"{stats['max_lag']:.3f}", f"{stats['last_duration']:.3f}")
+        print(scheduler)
+
+    def format_micros(self, stats, keys):
+        return ["-" if stats[key] is None else f"{stats[key]:.1f}" for key in keys]
+
+    def print_report(self, totals, title="Tracker Statistics"):
+        grid = Table("Name", "Value",title=title, expand=True, highlight=True, box=None)
+        most_used_keys_statistics = totals.key_counts
+        most_used_apps_statistics = totals.app_counts
+        # Counts come from per-interval sketches, they are upper bounds and errors how much lower the true count may be
+        key_errors = totals.key_errors
+        app_errors = totals.app_errors
+
+        total_sum_muks = sum(most_used_keys_statistics.values())
+        total_sum_muas = sum(most_used_apps_statistics.values())
+        most_used_keys_statistics = dict(sorted(most_used_keys_statistics.items(), key=lambda x: x[1], reverse=True))     
+        most_used_apps_statistics = dict(sorted(most_used_apps_statistics.items(), key=lambda x: x[1], reverse=True))     
+
+        percentage_data_muks = {key: (value / total_sum_muks) * 100 for key, value in most_used_keys_statistics.items()}
+        percentage_data_muas = {key: (value / total_sum_muas) * 100 for key, value in most_used_apps_statistics.items()}
+
+        
+        grid.add_row("Left Mouse Click" , str(totals.left_click))
+        grid.add_row("Right Mouse Click" , str(totals.right_click))
+        grid.add_row("Middle Mouse Click" , str(totals.middle_click))
+        grid.add_row("Key Press", str(totals.keypress))
+        grid.add_row("Mouse Movement" , f"{totals.mouse_distance:.2f} meters")
+        grid.add_row("Mouse Scroll" , f"{totals.scroll_distance:.2f} px")
+        grid.add_row("Typing Speed", f"{words_per_minute(totals.typed_chars, totals.typing_seconds):.1f} wpm")
+        grid.add_row("Inter-key Latency", self.format_percentiles(totals.inter_key))
+        grid.add_row("Key Hold Time", self.format_percentiles(totals.key_hold))
+        
+        muks_result = ""
+        for key, percentage in list(percentage_data_muks.items())[:20]:
+            total_presses = most_used_keys_statistics[key]
+            error = f" (-{key_errors[key] / total_sum_muks * 100:.2f}%)" if key_errors.get(key) else ""
+            muks_result += f"{key}  - {percentage:.2f}%{error}  -  {total_presses} presses" + "\n"
+
+        grid.add_row("Top 5 Most Used Keys", muks_result)
+
+        muas_result = ""
+        for app, percentage in list(percentage_data_muas.items())[:20]:
+            total_seconds = most_used_apps_statistics[app]
+            total_minutes = int(total_seconds // 60)
+            error = f" (-{app_errors[app] / total_sum_muas * 100:.2f}%)" if app_errors.get(app) else ""
+            muas_result += f"{app}  - {percentage:.2f}%{error}  -  {total_minutes} minutes" + "\n"
+
+        grid.add_row("Top 5 Most Used Apps", muas_result)
+        
+        print(grid)
+
+    def format_percentiles(self, histogram):
+        values = percentiles(histogram)
+        if values[50] is None:
+            return "-"
+        return "  ".join(f"p{p} {ms:.0f} ms" for p, ms in values.items())
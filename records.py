@@ -0,0 +1,215 @@
+"""
+    File name: records.py
+    Author: Emek Kırarslan (bozbulanik)
+    License: GNU-GPLv3
+"""
+
+import ast
+import json
+import re
+from datetime import date, datetime, time, timedelta
+
+DATE_FORMAT = "%d/%m/%Y"
+TIME_FORMAT = "%H:%M:%S"
+RELATIVE_DAYS = {'d': 1, 'w': 7, 'm': 30, 'y': 365}
+
+
+def merge_dict(d, m):
+    for key, value in m.items():
+        if key in d:
+            d[key] += value
+        else:
+            d[key] = value
+
+    return d
+
+
+def merge_sketched(counts, errors, floor, other_counts, other_errors, other_floor):
+    """Adds the counts of one Space-Saving sketch to a merge of others, returns the new floor.
+
+    floor is how often an item missing from the counts may have been seen (the summed
+    min_count() of the sketches merged so far). A missing item is counted at that bound,
+    so every count stays an upper bound and count - error a lower bound, as in
+    SpaceSaving.merge(), just without a capacity.
+    """
+    if other_floor:
+        for item in counts.keys() - other_counts.keys():
+            counts[item] += other_floor
+            errors[item] = errors.get(item, 0) + other_floor
+    if floor:
+        for item in other_counts.keys() - counts.keys():
+            counts[item] = floor
+            errors[item] = floor
+    merge_dict(counts, other_counts)
+    merge_dict(errors, other_errors)
+    return floor + other_floor
+
+
+def day_key(log_date):
+    """Turns a dd/mm/YYYY log date into a sortable YYYY-MM-DD key."""
+    day, month, year = log_date.split('/')
+    return f"{year}-{month}-{day}"
+
+
+def parse_day(value, today=None):
+    """Parses YYYY-MM-DD, dd/mm/YYYY, today, yesterday or a relative 7d / 2w / 1m / 1y into a date."""
+    today = today or date.today()
+    value = value.strip().lower()
+    if value == "today":
+        return today
+    if value == "yesterday":
+        return today - timedelta(days=1)
+    match = re.fullmatch(r"(\d+)([dwmy])", value)
+    if match:
+        return today - timedelta(days=int(match.group(1)) * RELATIVE_DAYS[match.group(2)])
+    for day_format in ("%Y-%m-%d", DATE_FORMAT):
+        try:
+            return datetime.strptime(value, day_format).date()
+        except ValueError:
+            pass
+    raise ValueError(f"Invalid date: {value}")
+
+
+def day_bounds(since=None, until=None):
+    """Epoch seconds [start, end) covering the days since..until, both inclusive."""
+    start = datetime.combine(since, time.min).timestamp() if since else None
+    end = datetime.combine(until + timedelta(days=1), time.min).timestamp() if until else None
+    return start, end
+
+
+def parse_counts(cell):
+    """Parses a key/app counts cell, JSON or the dict repr written by older versions."""
+    if not cell or cell == "None":
+        return {}
+    try:
+        return json.loads(cell)
+    except ValueError:
+        return ast.literal_eval(cell)
+
+
+def dump_counts(counts):
+    return json.dumps(counts, ensure_ascii=False, separators=(',', ':')) if counts else "None"
+
+
+class LogRow:
+    """One logged interval, independent of the storage backend."""
+    def __init__(self, log_date, log_time, left_click=0, right_click=0, middle_click=0, keypress=0,
+                 mouse_distance=0.0, scroll_distance=0.0, key_counts=None, app_counts=None,
+                 key_errors=None, app_errors=None, inter_key=None, key_hold=None, typed_chars=0, typing_seconds=0.0,
+                 key_floor=0, app_floor=0):
+        self.log_date = log_date
+        self.log_time = log_time
+        self.left_click = left_click
+        self.right_click = right_click
+        self.middle_click = middle_click
+        self.keypress = keypress
+        self.mouse_distance = mouse_distance
+        self.scroll_distance = scroll_distance
+        self.key_counts = key_counts or {}
+        self.app_counts = app_counts or {}
+        # Overestimation bounds of the sketched counts, only non-zero ones are kept
+        self.key_errors = key_errors or {}
+        self.app_errors = app_errors or {}
+        # How often a key/app missing from the counts may have been seen, non-zero once a sketch filled up
+        self.key_floor = key_floor
+        self.app_floor = app_floor
+        # Sparse {bucket: count} latency histograms, see rhythm.py
+        self.inter_key = inter_key or {}
+        self.key_hold = key_hold or {}
+        self.typed_chars = typed_chars
+        self.typing_seconds = typing_seconds
+
+    @classmethod
+    def from_epoch(cls, epoch, now=None):
+        now = now or datetime.now()
+        return cls(now.strftime(DATE_FORMAT), now.strftime(TIME_FORMAT),
+                   epoch.left_mouse_click_count, epoch.right_mouse_click_count, epoch.middle_mouse_click_count,
+                   epoch.key_press_count, epoch.mouse_movement_distance, epoch.mouse_scroll_distance,
+                   dict(epoch.key_counts.counts), dict(epoch.app_counts.counts),
+                   # The listener thread may be counting into a live epoch, copy before iterating
+                   {k: e for k, e in dict(epoch.key_counts.errors).items() if e},
+                   {a: e for a, e in dict(epoch.app_counts.errors).items() if e},
+                   epoch.inter_key.to_dict(), epoch.key_hold.to_dict(),
+                   epoch.typed_chars, round(epoch.typing_seconds, 3),
+                   epoch.key_counts.min_count(), epoch.app_counts.min_count())
+
+    @classmethod
+    def from_timestamp(cls, timestamp, *args, **kwargs):
+        dt = datetime.fromtimestamp(timestamp)
+        return cls(dt.strftime(DATE_FORMAT), dt.strftime(TIME_FORMAT), *args, **kwargs)
+
+    @property
+    def datetime(self):
+        return datetime.strptime(f"{self.log_date} {self.log_time}", f"{DATE_FORMAT} {TIME_FORMAT}")
+
+    @property
+    def timestamp(self):
+        return int(self.datetime.timestamp())
+
+
+class Totals:
+    """Running sums over any number of LogRows.
+
+    Key and app counts are merged per-interval sketches: upper bounds that overestimate by
+    at most key_errors/app_errors.
+    """
+    def __init__(self):
+        self.rows = 0
+        self.left_click = 0
+        self.right_click = 0
+        self.middle_click = 0
+        self.keypress = 0
+        self.mouse_distance = 0.0
+        self.scroll_distance = 0.0
+        self.key_counts = {}
+        self.app_counts = {}
+        self.key_errors = {}
+        self.app_errors = {}
+        self.key_floor = 0
+        self.app_floor = 0
+        self.inter_key = {}
+        self.key_hold = {}
+        self.typed_chars = 0
+        self.typing_seconds = 0.0
+
+    def add(self, row):
+        self.rows += 1
+        self.left_click += row.left_click
+        self.right_click += row.right_click
+        self.middle_click += row.middle_click
+        self.keypress += row.keypress
+        self.mouse_distance += row.mouse_distance
+        self.scroll_distance += row.scroll_distance
+        self.key_floor = merge_sketched(self.key_counts, self.key_errors, self.key_floor, row.key_counts, row.key_errors, row.key_floor)
+        self.app_floor = merge_sketched(self.app_counts, self.app_errors, self.app_floor, row.app_counts, row.app_errors, row.app_floor)
+        merge_dict(self.inter_key, row.inter_key)
+        merge_dict(self.key_hold, row.key_hold)
+        self.typed_chars += row.typed_chars
+        self.typing_seconds += row.typing_seconds
+        return self
+
+    def merge(self, other):
+        self.rows += other.rows
+        self.left_click += other.left_click
+        self.right_click += other.right_click
+        self.middle_click += other.middle_click
+        self.keypress += other.keypress
+        self.mouse_distance += other.mouse_distance
+        self.scroll_distance += other.scroll_distance
+        self.key_floor = merge_sketched(self.key_counts, self.key_errors, self.key_floor, other.key_counts, other.key_errors, other.key_floor)
+        self.app_floor = merge_sketched(self.app_counts, self.app_errors, self.app_floor, other.app_counts, other.app_errors, other.app_floor)
+        merge_dict(self.inter_key, other.inter_key)
+        merge_dict(self.key_hold, other.key_hold)
+        self.typed_chars += other.typed_chars
+        self.typing_seconds += other.typing_seconds
+        return self
+
+    def to_dict(self):
+        return dict(vars(self))
+
+    @classmethod
+    def from_dict(cls, d):
+        totals = cls()
+        for name, value in d.items():
+            setattr(totals, name, value)
+        return totals
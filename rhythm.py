@@ -0,0 +1,135 @@
+"""
+    File name: rhythm.py
+    Author: Emek Kırarslan (bozbulanik)
+    License: GNU-GPLv3
+"""
+
+import math
+from array import array
+
+SUB_BUCKETS = 16  # Per power of two, about 3% relative precision
+OCTAVES = 18  # 1 ms up to ~262 s
+HISTOGRAM_BUCKETS = 1 + OCTAVES * SUB_BUCKETS
+TYPING_PAUSE = 2.0  # Seconds, longer gaps between presses are pauses, not typing
+CHARS_PER_WORD = 5
+WPM_WINDOW = 60  # Seconds the live words per minute are averaged over
+HELD_KEYS_LIMIT = 32  # Presses without a release kept before they are dropped as stuck
+
+
+def bucket_of(ms):
+    """Log bucket of a latency in milliseconds, bucket 0 holds everything under 1 ms."""
+    if ms < 1:
+        return 0
+    mantissa, exponent = math.frexp(ms)  # ms = mantissa * 2 ** exponent, 0.5 <= mantissa < 1
+    if exponent > OCTAVES:
+        return HISTOGRAM_BUCKETS - 1
+    return 1 + (exponent - 1) * SUB_BUCKETS + int((mantissa * 2 - 1) * SUB_BUCKETS)
+
+
+def bucket_value(bucket):
+    """Midpoint of a bucket in milliseconds."""
+    if bucket == 0:
+        return 0.5
+    octave, sub = divmod(bucket - 1, SUB_BUCKETS)
+    return 2 ** octave * (1 + (sub + 0.5) / SUB_BUCKETS)
+
+
+def percentiles(histogram, ps=(50, 95, 99)):
+    """Percentiles in milliseconds of a sparse {bucket: count} histogram, None when it is empty.
+
+    Bucket keys may be ints or the strings they become in JSON.
+    """
+    buckets = sorted((int(b), c) for b, c in histogram.items() if c)
+    total = sum(c for _, c in buckets)
+    if not total:
+        return {p: None for p in ps}
+    result = {}
+    for p in ps:
+        rank = math.ceil(total * p / 100) or 1
+        seen = 0
+        for bucket, count in buckets:
+            seen += count
+            if seen >= rank:
+                result[p] = bucket_value(bucket)
+                break
+    return result
+
+
+def words_per_minute(typed_chars, typing_seconds):
+    if typing_seconds <= 0:
+        return 0.0
+    return typed_chars / CHARS_PER_WORD / (typing_seconds / 60)
+
+
+class LatencyHistogram:
+    """Fixed size, log bucketed (HDR style) histogram of latencies in milliseconds."""
+    def __init__(self):
+        self.counts = array('Q', [0] * HISTOGRAM_BUCKETS)
+
+    def record(self, ms):
+        self.counts[bucket_of(ms)] += 1
+
+    def merge(self, other):
+        counts = self.counts
+        for bucket, count in enumerate(other.counts):
+            if count:
+                counts[bucket] += count
+        return self
+
+    def total(self):
+        return sum(self.counts)
+
+    def to_dict(self):
+        # Sparse, with string keys so it comes back the same from JSON
+        return {str(bucket): count for bucket, count in enumerate(self.counts) if count}
+
+    def percentiles(self, ps=(50, 95, 99)):
+        return percentiles(self.to_dict(), ps)
+
+
+class TypingRhythm:
+    """Times key presses into an epoch's inter-key and key hold histograms.
+
+    Keeps the press times of held keys and a WPM_WINDOW second ring of typed characters
+    for the live words per minute, so memory stays constant however long it runs.
+    """
+    def __init__(self):
+        self.last_press = None
+        self.pressed_at = {}
+        self.window = array('L', [0] * WPM_WINDOW)
+        self.window_seconds = array('q', [-1] * WPM_WINDOW)
+
+    def press(self, epoch, key, now):
+        if key in self.pressed_at:
+            return  # Auto repeat
+        if len(self.pressed_at) >= HELD_KEYS_LIMIT:
+            self.pressed_at.clear()
+        self.pressed_at[key] = now
+
+        if self.last_press is not None:
+            gap = now - self.last_press
+            if gap < TYPING_PAUSE:
+                epoch.inter_key.record(gap * 1000)
+                epoch.typing_seconds += gap
+        self.last_press = now
+
+        char = getattr(key, 'char', None)
+        if (char is not None and char.isprintable()) or str(key) == 'Key.space':
+            epoch.typed_chars += 1
+            second = int(now)
+            slot = second % WPM_WINDOW
+            if self.window_seconds[slot] != second:
+                self.window_seconds[slot] = second
+                self.window[slot] = 0
+            self.window[slot] += 1
+
+    def release(self, epoch, key, now):
+        pressed_at = self.pressed_at.pop(key, None)
+        if pressed_at is not None:
+            epoch.key_hold.record((now - pressed_at) * 1000)
+
+    def live_wpm(self, now):
+        """Words per minute typed over the last WPM_WINDOW seconds."""
+        second = int(now)
+        chars = sum(count for count, at in zip(self.window, self.window_seconds) if second - at < WPM_WINDOW)
+        return chars / CHARS_PER_WORD * (60 / WPM_WINDOW)
@@ -0,0 +1,105 @@
+"""
+    File name: ringbuffer.py
+    Author: Emek Kırarslan (bozbulanik)
+    License: GNU-GPLv3
+"""
+
+import math
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+MOTION_BUFFER_CAPACITY = 1 << 14  # ~16 seconds of a 1000 Hz mouse
+
+
+class MotionStats:
+    def __init__(self):
+        self.samples = 0
+        self.pixel_distance = 0.0
+
+
+class MotionBuffer:
+    """Preallocated single-producer / single-consumer ring of raw (x, y) mouse samples.
+
+    append() runs in the pynput listener thread and only stores the sample, the
+    distance math happens in drain() on the flush path. Samples that arrive while
+    the ring is full are dropped and counted.
+    """
+    def __init__(self, capacity=MOTION_BUFFER_CAPACITY):
+        self.capacity = capacity
+        self.x = array('d', bytes(8 * capacity))
+        self.y = array('d', bytes(8 * capacity))
+        self.head = 0  # Only written by the producer
+        self.tail = 0  # Only written by the consumer
+        self.dropped = 0
+        self.overflows = 0
+        self.overflowing = False
+        self.last_position = None
+
+    def append(self, x, y):
+        head = self.head
+        if head - self.tail >= self.capacity:
+            self.dropped += 1
+            if not self.overflowing:
+                self.overflowing = True
+                self.overflows += 1
+            return
+        i = head % self.capacity
+        self.x[i] = x
+        self.y[i] = y
+        self.head = head + 1
+
+    def pending(self):
+        return self.head - self.tail
+
+    def drain(self):
+        """Reduces every buffered sample into a MotionStats and frees the ring."""
+        stats = MotionStats()
+        head, tail = self.head, self.tail
+        if head == tail:
+            return stats
+
+        start, end = tail % self.capacity, head % self.capacity
+        if start < end:
+            ranges = [(start, end)]
+        else:
+            ranges = [(start, self.capacity), (0, end)]
+
+        if np is not None:
+            self.reduce_numpy(ranges, stats)
+        else:
+            self.reduce_python(ranges, stats)
+
+        self.tail = head
+        self.overflowing = False
+        return stats
+
+    def reduce_numpy(self, ranges, stats):
+        x_all = np.frombuffer(self.x, dtype=np.float64)
+        y_all = np.frombuffer(self.y, dtype=np.float64)
+        x = np.concatenate([x_all[a:b] for a, b in ranges])
+        y = np.concatenate([y_all[a:b] for a, b in ranges])
+        stats.samples = len(x)
+
+        if self.last_position is not None:
+            last_x, last_y = self.last_position
+            x = np.concatenate(([last_x], x))
+            y = np.concatenate(([last_y], y))
+        self.last_position = (float(x[-1]), float(y[-1]))
+        if len(x) < 2:
+            return
+        stats.pixel_distance = float(np.hypot(np.diff(x), np.diff(y)).sum())
+
+    def reduce_python(self, ranges, stats):
+        last = self.last_position
+        for a, b in ranges:
+            for i in range(a, b):
+                x, y = self.x[i], self.y[i]
+                stats.samples += 1
+                if last is not None:
+                    stats.pixel_distance += math.hypot(x - last[0], y - last[1])
+                last = (x, y)
+        self.last_position = last
@@ -0,0 +1,139 @@
+"""
+    File name: scheduler.py
+    Author: Emek Kırarslan (bozbulanik)
+    License: GNU-GPLv3
+"""
+
+import heapq
+import time
+from collections import deque
+
+ALIGN_SLACK = 1.0  # Seconds, a boundary closer than this counts as the one just run for
+
+
+def seconds_to_boundary(interval, now=None):
+    """Seconds until the next wall clock multiple of interval, counted from local midnight (e.g. :00/:30)."""
+    now = time.time() if now is None else now
+    local = now + time.localtime(now).tm_gmtoff
+    return interval - local % interval
+
+
+class Job:
+    """A periodic job and how well it kept to its deadlines."""
+    def __init__(self, name, interval, callback, align=False):
+        self.name = name
+        self.interval = interval
+        self.callback = callback
+        self.align = align  # Deadlines on wall clock boundaries instead of every interval from the start
+        self.deadline = None
+        self.runs = 0
+        self.overruns = 0  # Deadlines skipped because the previous run was late or took too long
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.total_lag = 0.0
+        self.last_duration = 0.0
+        self.max_duration = 0.0
+
+    def first_deadline(self, now):
+        return now + (seconds_to_boundary(self.interval) if self.align else self.interval)
+
+    def next_deadline(self, now):
+        if self.align:
+            # Follow the wall clock, it may have jumped (suspend, NTP) since the last run
+            wait = seconds_to_boundary(self.interval)
+            if wait < ALIGN_SLACK:
+                wait += self.interval  # Ran a hair before the boundary, that was this one
+            return now + wait
+        deadline = self.deadline + self.interval
+        if deadline <= now:
+            missed = int((now - deadline) // self.interval) + 1
+            self.overruns += missed
+            deadline += missed * self.interval
+        return deadline
+
+    def stats(self):
+        return {
+            "interval": self.interval,
+            "runs": self.runs,
+            "overruns": self.overruns,
+            "last_lag": self.last_lag,
+            "max_lag": self.max_lag,
+            "mean_lag": self.total_lag / self.runs if self.runs else 0.0,
+            "last_duration": self.last_duration,
+            "max_duration": self.max_duration,
+        }
+
+
+class Scheduler:
+    """Runs periodic jobs on absolute time.monotonic() deadlines, so they do not drift.
+
+    Jobs run one at a time on the thread that calls run(). Lag is how late a job started
+    after its deadline. Other threads and signal handlers hand work to that thread with
+    call_soon().
+    """
+    def __init__(self, clock=time.monotonic, sleep=time.sleep):
+        self.clock = clock
+        self.sleep = sleep
+        self.jobs = {}
+        self.queue = []
+        self.order = 0  # Breaks deadline ties in the order jobs were added
+        self.running = False
+        self.soon = deque()
+
+    def add(self, name, interval, callback, align=False):
+        job = Job(name, interval, callback, align)
+        job.deadline = job.first_deadline(self.clock())
+        self.jobs[name] = job
+        self.push(job)
+        return job
+
+    def call_soon(self, callback):
+        """Runs callback on the scheduler thread before the next due job.
+
+        Only appends to a deque, so it is safe from any thread and from signal handlers. The
+        callback runs at the next wakeup, within the shortest job interval.
+        """
+        self.soon.append(callback)
+
+    def push(self, job):
+        self.order += 1
+        heapq.heappush(self.queue, (job.deadline, self.order, job))
+
+    def run_pending(self):
+        """Runs every job that is due, returns the seconds until the next deadline."""
+        while self.soon:
+            self.soon.popleft()()
+        while self.queue:
+            deadline, _, job = self.queue[0]
+            now = self.clock()
+            if deadline > now:
+                return deadline - now
+            heapq.heappop(self.queue)
+            lag = now - deadline
+            job.last_lag = lag
+            job.max_lag = max(job.max_lag, lag)
+            job.total_lag += lag
+            try:
+                job.callback()
+            finally:
+                end = self.clock()
+                job.runs += 1
+                job.last_duration = end - now
+                job.max_duration = max(job.max_duration, job.last_duration)
+                job.deadline = job.next_deadline(end)
+                self.push(job)
+        return None
+
+    def run(self):
+        self.running = True
+        while self.running:
+            wait = self.run_pending()
+            if wait is None:
+                break
+            self.sleep(wait)
+
+    def stop(self):
+        self.running = False
+
+    def stats(self):
+        return {name: job.stats() for name, job in self.jobs.items()}
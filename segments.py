@@ -0,0 +1,110 @@
+"""
+    File name: segments.py
+    Author: Emek Kırarslan (bozbulanik)
+    License: GNU-GPLv3
+"""
+
+import gzip
+import json
+import os
+import shutil
+
+try:
+    import lzma
+except ImportError:
+    lzma = None
+
+try:
+    from compression import zstd  # Python 3.14+
+except ImportError:
+    zstd = None
+
+SEGMENT_OPENERS = {".gz": gzip.open}
+if lzma is not None:
+    SEGMENT_OPENERS[".xz"] = lzma.open
+if zstd is not None:
+    SEGMENT_OPENERS[".zst"] = zstd.open
+
+COMPRESSIONS = {"gzip": ".gz", "xz": ".xz", "zstd": ".zst"}
+ROTATE_POLICIES = ("month", "size", "never")
+
+
+def best_compression():
+    for name in ("zstd", "xz"):
+        if COMPRESSIONS[name] in SEGMENT_OPENERS:
+            return name
+    return "gzip"
+
+
+def open_log_file(path):
+    """Opens a plain or compressed log file for binary reading."""
+    opener = SEGMENT_OPENERS.get(os.path.splitext(path)[1], open)
+    return opener(path, 'rb')
+
+
+def compress_file(src_path, dest_path, compression):
+    ext = COMPRESSIONS[compression]
+    if ext not in SEGMENT_OPENERS:
+        raise ValueError(f"{compression} compression is not available in this Python.")
+    tmp_path = dest_path + ".tmp"
+    with open(src_path, 'rb') as src, SEGMENT_OPENERS[ext](tmp_path, 'wb') as dest:
+        shutil.copyfileobj(src, dest, 1024 * 1024)
+    os.replace(tmp_path, dest_path)
+
+
+class SegmentManifest:
+    """Lists the rotated, compressed segments of a log and their time ranges.
+
+    Every segment holds one generation of the log. The active, uncompressed file is
+    always the current generation, so a (generation, offset) pair points at any row.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.directory = os.path.dirname(path)
+        self.generation = 0
+        self.segments = []
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.generation = data["generation"]
+        self.segments = data["segments"]
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"generation": self.generation, "segments": self.segments}, f, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def segment_path(self, segment):
+        return os.path.join(self.directory, segment["file"])
+
+    def get(self, generation):
+        for segment in self.segments:
+            if segment["generation"] == generation:
+                return segment
+        return None
+
+    def overlapping(self, since=None, until=None):
+        """Segments that may hold rows of the days since..until (YYYY-MM-DD keys, inclusive)."""
+        return [s for s in self.segments
+                if (since is None or s["last"] >= since) and (until is None or s["first"] <= until)]
+
+    def add(self, file, first, last, size):
+        self.segments.append({"file": file, "generation": self.generation, "first": first, "last": last, "bytes": size})
+        self.generation += 1
+
+    def remove_before(self, day):
+        """Forgets and deletes the segments whose rows are all older than day (YYYY-MM-DD)."""
+        old = [s for s in self.segments if s["last"] < day]
+        self.segments = [s for s in self.segments if s["last"] >= day]
+        self.save()
+        for segment in old:
+            try:
+                os.remove(self.segment_path(segment))
+            except FileNotFoundError:
+                pass
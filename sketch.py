@@ -0,0 +1,92 @@
+"""
+    File name: sketch.py
+    Author: Emek Kırarslan (bozbulanik)
+    License: GNU-GPLv3
+"""
+
+import heapq
+from itertools import count as counter
+
+KEY_SKETCH_CAPACITY = 256
+APP_SKETCH_CAPACITY = 64
+
+
+class SpaceSaving:
+    """Space-Saving heavy hitter sketch, at most capacity items in memory.
+
+    Every tracked count is an upper bound that overestimates the true count by at most
+    errors[item], and an untracked item was seen at most min_count() times.
+
+    The smallest item is found through a lazy min-heap of (count, order, item) entries:
+    counts only grow, so an entry is only refreshed when it reaches the top with a stale
+    count and an eviction costs O(log capacity) amortized. The heap is rebuilt from counts
+    when it is None, after merge() or after counts were filled in directly (journal replay).
+    """
+    def __init__(self, capacity=KEY_SKETCH_CAPACITY):
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+        self.heap = None
+        self.order = counter()
+
+    def add(self, item, count=1):
+        counts = self.counts
+        if item in counts:
+            counts[item] += count
+        elif len(counts) < self.capacity:
+            counts[item] = count
+            self.errors[item] = 0
+            if self.heap is not None:
+                heapq.heappush(self.heap, (count, next(self.order), item))
+        else:
+            # Replace the smallest item, its count is the new item's possible error
+            floor, _, smallest = heapq.heappop(self.smallest_entries())
+            del counts[smallest]
+            del self.errors[smallest]
+            counts[item] = floor + count
+            self.errors[item] = floor
+            heapq.heappush(self.heap, (floor + count, next(self.order), item))
+
+    def smallest_entries(self):
+        """The heap with an up to date entry of the smallest item on top."""
+        heap = self.heap
+        if heap is None:
+            order = self.order
+            heap = self.heap = [(c, next(order), item) for item, c in self.counts.items()]
+            heapq.heapify(heap)
+        counts = self.counts
+        while heap[0][0] != counts[heap[0][2]]:
+            _, _, item = heap[0]
+            heapq.heapreplace(heap, (counts[item], next(self.order), item))
+        return heap
+
+    def min_count(self):
+        # Also called on the active epoch by snapshots, so it leaves the heap to the listener thread
+        if len(self.counts) < self.capacity:
+            return 0
+        return min(self.counts.values(), default=0)
+
+    def merge(self, other):
+        """Merges another sketch in, keeping the error bounds (Agarwal et al., mergeable summaries)."""
+        own_floor, other_floor = self.min_count(), other.min_count()
+        counts, errors = {}, {}
+        for item in self.counts.keys() | other.counts.keys():
+            counts[item] = self.counts.get(item, own_floor) + other.counts.get(item, other_floor)
+            errors[item] = self.errors.get(item, own_floor) + other.errors.get(item, other_floor)
+        kept = sorted(counts, key=counts.get, reverse=True)[:self.capacity]
+        self.counts = {item: counts[item] for item in kept}
+        self.errors = {item: errors[item] for item in kept}
+        self.heap = None
+        return self
+
+    def items(self):
+        return self.counts.items()
+
+    def get(self, item, default=None):
+        return self.counts.get(item, default)
+
+    def __len__(self):
+        return len(self.counts)
+
+    def __contains__(self, item):
+        return item in self.counts
@@ -0,0 +1,592 @@
+"""
+    File name: storage.py
+    Author: Emek Kırarslan (bozbulanik)
+    License: GNU-GPLv3
+"""
+
+import contextlib
+import csv
+import os
+import sqlite3
+from abc import ABC, abstractmethod
+from functools import cached_property
+
+from records import LogRow, Totals, parse_counts, dump_counts, day_key, day_bounds, merge_dict
+from checkpoint import ReportCheckpoint, LogCursor
+from dayindex import DayIndex
+from segments import SegmentManifest, COMPRESSIONS, best_compression, compress_file, open_log_file
+
+CSV_HEADER = ['Log Date', 'Log Time', 'Left Click', 'Right Click', 'Middle Click', 'Keypress', 'Mouse Distance (meters)', 'Scroll Distance (delta accumulation)', 'Most Used Keys (presses)', 'Most Used Apps (seconds)', 'Key Count Errors', 'App Time Errors', 'Inter-key Latency (ms buckets)', 'Key Hold (ms buckets)', 'Typed Characters', 'Typing Seconds', 'Key Count Floor', 'App Time Floor']
+STORAGE_BACKENDS = ("csv", "sqlite")
+PARALLEL_SCAN_MIN_BYTES = 8 * 1024 * 1024  # Below this a process pool costs more than it saves
+
+
+class Storage(ABC):
+    """Where logged intervals go. Backends implement append(), rows() and totals().
+
+    new_rows() and cursor_is_valid() let readers such as the rollup tiers follow the log
+    incrementally through an opaque, JSON serializable cursor.
+    """
+    @abstractmethod
+    def append(self, row):
+        """Stores row, returns how many bytes that took (None when the backend cannot tell)."""
+
+    @abstractmethod
+    def rows(self):
+        pass
+
+    @abstractmethod
+    def new_rows(self, cursor=None):
+        """Yields (row, cursor) for each row after cursor, None meaning the start of the log."""
+
+    @abstractmethod
+    def cursor_is_valid(self, cursor):
+        pass
+
+    @abstractmethod
+    def delete_before(self, day):
+        """Drops the raw rows logged before day."""
+
+    def totals(self, jobs=None, since=None, until=None):
+        start, end = day_bounds(since, until)
+        totals = Totals()
+        for row in self.rows():
+            if (start is None or row.timestamp >= start) and (end is None or row.timestamp < end):
+                totals.add(row)
+        return totals
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def compress_segments(self, lock=None):
+        """Compresses rotated data that is still plain, for backends that rotate. Returns the files written."""
+        return []
+
+    def export_csv(self, path):
+        with open(path, 'w', newline='') as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(CSV_HEADER)
+            for row in self.rows():
+                writer.writerow(row_to_csv(row))
+
+    def close(self):
+        pass
+
+
+def row_to_csv(row):
+    return [
+        row.log_date,
+        row.log_time,
+        row.left_click,
+        row.right_click,
+        row.middle_click,
+        row.keypress,
+        row.mouse_distance,
+        row.scroll_distance,
+        dump_counts(row.key_counts),
+        dump_counts(row.app_counts),
+        dump_counts(row.key_errors),
+        dump_counts(row.app_errors),
+        dump_counts(row.inter_key),
+        dump_counts(row.key_hold),
+        row.typed_chars,
+        row.typing_seconds,
+        row.key_floor,
+        row.app_floor,
+    ]
+
+
+def row_from_csv(cells):
+    # Rows written before the sketches have no error columns, before the rhythm histograms no timing
+    # columns and before the floors no floor columns
+    return LogRow(cells[0], cells[1], int(cells[2]), int(cells[3]), int(cells[4]), int(cells[5]),
+                  float(cells[6]), float(cells[7]), parse_counts(cells[8]), parse_counts(cells[9]),
+                  parse_counts(cells[10]) if len(cells) > 10 else None,
+                  parse_counts(cells[11]) if len(cells) > 11 else None,
+                  parse_counts(cells[12]) if len(cells) > 12 else None,
+                  parse_counts(cells[13]) if len(cells) > 13 else None,
+                  int(cells[14]) if len(cells) > 14 else 0,
+                  float(cells[15]) if len(cells) > 15 else 0.0,
+                  int(cells[16]) if len(cells) > 16 else 0,
+                  float(cells[17]) if len(cells) > 17 else 0.0)
+
+
+def row_from_line(line):
+    return row_from_csv(next(csv.reader([line.decode('utf-8')])))
+
+
+def read_lines(log_file, offset):
+    """Yields (line, start, end) for every complete line of a binary file from offset on."""
+    log_file.seek(offset)
+    start = offset
+    for line in log_file:
+        if not line.endswith(b"\n"):
+            break  # Row is still being written
+        end = start + len(line)
+        yield line, start, end
+        start = end
+
+
+def reduce_range(path, start, end=None, since=None, until=None):
+    """Worker of the parallel scan, returns the Totals of the rows in [start, end) and the last row.
+
+    since/until (YYYY-MM-DD keys, inclusive) filter rows by day, for segments that only
+    partly overlap a requested range.
+    """
+    totals = Totals()
+    last = None
+    with open_log_file(path) as log_file:
+        for line, line_start, line_end in read_lines(log_file, start):
+            if end is not None and line_start >= end:
+                break
+            last = (line, line_start, line_end)
+            if line_start == 0:  # Header
+                continue
+            if since or until:
+                day = day_key(line[:10].decode('utf-8'))
+                if (since and day < since) or (until and day > until):
+                    continue
+            totals.add(row_from_line(line))
+    return totals, last
+
+
+def split_ranges(log_file, start, end, jobs):
+    """Splits [start, end) of a binary file into at most jobs newline aligned ranges."""
+    bounds = [start]
+    size = (end - start) // jobs
+    for i in range(1, jobs):
+        log_file.seek(start + i * size)
+        log_file.readline()  # Move to the start of the next row
+        bound = min(log_file.tell(), end)
+        if bound > bounds[-1]:
+            bounds.append(bound)
+    if end > bounds[-1]:
+        bounds.append(end)
+    return list(zip(bounds, bounds[1:]))
+
+
+class CsvStorage(Storage):
+    """log.csv plus its rotated, compressed segments.
+
+    Only the active log.csv is appended to. It is rotated per month or by size into a
+    segment listed in the manifest, and every reader goes across segments. Rotation only
+    renames the file, compress_segments() compresses it later off the append path.
+    """
+    def __init__(self, path, rotate="month", rotate_size=None, compression=None):
+        self.path = path
+        self.checkpoint_path = path + ".rollup"
+        self.index = DayIndex(path + ".idx")
+        self.index_synced = False
+        self.manifest = SegmentManifest(path + ".manifest.json")
+        self.rotate = rotate
+        self.rotate_size = rotate_size
+        self.compression = compression or best_compression()
+        self.finish_rotation()
+
+    def exists(self):
+        return os.path.exists(self.path) or bool(self.manifest.segments)
+
+    def sync_index(self, log_file):
+        if self.index_synced:
+            return
+        if not self.index.load() or not self.index.is_valid_for(log_file):
+            self.index.rebuild((day_key(line[:10].decode('utf-8')), start)
+                               for line, start, _ in read_lines(log_file, 0) if start != 0)
+        self.index_synced = True
+
+    def should_rotate(self, row):
+        if self.rotate == "never" or not os.path.exists(self.path) or not self.index.days:
+            return False
+        if self.rotate == "size":
+            return os.path.getsize(self.path) >= self.rotate_size
+        return self.index.days[0][:7] != day_key(row.log_date)[:7]
+
+    def rotate_segment(self):
+        """Moves the active log into a new, still plain segment and starts an empty one."""
+        first, last = self.index.days[0], self.index.days[-1]
+        name, ext = os.path.splitext(os.path.basename(self.path))
+        file = f"{name}-{self.manifest.generation:04d}-{first}{ext}"
+        self.manifest.add(file, first, last, os.path.getsize(self.path))
+        self.manifest.save()
+        os.replace(self.path, self.manifest.segment_path(self.manifest.segments[-1]))
+        self.index.rebuild([])
+
+    def finish_rotation(self):
+        # A crash between saving the manifest and moving the active log leaves it in place
+        if not self.manifest.segments or not os.path.exists(self.path):
+            return
+        segment = self.manifest.segments[-1]
+        if segment["generation"] == self.manifest.generation - 1 and os.path.getsize(self.path) == segment["bytes"]:
+            segment_path = self.manifest.segment_path(segment)
+            if os.path.exists(segment_path):
+                os.remove(self.path)  # Rotated by a version that compressed right away
+            else:
+                os.replace(self.path, segment_path)
+
+    def compress_segments(self, lock=None):
+        """Compresses the plain segments left by rotate_segment().
+
+        The compression runs outside lock, only the manifest update takes it, so appends
+        (which hold the same lock in the daemon) never wait for a whole segment to compress.
+        Readers in other processes that still have the old manifest reload it when the plain
+        segment is gone, see open_source() and scan().
+        """
+        lock = lock or contextlib.nullcontext()
+        suffix = COMPRESSIONS[self.compression]
+        written = []
+        with lock:
+            plain = [dict(s) for s in self.manifest.segments if not s["file"].endswith(tuple(COMPRESSIONS.values()))]
+        for segment in plain:
+            plain_path = self.manifest.segment_path(segment)
+            file = segment["file"] + suffix
+            compress_file(plain_path, os.path.join(self.manifest.directory, file), self.compression)
+            with lock:
+                current = self.manifest.get(segment["generation"])
+                if current is None or current["file"] != segment["file"]:
+                    os.remove(os.path.join(self.manifest.directory, file))  # Compacted away meanwhile
+                    continue
+                current["file"] = file
+                self.manifest.save()
+            os.remove(plain_path)
+            written.append(file)
+        return written
+
+    def append(self, row):
+        if os.path.exists(self.path):
+            with open(self.path, 'rb') as log_file:
+                self.sync_index(log_file)
+            if self.should_rotate(row):
+                self.rotate_segment()
+        file_exists = os.path.exists(self.path)
+
+        with open(self.path, 'a', newline='') as csv_file:
+            start = csv_file.tell()
+            writer = csv.writer(csv_file)
+            if not file_exists:
+                writer.writerow(CSV_HEADER)
+                self.index.rebuild([])
+                self.index_synced = True
+            csv_file.flush()
+            offset = csv_file.tell()
+            writer.writerow(row_to_csv(row))
+            csv_file.flush()
+            os.fsync(csv_file.fileno())  # The journal of the interval is dropped right after
+            written = csv_file.tell() - start
+        self.index.add(day_key(row.log_date), offset)
+        return written
+
+    def sources(self, generation=0, since=None, until=None):
+        """(generation, path) of every segment from generation on, then of the active log.
+
+        since/until (YYYY-MM-DD keys, inclusive) leave out the segments entirely outside them.
+        """
+        segments = self.manifest.overlapping(since, until) if since or until else self.manifest.segments
+        sources = [(s["generation"], self.manifest.segment_path(s)) for s in segments if s["generation"] >= generation]
+        if os.path.exists(self.path):
+            sources.append((self.manifest.generation, self.path))
+        return sources
+
+    def open_source(self, generation, path):
+        """Opens a file of sources(), following a segment compressed since the manifest was loaded."""
+        try:
+            return open_log_file(path)
+        except FileNotFoundError:
+            self.manifest.load()
+            segment = self.manifest.get(generation)
+            if segment is None:
+                raise
+            return open_log_file(self.manifest.segment_path(segment))
+
+    def rows(self):
+        for row, _ in self.new_rows():
+            yield row
+
+    def new_rows(self, cursor=None):
+        cursor = LogCursor.from_dict(cursor) if cursor else LogCursor()
+        for generation, path in self.sources(cursor.generation):
+            offset = cursor.offset if generation == cursor.generation else 0
+            with self.open_source(generation, path) as log_file:
+                for line, start, end in read_lines(log_file, offset):
+                    cursor.consume(line, start, end, generation)
+                    if start != 0:  # Header
+                        yield row_from_line(line), cursor.to_dict()
+
+    def cursor_is_valid(self, cursor):
+        if cursor is None:
+            return True
+        cursor = LogCursor.from_dict(cursor)
+        if cursor.generation < self.manifest.generation:
+            # Segments are immutable, they only have to still be there
+            segment = self.manifest.get(cursor.generation)
+            return segment is not None and cursor.offset <= segment["bytes"]
+        if cursor.generation > self.manifest.generation:
+            return False
+        if not os.path.exists(self.path):
+            return cursor.offset == 0
+        with open(self.path, 'rb') as log_file:
+            return cursor.is_valid_for(log_file)
+
+    def delete_before(self, day):
+        cutoff = day.isoformat()
+        self.manifest.remove_before(cutoff)
+        if os.path.exists(self.path):
+            tmp_path = self.path + ".tmp"
+            with open(self.path, 'rb') as log_file, open(tmp_path, 'wb') as kept:
+                for line, start, _ in read_lines(log_file, 0):
+                    if start == 0 or day_key(line[:10].decode('utf-8')) >= cutoff:
+                        kept.write(line)
+            os.replace(tmp_path, self.path)
+
+            self.index_synced = False
+            with open(self.path, 'rb') as log_file:
+                self.sync_index(log_file)
+
+        # Offsets moved, the full history now lives in the rollup tiers only
+        if os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+    def scan(self, cursor, since=None, until=None, jobs=None):
+        """Reduces every row after cursor into (generation, Totals, last row) partials.
+
+        Each compressed segment is one job, the active log is split into newline aligned
+        byte ranges. Jobs run in a process pool when there is enough to read.
+        """
+        try:
+            return self.scan_sources(cursor, since, until, jobs)
+        except FileNotFoundError:
+            # The tracker compressed or rotated a file since the manifest was loaded, nothing was kept yet
+            self.manifest.load()
+            return self.scan_sources(cursor, since, until, jobs)
+
+    def scan_sources(self, cursor, since=None, until=None, jobs=None):
+        tasks = []
+        size = 0
+        for generation, path in self.sources(cursor.generation, since, until):
+            offset = cursor.offset if generation == cursor.generation else 0
+            if path != self.path:
+                tasks.append((generation, path, offset, None))
+                size += os.path.getsize(path)
+                continue
+            with open(path, 'rb') as log_file:
+                end = log_file.seek(0, os.SEEK_END)
+                if since or until:
+                    self.sync_index(log_file)
+                    offset, end = self.index.byte_range(since, until, end)
+                    offset = max(offset, cursor.offset if generation == cursor.generation else 0)
+                size += end - offset
+                jobs_left = max(1, (jobs or os.cpu_count() or 1) - len(tasks))
+                for start, stop in split_ranges(log_file, offset, end, jobs_left):
+                    tasks.append((generation, path, start, stop))
+
+        if size < PARALLEL_SCAN_MIN_BYTES or len(tasks) < 2 or jobs == 1:
+            results = [reduce_range(path, start, stop, since, until) for _, path, start, stop in tasks]
+        else:
+            from concurrent.futures import ProcessPoolExecutor  # Costs ~30 ms to import, only large scans need it
+            with ProcessPoolExecutor(max_workers=min(len(tasks), jobs or os.cpu_count() or 1)) as executor:
+                results = list(executor.map(reduce_range, *zip(*[(path, start, stop, since, until) for _, path, start, stop in tasks])))
+        return [(task[0], totals, last) for task, (totals, last) in zip(tasks, results)]
+
+    def totals(self, jobs=None, since=None, until=None):
+        """Totals from the rollup checkpoint plus the rows appended since it was written.
+
+        New rows are streamed, split across jobs worker processes when there are enough of them.
+        A since/until day range skips the segments outside of it and seeks into the active log
+        through the day index instead of using the checkpoint.
+        """
+        if since or until:
+            totals = Totals()
+            for _, partial, _ in self.scan(LogCursor(), since and since.isoformat(), until and until.isoformat(), jobs):
+                totals.merge(partial)
+            return totals
+
+        checkpoint = ReportCheckpoint(self.checkpoint_path)
+        if not checkpoint.load() or not self.cursor_is_valid(checkpoint.cursor.to_dict()):
+            checkpoint.reset()
+
+        consumed = False
+        for generation, partial, last in self.scan(checkpoint.cursor, jobs=jobs):
+            checkpoint.totals.merge(partial)
+            if last is not None:
+                checkpoint.consume(*last, generation)
+                consumed = True
+        if consumed:
+            checkpoint.save()
+        return checkpoint.totals
+
+
+class SqliteStorage(Storage):
+    """Intervals keyed by epoch timestamp with normalized, interned key/app count tables."""
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS intervals (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ts INTEGER NOT NULL,
+            left_click INTEGER NOT NULL,
+            right_click INTEGER NOT NULL,
+            middle_click INTEGER NOT NULL,
+            keypress INTEGER NOT NULL,
+            mouse_distance REAL NOT NULL,
+            scroll_distance REAL NOT NULL,
+            typed_chars INTEGER NOT NULL DEFAULT 0,
+            typing_seconds REAL NOT NULL DEFAULT 0,
+            inter_key TEXT NOT NULL DEFAULT 'None',
+            key_hold TEXT NOT NULL DEFAULT 'None',
+            key_floor INTEGER NOT NULL DEFAULT 0,
+            app_floor REAL NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS intervals_ts ON intervals(ts);
+        CREATE TABLE IF NOT EXISTS keys (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+        CREATE TABLE IF NOT EXISTS apps (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+        CREATE TABLE IF NOT EXISTS key_counts (
+            interval_id INTEGER NOT NULL REFERENCES intervals(id),
+            key_id INTEGER NOT NULL REFERENCES keys(id),
+            count INTEGER NOT NULL,
+            error INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (interval_id, key_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS key_counts_key ON key_counts(key_id);
+        CREATE TABLE IF NOT EXISTS app_counts (
+            interval_id INTEGER NOT NULL REFERENCES intervals(id),
+            app_id INTEGER NOT NULL REFERENCES apps(id),
+            count REAL NOT NULL,
+            error REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (interval_id, app_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS app_counts_app ON app_counts(app_id);
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.interned = {"keys": {}, "apps": {}}
+
+    @cached_property
+    def db(self):
+        # Connecting creates the file, read-only commands check exists() first and never get here on a fresh directory
+        db = sqlite3.connect(self.path, check_same_thread=False)  # Compaction runs in its own thread
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=FULL")  # The journal of the interval is dropped right after a row is added
+        db.executescript(self.SCHEMA)
+        self.migrate(db)
+        return db
+
+    def migrate(self, db):
+        # Databases created before the sketches have no error columns
+        for count_table, column_type in (("key_counts", "INTEGER"), ("app_counts", "REAL")):
+            columns = [column[1] for column in db.execute(f"PRAGMA table_info({count_table})")]
+            if "error" not in columns:
+                db.execute(f"ALTER TABLE {count_table} ADD COLUMN error {column_type} NOT NULL DEFAULT 0")
+        # ...before the rhythm histograms no timing columns and before the floors no floor columns
+        columns = [column[1] for column in db.execute("PRAGMA table_info(intervals)")]
+        for column, definition in (("typed_chars", "INTEGER NOT NULL DEFAULT 0"), ("typing_seconds", "REAL NOT NULL DEFAULT 0"),
+                                   ("inter_key", "TEXT NOT NULL DEFAULT 'None'"), ("key_hold", "TEXT NOT NULL DEFAULT 'None'"),
+                                   ("key_floor", "INTEGER NOT NULL DEFAULT 0"), ("app_floor", "REAL NOT NULL DEFAULT 0")):
+            if column not in columns:
+                db.execute(f"ALTER TABLE intervals ADD COLUMN {column} {definition}")
+
+    def intern(self, table, name):
+        ids = self.interned[table]
+        id = ids.get(name)
+        if id is None:
+            self.db.execute(f"INSERT OR IGNORE INTO {table} (name) VALUES (?)", (name,))
+            id = self.db.execute(f"SELECT id FROM {table} WHERE name = ?", (name,)).fetchone()[0]
+            ids[name] = id
+        return id
+
+    def append(self, row):
+        pages = self.db.execute("PRAGMA page_count").fetchone()[0]
+        with self.db:
+            cursor = self.db.execute(
+                "INSERT INTO intervals (ts, left_click, right_click, middle_click, keypress, mouse_distance, scroll_distance, typed_chars, typing_seconds, inter_key, key_hold, key_floor, app_floor) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (row.timestamp, row.left_click, row.right_click, row.middle_click, row.keypress, row.mouse_distance, row.scroll_distance,
+                 row.typed_chars, row.typing_seconds, dump_counts(row.inter_key), dump_counts(row.key_hold), row.key_floor, row.app_floor))
+            interval_id = cursor.lastrowid
+            self.db.executemany("INSERT INTO key_counts (interval_id, key_id, count, error) VALUES (?, ?, ?, ?)",
+                                [(interval_id, self.intern("keys", k), c, row.key_errors.get(k, 0)) for k, c in row.key_counts.items()])
+            self.db.executemany("INSERT INTO app_counts (interval_id, app_id, count, error) VALUES (?, ?, ?, ?)",
+                                [(interval_id, self.intern("apps", a), c, row.app_errors.get(a, 0)) for a, c in row.app_counts.items()])
+        # Growth of the database, rows that fit into free pages count as nothing
+        return (self.db.execute("PRAGMA page_count").fetchone()[0] - pages) * self.db.execute("PRAGMA page_size").fetchone()[0]
+
+    def counts_of(self, interval_id, table, count_table, column):
+        counts, errors = {}, {}
+        for name, count, error in self.db.execute(
+                f"SELECT n.name, c.count, c.error FROM {count_table} c JOIN {table} n ON n.id = c.{column} WHERE c.interval_id = ?",
+                (interval_id,)):
+            counts[name] = count
+            if error:
+                errors[name] = error
+        return counts, errors
+
+    def rows(self):
+        for row, _ in self.new_rows():
+            yield row
+
+    def new_rows(self, cursor=None):
+        last_id = cursor["id"] if cursor else 0
+        for id, ts, *values, typed_chars, typing_seconds, inter_key, key_hold, key_floor, app_floor in self.db.execute(
+                "SELECT id, ts, left_click, right_click, middle_click, keypress, mouse_distance, scroll_distance, typed_chars, typing_seconds, inter_key, key_hold, key_floor, app_floor FROM intervals WHERE id > ? ORDER BY id", (last_id,)):
+            key_counts, key_errors = self.counts_of(id, "keys", "key_counts", "key_id")
+            app_counts, app_errors = self.counts_of(id, "apps", "app_counts", "app_id")
+            row = LogRow.from_timestamp(ts, *values, key_counts=key_counts, app_counts=app_counts,
+                                        key_errors=key_errors, app_errors=app_errors,
+                                        inter_key=parse_counts(inter_key), key_hold=parse_counts(key_hold),
+                                        typed_chars=typed_chars, typing_seconds=typing_seconds, key_floor=key_floor, app_floor=app_floor)
+            yield row, {"id": id}
+
+    def cursor_is_valid(self, cursor):
+        if cursor is None:
+            return True
+        seq = self.db.execute("SELECT seq FROM sqlite_sequence WHERE name = 'intervals'").fetchone()
+        return cursor["id"] <= (seq[0] if seq else 0)
+
+    def delete_before(self, day):
+        start, _ = day_bounds(day)
+        with self.db:
+            for count_table in ("key_counts", "app_counts"):
+                self.db.execute(f"DELETE FROM {count_table} WHERE interval_id IN (SELECT id FROM intervals WHERE ts < ?)", (start,))
+            self.db.execute("DELETE FROM intervals WHERE ts < ?", (start,))
+
+    def exists(self):
+        # A log exists once an interval was ever added (compaction may have deleted it since)
+        if not os.path.exists(self.path):
+            return False
+        return self.db.execute("SELECT 1 FROM sqlite_sequence WHERE name = 'intervals' AND seq > 0").fetchone() is not None
+
+    def totals(self, jobs=None, since=None, until=None):
+        start, end = day_bounds(since, until)
+        where, params = "WHERE ts >= ? AND ts < ?", (start if start is not None else float('-inf'), end if end is not None else float('inf'))
+        totals = Totals()
+        (totals.rows, totals.left_click, totals.right_click, totals.middle_click, totals.keypress,
+         totals.mouse_distance, totals.scroll_distance, totals.typed_chars, totals.typing_seconds, totals.key_floor, totals.app_floor) = self.db.execute(
+            f"SELECT COUNT(*), TOTAL(left_click), TOTAL(right_click), TOTAL(middle_click), TOTAL(keypress), TOTAL(mouse_distance), TOTAL(scroll_distance), TOTAL(typed_chars), TOTAL(typing_seconds), TOTAL(key_floor), TOTAL(app_floor) FROM intervals {where}", params).fetchone()
+        totals.left_click, totals.right_click = int(totals.left_click), int(totals.right_click)
+        totals.middle_click, totals.keypress = int(totals.middle_click), int(totals.keypress)
+        totals.typed_chars, totals.key_floor = int(totals.typed_chars), int(totals.key_floor)
+        for inter_key, key_hold in self.db.execute(f"SELECT inter_key, key_hold FROM intervals {where}", params):
+            merge_dict(totals.inter_key, parse_counts(inter_key))
+            merge_dict(totals.key_hold, parse_counts(key_hold))
+        # Intervals whose sketch did not track an item add their floor to its count and error, see merge_sketched()
+        for name, count, error, tracked_floor in self.db.execute(
+                f"SELECT k.name, SUM(c.count), SUM(c.error), TOTAL(i.key_floor) FROM key_counts c JOIN keys k ON k.id = c.key_id JOIN intervals i ON i.id = c.interval_id {where} GROUP BY c.key_id", params):
+            missing = totals.key_floor - int(tracked_floor)
+            totals.key_counts[name] = count + missing
+            if error + missing:
+                totals.key_errors[name] = error + missing
+        for name, count, error, tracked_floor in self.db.execute(
+                f"SELECT a.name, SUM(c.count), SUM(c.error), TOTAL(i.app_floor) FROM app_counts c JOIN apps a ON a.id = c.app_id JOIN intervals i ON i.id = c.interval_id {where} GROUP BY c.app_id", params):
+            missing = totals.app_floor - tracked_floor
+            totals.app_counts[name] = count + missing
+            if error + missing:
+                totals.app_errors[name] = error + missing
+        return totals
+
+    def close(self):
+        if "db" in vars(self):
+            self.db.close()
+
+
+def open_storage(log_dir, backend="csv", **csv_options):
+    """Opens a backend, csv_options (rotate, rotate_size, compression) only apply to CsvStorage."""
+    log_dir = log_dir or ""
+    if backend == "sqlite":
+        return SqliteStorage(os.path.join(log_dir, "tracker.db"))
+    return CsvStorage(os.path.join(log_dir, "log.csv"), **csv_options)
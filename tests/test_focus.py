@@ -0,0 +1,127 @@
+"""
+    File name: test_focus.py
+    Author: Emek Kırarslan (bozbulanik)
+    License: GNU-GPLv3
+
+    FocusWatcher against a real X server: starts Xvfb on a free display, plays the window
+    manager by setting _NET_ACTIVE_WINDOW and _NET_WM_PID, and checks the callbacks.
+    Skipped when Xvfb or python-xlib is missing. Run with: python -m unittest discover tests
+"""
+
+import os
+import queue
+import shutil
+import subprocess
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from focus import FocusWatcher, xdisplay
+
+CALLBACK_TIMEOUT = 5
+XVFB_START_TIMEOUT = 10
+
+
+def start_xvfb():
+    """Starts Xvfb on the first free display, returns (process, display name)."""
+    for number in range(90, 140):
+        if os.path.exists(f"/tmp/.X11-unix/X{number}") or os.path.exists(f"/tmp/.X{number}-lock"):
+            continue
+        process = subprocess.Popen(["Xvfb", f":{number}", "-screen", "0", "640x480x24", "-nolisten", "tcp"],
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        deadline = time.monotonic() + XVFB_START_TIMEOUT
+        while time.monotonic() < deadline and process.poll() is None:
+            try:
+                xdisplay.Display(f":{number}").close()
+                return process, f":{number}"
+            except Exception:
+                time.sleep(0.05)
+        process.kill()
+        process.wait()
+    raise RuntimeError("could not start Xvfb")
+
+
+@unittest.skipIf(xdisplay is None or shutil.which("Xvfb") is None, "needs Xvfb and python-xlib")
+class FocusWatcherTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.xvfb, cls.display_name = start_xvfb()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.xvfb.terminate()
+        cls.xvfb.wait()
+
+    def setUp(self):
+        from Xlib import X, Xatom
+        self.X, self.Xatom = X, Xatom
+        self.display = xdisplay.Display(self.display_name)
+        self.root = self.display.screen().root
+        self.NET_ACTIVE_WINDOW = self.display.intern_atom('_NET_ACTIVE_WINDOW')
+        self.NET_WM_PID = self.display.intern_atom('_NET_WM_PID')
+        self.NET_WM_NAME = self.display.intern_atom('_NET_WM_NAME')
+        self.UTF8_STRING = self.display.intern_atom('UTF8_STRING')
+
+        self.changes = queue.Queue()
+        self.watcher = FocusWatcher(self.changes.put, display_name=self.display_name)
+        self.watcher.start()
+        self.assertIsNone(self.next_change())  # Nothing is focused yet
+
+    def tearDown(self):
+        self.watcher.stop()
+        self.watcher.join(CALLBACK_TIMEOUT)
+        self.display.close()
+
+    def next_change(self):
+        try:
+            return self.changes.get(timeout=CALLBACK_TIMEOUT)
+        except queue.Empty:
+            self.fail("on_focus_change was not called")
+
+    def assert_no_change(self):
+        self.display.sync()
+        with self.assertRaises(queue.Empty):
+            self.changes.get(timeout=0.3)
+
+    def create_window(self, pid):
+        window = self.root.create_window(0, 0, 100, 100, 0, self.display.screen().root_depth)
+        window.change_property(self.NET_WM_PID, self.Xatom.CARDINAL, 32, [pid])
+        self.display.sync()
+        return window
+
+    def activate(self, window):
+        self.root.change_property(self.NET_ACTIVE_WINDOW, self.Xatom.WINDOW, 32, [window.id if window is not None else 0])
+        self.display.sync()
+
+    def test_switching_windows_reports_their_pids(self):
+        editor = self.create_window(1001)
+        browser = self.create_window(1002)
+        self.activate(editor)
+        self.assertEqual(self.next_change(), 1001)
+        self.activate(browser)
+        self.assertEqual(self.next_change(), 1002)
+        self.activate(None)
+        self.assertIsNone(self.next_change())
+
+    def test_title_change_of_the_active_window_reports_again(self):
+        terminal = self.create_window(2001)
+        self.activate(terminal)
+        self.assertEqual(self.next_change(), 2001)
+        # A program started inside the terminal changes only the title
+        terminal.change_property(self.NET_WM_NAME, self.UTF8_STRING, 8, b"vim notes.txt")
+        self.display.sync()
+        self.assertEqual(self.next_change(), 2001)
+
+    def test_inactive_windows_are_ignored(self):
+        active = self.create_window(3001)
+        background = self.create_window(3002)
+        self.activate(active)
+        self.assertEqual(self.next_change(), 3001)
+        background.change_property(self.NET_WM_NAME, self.UTF8_STRING, 8, b"new title")
+        self.assert_no_change()
+
+
+if __name__ == "__main__":
+    unittest.main()
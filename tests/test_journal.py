@@ -0,0 +1,149 @@
+"""
+    File name: test_journal.py
+    Author: Emek Kırarslan (bozbulanik)
+    License: GNU-GPLv3
+
+    Journal round trips and crash recovery, on files in a temporary directory.
+    Run with: python -m unittest discover tests
+"""
+
+import os
+import struct
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from counters import Epoch
+from journal import Journal, JOURNAL_MAGIC, MAX_SKETCH_ITEMS, RECORD_HEADER
+
+
+def make_epoch(keys=5, clicks=1, key_capacity=16):
+    epoch = Epoch(key_capacity=key_capacity)
+    epoch.key_press_count = keys
+    epoch.left_mouse_click_count = clicks
+    epoch.mouse_movement_distance = 0.25
+    epoch.typed_chars = keys
+    epoch.typing_seconds = 1.5
+    for i in range(keys):
+        epoch.key_counts.add(f"k{i % 3}")
+    epoch.app_counts.add("editor", 4.5)
+    epoch.inter_key.record(120)
+    epoch.key_hold.record(80)
+    return epoch
+
+
+class JournalTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "log.csv.journal")
+        self.journal = Journal(self.path, fsync_interval=0)
+        self.journal.open()
+
+    def tearDown(self):
+        self.journal.close()
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        self.journal.append(make_epoch(keys=5), logged_at=100.0)
+        self.journal.append(make_epoch(keys=4, clicks=2), logged_at=105.0)
+
+        epoch, logged_at = self.journal.replay(key_capacity=16)
+
+        self.assertEqual(logged_at, 105.0)
+        self.assertEqual(epoch.key_press_count, 9)
+        self.assertEqual(epoch.left_mouse_click_count, 3)
+        self.assertAlmostEqual(epoch.mouse_movement_distance, 0.5)
+        self.assertAlmostEqual(epoch.typing_seconds, 3.0)
+        self.assertEqual(dict(epoch.key_counts.items()), {"k0": 4, "k1": 3, "k2": 2})
+        self.assertEqual(dict(epoch.app_counts.items()), {"editor": 9.0})
+        self.assertEqual(epoch.inter_key.total(), 2)
+        self.assertEqual(epoch.key_hold.to_dict(), {str(bucket): 2 for bucket in make_epoch().key_hold.to_dict()})
+
+    def test_empty_journal_replays_nothing(self):
+        self.assertIsNone(self.journal.replay())
+
+    def test_missing_journal_replays_nothing(self):
+        self.assertIsNone(Journal(os.path.join(self.directory.name, "missing")).replay())
+
+    def test_truncated_last_record_is_dropped(self):
+        self.journal.append(make_epoch(keys=5), logged_at=100.0)
+        self.journal.append(make_epoch(keys=4), logged_at=105.0)
+        size = os.path.getsize(self.path)
+        os.truncate(self.path, size - 3)
+
+        epoch, logged_at = self.journal.replay()
+
+        self.assertEqual(logged_at, 100.0)
+        self.assertEqual(epoch.key_press_count, 5)
+
+    def test_truncated_record_header_is_dropped(self):
+        self.journal.append(make_epoch(keys=5), logged_at=100.0)
+        os.write(self.journal.fd, RECORD_HEADER.pack(100, 0)[:5])
+
+        epoch, _ = self.journal.replay()
+
+        self.assertEqual(epoch.key_press_count, 5)
+
+    def test_bit_flipped_last_record_is_dropped(self):
+        self.journal.append(make_epoch(keys=5), logged_at=100.0)
+        self.journal.append(make_epoch(keys=4), logged_at=105.0)
+        with open(self.path, 'r+b') as f:
+            f.seek(-1, os.SEEK_END)
+            last = f.read(1)
+            f.seek(-1, os.SEEK_END)
+            f.write(bytes([last[0] ^ 0x10]))
+
+        epoch, logged_at = self.journal.replay()
+
+        self.assertEqual(logged_at, 100.0)
+        self.assertEqual(epoch.key_press_count, 5)
+
+    def test_foreign_file_replays_nothing(self):
+        with open(self.path, 'wb') as f:
+            f.write(b"Date,Time\n")
+        self.assertIsNone(self.journal.replay())
+
+    def test_reset_drops_records(self):
+        self.journal.append(make_epoch(), logged_at=100.0)
+        self.journal.reset()
+
+        self.assertIsNone(self.journal.replay())
+        with open(self.path, 'rb') as f:
+            self.assertEqual(f.read(), JOURNAL_MAGIC)
+
+        self.journal.append(make_epoch(keys=2), logged_at=110.0)
+        epoch, logged_at = self.journal.replay()
+        self.assertEqual((epoch.key_press_count, logged_at), (2, 110.0))
+
+    def test_reopen_keeps_records(self):
+        self.journal.append(make_epoch(keys=5), logged_at=100.0)
+        self.journal.close()
+        self.journal.open()
+
+        epoch, _ = self.journal.replay()
+
+        self.assertEqual(epoch.key_press_count, 5)
+
+    def test_largest_sketch_round_trips(self):
+        epoch = Epoch(key_capacity=MAX_SKETCH_ITEMS)
+        for i in range(MAX_SKETCH_ITEMS):
+            epoch.key_counts.add(str(i), i % 7 + 1)
+        self.journal.append(epoch, logged_at=100.0)
+
+        replayed, _ = self.journal.replay(key_capacity=MAX_SKETCH_ITEMS)
+
+        self.assertEqual(len(replayed.key_counts), MAX_SKETCH_ITEMS)
+        self.assertEqual(replayed.key_counts.counts, epoch.key_counts.counts)
+
+    def test_sketch_over_the_limit_does_not_encode(self):
+        epoch = Epoch(key_capacity=MAX_SKETCH_ITEMS + 1)
+        for i in range(MAX_SKETCH_ITEMS + 1):
+            epoch.key_counts.add(str(i))
+        with self.assertRaises(struct.error):
+            self.journal.append(epoch)
+
+
+if __name__ == '__main__':
+    unittest.main()
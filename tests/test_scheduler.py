@@ -0,0 +1,189 @@
+"""
+    File name: test_scheduler.py
+    Author: Emek Kırarslan (bozbulanik)
+    License: GNU-GPLv3
+
+    Scheduler deadlines, alignment, overruns and call_soon() on an injected clock.
+    Run with: python -m unittest discover tests
+"""
+
+import os
+import sys
+import threading
+import time
+import unittest
+from datetime import datetime
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scheduler import Scheduler, seconds_to_boundary, ALIGN_SLACK
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def local_timestamp(hour, minute, second=0.0):
+    return datetime(2024, 5, 14, hour, minute).timestamp() + second
+
+
+class SchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.scheduler = Scheduler(clock=self.clock, sleep=self.clock.sleep)
+        self.calls = []
+
+    def record(self, name, duration=0.0):
+        def callback():
+            self.calls.append((name, self.clock.now))
+            self.clock.now += duration
+        return callback
+
+    def run_until(self, end):
+        while self.clock.now < end:
+            wait = self.scheduler.run_pending()
+            self.clock.sleep(min(wait, end - self.clock.now) if wait is not None else end - self.clock.now)
+
+    def test_jobs_run_in_deadline_order(self):
+        self.scheduler.add("slow", 3, self.record("slow"))
+        self.scheduler.add("fast", 2, self.record("fast"))
+
+        self.run_until(1006.5)
+
+        self.assertEqual(self.calls, [("fast", 1002.0), ("slow", 1003.0), ("fast", 1004.0),
+                                      ("slow", 1006.0), ("fast", 1006.0)])
+
+    def test_ties_run_in_the_order_jobs_were_added(self):
+        self.scheduler.add("b", 1, self.record("b"))
+        self.scheduler.add("a", 1, self.record("a"))
+
+        self.run_until(1001.5)
+
+        self.assertEqual([name for name, _ in self.calls], ["b", "a"])
+
+    def test_deadlines_do_not_drift(self):
+        self.scheduler.add("job", 1, self.record("job", duration=0.3))
+
+        self.run_until(1005.5)
+
+        self.assertEqual([at for _, at in self.calls], [1001.0, 1002.0, 1003.0, 1004.0, 1005.0])
+        self.assertEqual(self.scheduler.jobs["job"].overruns, 0)
+
+    def test_run_pending_returns_the_wait(self):
+        self.scheduler.add("job", 5, self.record("job"))
+
+        self.assertEqual(self.scheduler.run_pending(), 5)
+        self.clock.now += 2
+        self.assertEqual(self.scheduler.run_pending(), 3)
+        self.assertIsNone(Scheduler(clock=self.clock).run_pending())
+
+    def test_overruns_skip_missed_deadlines(self):
+        self.scheduler.add("job", 1, self.record("job", duration=3.5))
+
+        self.clock.now = 1001.0
+        self.scheduler.run_pending()
+        job = self.scheduler.jobs["job"]
+
+        self.assertEqual(job.overruns, 3)
+        self.assertEqual(job.deadline, 1005.0)
+        self.assertEqual(job.last_duration, 3.5)
+
+    def test_lag_is_measured_from_the_deadline(self):
+        self.scheduler.add("job", 2, self.record("job"))
+        self.clock.now = 1002.25
+
+        self.scheduler.run_pending()
+        stats = self.scheduler.stats()["job"]
+
+        self.assertEqual(stats["runs"], 1)
+        self.assertEqual(stats["last_lag"], 0.25)
+        self.assertEqual(stats["max_lag"], 0.25)
+        self.assertEqual(stats["mean_lag"], 0.25)
+
+    def test_call_soon_runs_before_due_jobs(self):
+        self.scheduler.add("job", 1, self.record("job"))
+        self.clock.now = 1001.0
+        self.scheduler.call_soon(self.record("first"))
+        self.scheduler.call_soon(self.record("second"))
+
+        self.scheduler.run_pending()
+
+        self.assertEqual([name for name, _ in self.calls], ["first", "second", "job"])
+        self.assertFalse(self.scheduler.soon)
+
+    def test_call_soon_from_callbacks_and_threads(self):
+        def chained():
+            self.scheduler.call_soon(self.record("chained"))
+        self.scheduler.call_soon(chained)
+        thread = threading.Thread(target=self.scheduler.call_soon, args=(self.record("thread"),))
+        thread.start()
+        thread.join()
+
+        self.scheduler.run_pending()
+
+        self.assertEqual([name for name, _ in self.calls], ["thread", "chained"])
+
+    def test_run_stops(self):
+        self.scheduler.add("job", 1, self.record("job"))
+        self.scheduler.add("stop", 3, self.scheduler.stop)
+
+        self.scheduler.run()
+
+        self.assertEqual(len(self.calls), 3)
+        self.assertFalse(self.scheduler.running)
+
+
+class AlignmentTest(unittest.TestCase):
+    def test_seconds_to_boundary(self):
+        self.assertEqual(seconds_to_boundary(1800, local_timestamp(10, 10)), 20 * 60)
+        self.assertEqual(seconds_to_boundary(1800, local_timestamp(10, 30)), 1800)
+        self.assertEqual(seconds_to_boundary(1800, local_timestamp(10, 59, 59.5)), 0.5)
+        self.assertEqual(seconds_to_boundary(3600, local_timestamp(23, 15)), 45 * 60)
+
+    def test_aligned_job_runs_on_the_half_hour(self):
+        clock = FakeClock()
+        scheduler = Scheduler(clock=clock, sleep=clock.sleep)
+        with mock.patch.object(time, "time", return_value=local_timestamp(10, 20)):
+            job = scheduler.add("flush", 1800, lambda: None, align=True)
+
+        self.assertEqual(job.deadline, clock.now + 10 * 60)
+
+    def test_aligned_job_run_early_waits_for_the_next_boundary(self):
+        clock = FakeClock()
+        scheduler = Scheduler(clock=clock, sleep=clock.sleep)
+        with mock.patch.object(time, "time", return_value=local_timestamp(10, 20)):
+            job = scheduler.add("flush", 1800, lambda: None, align=True)
+        clock.now = job.deadline - ALIGN_SLACK / 2
+        with mock.patch.object(time, "time", return_value=local_timestamp(10, 30) - ALIGN_SLACK / 2):
+            scheduler.run_pending()  # Not due on the monotonic clock yet
+            clock.now = job.deadline
+            scheduler.run_pending()
+
+        # Ran a hair before :30 on the wall clock, so the next run is at :00, not right away
+        self.assertEqual(job.runs, 1)
+        self.assertAlmostEqual(job.deadline, clock.now + 1800 + ALIGN_SLACK / 2)
+
+    def test_aligned_job_follows_wall_clock_jumps(self):
+        clock = FakeClock()
+        scheduler = Scheduler(clock=clock, sleep=clock.sleep)
+        with mock.patch.object(time, "time", return_value=local_timestamp(10, 20)):
+            job = scheduler.add("flush", 1800, lambda: None, align=True)
+        clock.now = job.deadline
+        # The wall clock jumped (suspend, NTP) to 11:05 meanwhile
+        with mock.patch.object(time, "time", return_value=local_timestamp(11, 5)):
+            scheduler.run_pending()
+
+        self.assertEqual(job.deadline, clock.now + 25 * 60)
+        self.assertEqual(job.overruns, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+"""
+    File name: test_sketch.py
+    Author: Emek Kırarslan (bozbulanik)
+    License: GNU-GPLv3
+
+    The error bounds SpaceSaving and records.merge_sketched document, checked against
+    exact counts of random skewed streams.
+    Run with: python -m unittest discover tests
+"""
+
+import os
+import random
+import sys
+import unittest
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from records import merge_sketched
+from sketch import SpaceSaving
+
+SEEDS = range(20)
+CAPACITY = 16
+
+
+def stream(rng, length=2000, distinct=200):
+    """Zipf-like item stream with integer weights, so some items are heavy and many are rare."""
+    weights = [1 / (rank + 1) for rank in range(distinct)]
+    return [(f"k{item}", rng.randint(1, 3)) for item in rng.choices(range(distinct), weights, k=length)]
+
+
+def sketch_of(items, capacity=CAPACITY):
+    sketch = SpaceSaving(capacity)
+    for item, count in items:
+        sketch.add(item, count)
+    return sketch
+
+
+def exact_of(items):
+    exact = Counter()
+    for item, count in items:
+        exact[item] += count
+    return exact
+
+
+class BoundsTestCase(unittest.TestCase):
+    def assertBounds(self, counts, errors, floor, exact):
+        """Counts are upper bounds, count - error lower bounds and a missing item was seen at most floor times."""
+        for item, count in counts.items():
+            self.assertGreaterEqual(count, exact[item], item)
+            self.assertLessEqual(count - errors.get(item, 0), exact[item], item)
+        for item, true_count in exact.items():
+            if item not in counts:
+                self.assertLessEqual(true_count, floor, item)
+
+
+class SpaceSavingTest(BoundsTestCase):
+    def test_exact_below_capacity(self):
+        sketch = sketch_of([("a", 2), ("b", 1), ("a", 1)])
+
+        self.assertEqual(dict(sketch.items()), {"a": 3, "b": 1})
+        self.assertEqual(sketch.errors, {"a": 0, "b": 0})
+        self.assertEqual(sketch.min_count(), 0)
+
+    def test_eviction_replaces_the_smallest(self):
+        sketch = sketch_of([("a", 5), ("b", 2), ("c", 3)], capacity=3)
+
+        sketch.add("d")
+
+        self.assertNotIn("b", sketch)
+        self.assertEqual((sketch.get("d"), sketch.errors["d"]), (3, 2))
+        self.assertEqual(sketch.min_count(), 3)
+
+    def test_bounds_of_one_sketch(self):
+        for seed in SEEDS:
+            with self.subTest(seed=seed):
+                items = stream(random.Random(seed))
+                sketch = sketch_of(items)
+
+                self.assertEqual(len(sketch), CAPACITY)
+                self.assertEqual(sum(c for _, c in sketch.items()), sum(c for _, c in items))
+                self.assertBounds(sketch.counts, sketch.errors, sketch.min_count(), exact_of(items))
+
+    def test_bounds_of_merged_sketches(self):
+        for seed in SEEDS:
+            with self.subTest(seed=seed):
+                rng = random.Random(seed)
+                parts = [stream(rng, length=rng.randint(5, 800)) for _ in range(6)]
+                merged = sketch_of(parts[0])
+                for part in parts[1:]:
+                    merged.merge(sketch_of(part))
+                # Adding after a merge goes through the rebuilt heap
+                extra = stream(rng, length=300)
+                for item, count in extra:
+                    merged.add(item, count)
+
+                self.assertLessEqual(len(merged), CAPACITY)
+                self.assertBounds(merged.counts, merged.errors, merged.min_count(),
+                                  exact_of([pair for part in parts + [extra] for pair in part]))
+
+    def test_merge_of_sketches_below_capacity_is_exact(self):
+        merged = sketch_of([("a", 1), ("b", 2)]).merge(sketch_of([("b", 1), ("c", 4)]))
+
+        self.assertEqual(dict(merged.items()), {"a": 1, "b": 3, "c": 4})
+        self.assertEqual(merged.errors, {"a": 0, "b": 0, "c": 0})
+
+
+class MergeSketchedTest(BoundsTestCase):
+    def test_bounds_of_merged_rows(self):
+        for seed in SEEDS:
+            with self.subTest(seed=seed):
+                rng = random.Random(seed)
+                parts = [stream(rng, length=rng.randint(5, 800)) for _ in range(8)]
+                counts, errors, floor = {}, {}, 0
+                floors = 0
+                for part in parts:
+                    sketch = sketch_of(part)
+                    # As a LogRow keeps them: only the non-zero errors
+                    floor = merge_sketched(counts, errors, floor, dict(sketch.counts),
+                                           {k: e for k, e in sketch.errors.items() if e}, sketch.min_count())
+                    floors += sketch.min_count()
+
+                self.assertEqual(floor, floors)
+                self.assertBounds(counts, errors, floor, exact_of([pair for part in parts for pair in part]))
+
+    def test_floor_covers_items_missing_from_one_side(self):
+        counts, errors = {"a": 10}, {}
+
+        floor = merge_sketched(counts, errors, 0, {"b": 7}, {"b": 3}, 3)
+
+        # "a" may have been seen up to 3 times in the second sketch, "b" never in the first
+        self.assertEqual(floor, 3)
+        self.assertEqual(counts, {"a": 13, "b": 7})
+        self.assertEqual(errors, {"a": 3, "b": 3})
+
+        floor = merge_sketched(counts, errors, floor, {"c": 4}, {}, 0)
+
+        self.assertEqual(floor, 3)
+        self.assertEqual(counts, {"a": 13, "b": 7, "c": 7})
+        self.assertEqual(errors, {"a": 3, "b": 3, "c": 3})
+
+
+if __name__ == '__main__':
+    unittest.main()
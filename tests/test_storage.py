@@ -0,0 +1,228 @@
+"""
+    File name: test_storage.py
+    Author: Emek Kırarslan (bozbulanik)
+    License: GNU-GPLv3
+
+    CsvStorage segment rotation, compression, the manifest and ranged reads.
+    Run with: python -m unittest discover tests
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from records import LogRow, Totals
+from segments import SegmentManifest
+from storage import CsvStorage, SqliteStorage
+
+START = datetime(2024, 1, 5, 10, 0)
+ROWS = 90
+ROW_SPACING = timedelta(hours=22)  # Rows from January to March
+
+
+def make_rows(count=ROWS, start=START):
+    return [LogRow.from_timestamp((start + i * ROW_SPACING).timestamp(), 1, 0, 0, 10 + i, 0.5, 1.0,
+                                  {"a": i + 1}, {"editor": 60.0}) for i in range(count)]
+
+
+def raw_totals(rows, since=None, until=None):
+    totals = Totals()
+    for row in rows:
+        day = row.datetime.date()
+        if (since is None or day >= since) and (until is None or day <= until):
+            totals.add(row)
+    return totals
+
+
+class SegmentTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "log.csv")
+        self.rows = make_rows()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def open(self, **options):
+        return CsvStorage(self.path, compression="gzip", **options)
+
+    def append(self, storage, rows):
+        for row in rows:
+            storage.append(row)
+
+    def files(self):
+        return sorted(os.listdir(self.directory.name))
+
+    def assertTotalsEqual(self, totals, expected):
+        self.assertEqual(totals.rows, expected.rows)
+        self.assertEqual(totals.keypress, expected.keypress)
+        self.assertEqual(totals.key_counts, expected.key_counts)
+
+    def assertReadsEverything(self, storage):
+        self.assertEqual([row.keypress for row in storage.rows()], [row.keypress for row in self.rows])
+        self.assertTotalsEqual(storage.totals(), raw_totals(self.rows))
+
+    def test_month_rotation(self):
+        storage = self.open(rotate="month")
+        self.append(storage, self.rows)
+
+        segments = storage.manifest.segments
+        self.assertEqual([(s["generation"], s["first"][:7], s["last"][:7]) for s in segments],
+                         [(0, "2024-01", "2024-01"), (1, "2024-02", "2024-02")])
+        self.assertEqual(storage.manifest.generation, 2)  # March is the active log
+        for segment in segments:
+            self.assertEqual(os.path.getsize(storage.manifest.segment_path(segment)), segment["bytes"])
+        self.assertReadsEverything(storage)
+
+    def test_size_rotation(self):
+        storage = self.open(rotate="size", rotate_size=2048)
+        self.append(storage, self.rows)
+
+        self.assertGreater(len(storage.manifest.segments), 3)
+        for earlier, later in zip(storage.manifest.segments, storage.manifest.segments[1:]):
+            self.assertLessEqual(earlier["last"], later["first"])
+        self.assertReadsEverything(storage)
+
+    def test_no_rotation(self):
+        storage = self.open(rotate="never")
+        self.append(storage, self.rows)
+
+        self.assertEqual(storage.manifest.segments, [])
+        self.assertReadsEverything(storage)
+
+    def test_compressed_segments_read_the_same(self):
+        storage = self.open(rotate="month")
+        self.append(storage, self.rows)
+        plain = self.files()
+
+        written = storage.compress_segments()
+
+        self.assertEqual(written, [s["file"] for s in storage.manifest.segments])
+        self.assertTrue(all(file.endswith(".gz") for file in written))
+        for file in written:
+            self.assertNotIn(file[:-3], self.files())
+        self.assertNotEqual(plain, self.files())
+        self.assertEqual(storage.compress_segments(), [])
+        self.assertReadsEverything(storage)
+        self.assertReadsEverything(self.open(rotate="month"))
+
+    def test_manifest_persists(self):
+        storage = self.open(rotate="month")
+        self.append(storage, self.rows)
+        storage.compress_segments()
+
+        manifest = SegmentManifest(self.path + ".manifest.json")
+
+        self.assertEqual(manifest.generation, storage.manifest.generation)
+        self.assertEqual(manifest.segments, storage.manifest.segments)
+        self.assertEqual(manifest.get(1), storage.manifest.segments[1])
+        self.assertIsNone(manifest.get(7))
+
+    def test_ranged_reads_skip_other_segments(self):
+        storage = self.open(rotate="month")
+        self.append(storage, self.rows)
+        storage.compress_segments()
+
+        sources = storage.sources(since="2024-02-03", until="2024-02-20")
+
+        self.assertEqual([generation for generation, _ in sources], [1, 2])  # February and the active log
+        for since, until in [(date(2024, 2, 3), date(2024, 2, 20)), (date(2024, 1, 20), date(2024, 3, 2)),
+                             (None, date(2024, 1, 31)), (date(2024, 3, 1), None)]:
+            with self.subTest(since=since, until=until):
+                self.assertTotalsEqual(storage.totals(since=since, until=until), raw_totals(self.rows, since, until))
+
+    def test_reader_with_a_stale_manifest(self):
+        tracker = self.open(rotate="month")
+        self.append(tracker, self.rows)
+        reader = self.open(rotate="month")
+        reader_rows = reader.new_rows()
+        next(reader_rows)
+
+        tracker.compress_segments()
+
+        self.assertTotalsEqual(reader.totals(), raw_totals(self.rows))
+        self.assertEqual(len(list(reader_rows)), ROWS - 1)
+        self.assertEqual(len(list(self.open(rotate="month").rows())), ROWS)
+
+    def test_finish_rotation_moves_the_active_log(self):
+        storage = self.open(rotate="month")
+        self.append(storage, self.rows[:10])
+        # A crash right after the manifest was saved, before the active log was moved
+        manifest = storage.manifest
+        manifest.add("log-0000-2024-01-05.csv", storage.index.days[0], storage.index.days[-1], os.path.getsize(self.path))
+        manifest.save()
+
+        storage = self.open(rotate="month")
+
+        self.assertFalse(os.path.exists(self.path))
+        self.assertIn("log-0000-2024-01-05.csv", self.files())
+        self.assertEqual([row.keypress for row in storage.rows()], [row.keypress for row in self.rows[:10]])
+
+    def test_finish_rotation_drops_an_already_rotated_log(self):
+        storage = self.open(rotate="month")
+        self.append(storage, self.rows[:10])
+        file = "log-0000-2024-01-05.csv"
+        with open(self.path, 'rb') as src, open(os.path.join(self.directory.name, file), 'wb') as dest:
+            dest.write(src.read())
+        storage.manifest.add(file, storage.index.days[0], storage.index.days[-1], os.path.getsize(self.path))
+        storage.manifest.save()
+
+        storage = self.open(rotate="month")
+
+        self.assertFalse(os.path.exists(self.path))
+        self.assertEqual(len(list(storage.rows())), 10)
+
+    def test_finish_rotation_keeps_a_newer_log(self):
+        storage = self.open(rotate="month")
+        self.append(storage, self.rows)
+
+        self.open(rotate="month")
+
+        self.assertTrue(os.path.exists(self.path))
+        self.assertEqual(len(list(self.open(rotate="month").rows())), ROWS)
+
+    def test_delete_before_drops_old_segments(self):
+        storage = self.open(rotate="month")
+        self.append(storage, self.rows)
+        storage.compress_segments()
+
+        storage.delete_before(date(2024, 2, 10))
+
+        self.assertEqual([s["generation"] for s in storage.manifest.segments], [1])
+        self.assertFalse(any(file.startswith("log-0000") for file in self.files()))
+
+
+class SqliteStorageTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "tracker.db")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_missing_database_is_not_created(self):
+        storage = SqliteStorage(self.path)
+
+        self.assertFalse(storage.exists())
+        storage.close()
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_exists_once_a_row_was_added(self):
+        storage = SqliteStorage(self.path)
+        rows = make_rows(3)
+        for row in rows:
+            storage.append(row)
+        storage.close()
+
+        storage = SqliteStorage(self.path)
+        self.assertTrue(storage.exists())
+        self.assertEqual(storage.totals().keypress, raw_totals(rows).keypress)
+        storage.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,213 @@
+"""
+    File name: test_tiers.py
+    Author: Emek Kırarslan (bozbulanik)
+    License: GNU-GPLv3
+
+    Rollup tiers against raw scans of a CSV log, and LogCursor invalidation.
+    Run with: python -m unittest discover tests
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from datetime import date, datetime, timedelta
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tiers
+from checkpoint import LogCursor
+from records import LogRow, Totals
+from storage import CsvStorage
+from tiers import RollupTiers
+
+START = datetime(2024, 1, 3, 9, 15)
+ROWS = 400
+ROW_SPACING = timedelta(hours=17)  # About 280 days, every hour of the day and a few empty days
+
+
+def make_rows(count=ROWS, start=START):
+    rows = []
+    for i in range(count):
+        timestamp = (start + i * ROW_SPACING).timestamp()
+        rows.append(LogRow.from_timestamp(timestamp, i % 3, i % 2, 0, 10 + i, i * 0.01, 1.0,
+                                          {"a": i % 5 + 1, f"k{i % 7}": 2}, {"editor": 30.0 + i}))
+    return rows
+
+
+def raw_totals(rows, since=None, until=None):
+    totals = Totals()
+    for row in rows:
+        day = row.datetime.date()
+        if (since is None or day >= since) and (until is None or day <= until):
+            totals.add(row)
+    return totals
+
+
+class TiersTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.storage = CsvStorage(os.path.join(self.directory.name, "log.csv"), rotate="never")
+        self.tiers = RollupTiers(self.storage.path + ".tiers.db")
+        self.rows = make_rows()
+
+    def tearDown(self):
+        self.tiers.close()
+        self.directory.cleanup()
+
+    def append(self, rows):
+        for row in rows:
+            self.storage.append(row)
+
+    def assertTotalsEqual(self, totals, expected):
+        self.assertEqual(totals.rows, expected.rows)
+        self.assertEqual(totals.keypress, expected.keypress)
+        self.assertEqual(totals.left_click, expected.left_click)
+        self.assertEqual(totals.right_click, expected.right_click)
+        self.assertAlmostEqual(totals.mouse_distance, expected.mouse_distance)
+        self.assertEqual(totals.key_counts, expected.key_counts)
+        self.assertEqual(totals.app_counts.keys(), expected.app_counts.keys())
+        for app, seconds in expected.app_counts.items():
+            self.assertAlmostEqual(totals.app_counts[app], seconds)
+
+    def test_sync_adds_every_row(self):
+        self.append(self.rows)
+
+        self.assertEqual(self.tiers.sync(self.storage), ROWS)
+        self.assertEqual(self.tiers.sync(self.storage), 0)
+        self.assertTotalsEqual(self.tiers.totals(), raw_totals(self.rows))
+
+    def test_sync_follows_appends(self):
+        self.append(self.rows[:150])
+        self.tiers.sync(self.storage)
+        self.append(self.rows[150:])
+
+        self.assertEqual(self.tiers.sync(self.storage), ROWS - 150)
+        self.assertTotalsEqual(self.tiers.totals(), raw_totals(self.rows))
+
+    def test_sync_in_batches(self):
+        self.append(self.rows)
+        with mock.patch.object(tiers, "PENDING_BUCKETS_LIMIT", 16):
+            with self.tiers.write_transaction():
+                added, more = self.tiers.sync_batch(self.storage)
+            self.assertTrue(more)
+            self.assertLess(added, ROWS)
+            self.assertEqual(added + self.tiers.sync(self.storage), ROWS)
+        self.assertTotalsEqual(self.tiers.totals(), raw_totals(self.rows))
+
+    def test_ranges_match_raw_scan(self):
+        self.append(self.rows)
+        self.tiers.sync(self.storage)
+        ranges = [
+            (date(2024, 2, 14), date(2024, 6, 9)),  # Daily edges around whole months
+            (date(2024, 3, 1), date(2024, 5, 31)),  # Whole months only
+            (date(2024, 4, 10), date(2024, 4, 20)),  # Inside one month
+            (date(2024, 7, 4), date(2024, 7, 4)),  # One day
+            (None, date(2024, 3, 15)),
+            (date(2024, 8, 20), None),
+            (date(2023, 6, 1), date(2030, 1, 1)),  # Beyond the log on both ends
+        ]
+        for since, until in ranges:
+            with self.subTest(since=since, until=until):
+                self.assertTotalsEqual(self.tiers.totals(since, until), raw_totals(self.rows, since, until))
+
+    def test_range_of_empty_tiers(self):
+        self.assertEqual(self.tiers.totals(date(2024, 1, 1), date(2024, 2, 1)).rows, 0)
+
+    def test_hourly_series_counts_every_row(self):
+        self.append(self.rows)
+        self.tiers.sync(self.storage)
+
+        series = self.tiers.series("hourly")
+
+        self.assertEqual(sum(totals.rows for _, totals in series), ROWS)
+        self.assertEqual([bucket for bucket, _ in series], sorted(bucket for bucket, _ in series))
+
+    def test_rewritten_log_rebuilds_tiers(self):
+        self.append(self.rows)
+        self.tiers.sync(self.storage)
+        os.remove(self.storage.path)
+        self.storage.index_synced = False
+        self.append(self.rows[:100])
+
+        self.tiers.sync(self.storage)
+
+        self.assertTotalsEqual(self.tiers.totals(), raw_totals(self.rows[:100]))
+
+    def test_compact_keeps_history_in_tiers(self):
+        self.append(self.rows)
+        today = (START + ROWS * ROW_SPACING).date()
+
+        cutoff = self.tiers.compact(self.storage, 60, today=today)
+
+        self.assertEqual(cutoff, today - timedelta(days=60))
+        self.assertEqual(self.tiers.compacted_before, cutoff)
+        kept = [row for row in self.rows if row.datetime.date() >= cutoff]
+        self.assertTotalsEqual(self.storage.totals(), raw_totals(kept))
+        self.assertTotalsEqual(self.tiers.totals(), raw_totals(self.rows))
+        since = date(2024, 2, 10)
+        self.assertTotalsEqual(self.tiers.totals(since=since), raw_totals(self.rows, since=since))
+
+        # Rows logged after the compaction are picked up from the cursor it left
+        later = make_rows(5, START + ROWS * ROW_SPACING)
+        self.append(later)
+        self.assertEqual(self.tiers.sync(self.storage), 5)
+        self.assertTotalsEqual(self.tiers.totals(), raw_totals(self.rows + later))
+
+    def test_rewrite_after_compaction_is_refused(self):
+        self.append(self.rows)
+        self.tiers.compact(self.storage, 60, today=(START + ROWS * ROW_SPACING).date())
+        os.remove(self.storage.path)
+        self.storage.index_synced = False
+        self.append(self.rows[:3])
+
+        with self.assertRaises(RuntimeError):
+            self.tiers.sync(self.storage)
+
+
+class LogCursorTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.storage = CsvStorage(os.path.join(self.directory.name, "log.csv"), rotate="never")
+        for row in make_rows(10):
+            self.storage.append(row)
+        self.cursor = None
+        for _, self.cursor in self.storage.new_rows():
+            pass
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_cursor_survives_appends(self):
+        self.storage.append(make_rows(1, START + 20 * ROW_SPACING)[0])
+
+        self.assertTrue(self.storage.cursor_is_valid(self.cursor))
+        self.assertEqual(len(list(self.storage.new_rows(self.cursor))), 1)
+
+    def test_cursor_is_invalid_after_truncation(self):
+        with open(self.storage.path, 'r+b') as f:
+            f.truncate(self.cursor["offset"] - 1)
+
+        self.assertFalse(self.storage.cursor_is_valid(self.cursor))
+
+    def test_cursor_is_invalid_after_rewrite(self):
+        with open(self.storage.path, 'rb') as f:
+            data = f.read()
+        last_row = data[self.cursor["last_row_start"]:]
+        with open(self.storage.path, 'wb') as f:
+            f.write(data[:self.cursor["last_row_start"]] + last_row.replace(b"/2024", b"/2025", 1) + b"x" * 8)
+
+        self.assertEqual(os.path.getsize(self.storage.path), self.cursor["offset"] + 8)
+        self.assertFalse(self.storage.cursor_is_valid(self.cursor))
+
+    def test_cursor_of_missing_log(self):
+        os.remove(self.storage.path)
+
+        self.assertFalse(self.storage.cursor_is_valid(self.cursor))
+        self.assertTrue(self.storage.cursor_is_valid(None))
+        self.assertTrue(self.storage.cursor_is_valid(LogCursor().to_dict()))
+
+
+if __name__ == '__main__':
+    unittest.main()
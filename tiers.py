@@ -0,0 +1,185 @@
+"""
+    File name: tiers.py
+    Author: Emek Kırarslan (bozbulanik)
+    License: GNU-GPLv3
+"""
+
+import json
+import sqlite3
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+from records import Totals, day_key
+
+TIERS = ("hourly", "daily", "monthly")
+PENDING_BUCKETS_LIMIT = 2048  # Buckets kept in memory before writing them out while rebuilding
+LOCK_TIMEOUT = 60  # Seconds to wait for the sync of another process (or a compaction) to commit
+
+
+def buckets_of(row):
+    day = day_key(row.log_date)
+    return {
+        "hourly": f"{day}T{row.log_time[:2]}",
+        "daily": day,
+        "monthly": day[:7],
+    }
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month(day):
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+class RollupTiers:
+    """Hourly, daily and monthly pre-aggregated Totals of a storage backend.
+
+    The tiers follow the storage through its cursor API, so each flush only adds the new
+    row and a missing or stale tier database is rebuilt from the raw rows automatically.
+    After compact() the tiers are the only complete copy of the compacted history.
+
+    The daemon and report processes both sync. Each batch reads the cursor, loads its buckets
+    and writes them back in one BEGIN IMMEDIATE transaction, so two processes never add the
+    same rows.
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS rollups (
+            tier TEXT NOT NULL,
+            bucket TEXT NOT NULL,
+            data TEXT NOT NULL,
+            PRIMARY KEY (tier, bucket)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL);
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.db = sqlite3.connect(path, timeout=LOCK_TIMEOUT, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(self.SCHEMA)
+
+    def get_meta(self, name, default=None):
+        row = self.db.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_meta(self, name, value):
+        self.db.execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, json.dumps(value)))
+
+    @property
+    def compacted_before(self):
+        day = self.get_meta("compacted_before")
+        return date.fromisoformat(day) if day else None
+
+    @contextmanager
+    def write_transaction(self):
+        """Takes the database write lock up front, reads inside see what the last writer committed."""
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.db.rollback()
+            raise
+        self.db.commit()
+
+    def load_bucket(self, tier, bucket):
+        row = self.db.execute("SELECT data FROM rollups WHERE tier = ? AND bucket = ?", (tier, bucket)).fetchone()
+        return Totals.from_dict(json.loads(row[0])) if row else Totals()
+
+    def write_buckets(self, pending, cursor):
+        self.db.executemany("INSERT OR REPLACE INTO rollups (tier, bucket, data) VALUES (?, ?, ?)",
+                            [(tier, bucket, json.dumps(totals.to_dict(), ensure_ascii=False, separators=(',', ':')))
+                             for (tier, bucket), totals in pending.items()])
+        self.set_meta("cursor", cursor)
+
+    def sync_batch(self, storage):
+        """Adds the rows after the cursor until PENDING_BUCKETS_LIMIT buckets are touched, call in a write transaction."""
+        cursor = self.get_meta("cursor")
+        if not storage.cursor_is_valid(cursor):
+            if self.compacted_before is not None:
+                raise RuntimeError(f"{storage.path} was rewritten after compaction, the rollup tiers can not be rebuilt from it.")
+            self.db.execute("DELETE FROM rollups")
+            cursor = None
+
+        pending = {}
+        added = 0
+        for row, cursor in storage.new_rows(cursor):
+            for tier, bucket in buckets_of(row).items():
+                totals = pending.get((tier, bucket))
+                if totals is None:
+                    totals = pending[(tier, bucket)] = self.load_bucket(tier, bucket)
+                totals.add(row)
+            added += 1
+            if len(pending) >= PENDING_BUCKETS_LIMIT:
+                break
+        if added:
+            self.write_buckets(pending, cursor)
+        return added, len(pending) >= PENDING_BUCKETS_LIMIT
+
+    def sync(self, storage):
+        """Adds every row the storage got since the last sync. Returns the number of rows added."""
+        if not storage.exists():
+            return 0
+        added = 0
+        more = True
+        while more:
+            # The lock is held per batch, a long rebuild does not stall the daemon's flush
+            with self.write_transaction():
+                batch, more = self.sync_batch(storage)
+            added += batch
+        return added
+
+    def sum_buckets(self, totals, tier, first, last):
+        for (data,) in self.db.execute("SELECT data FROM rollups WHERE tier = ? AND bucket BETWEEN ? AND ?", (tier, first, last)):
+            totals.merge(Totals.from_dict(json.loads(data)))
+
+    def totals(self, since=None, until=None):
+        """Totals of the days since..until (inclusive), whole months read from the monthly tier."""
+        totals = Totals()
+        if since is None and until is None:
+            self.sum_buckets(totals, "monthly", "", "~")
+            return totals
+
+        bounds = self.db.execute("SELECT MIN(bucket), MAX(bucket) FROM rollups WHERE tier = 'daily'").fetchone()
+        if bounds[0] is None:
+            return totals
+        since = max(since or date.min, date.fromisoformat(bounds[0]))
+        until = min(until or date.max, date.fromisoformat(bounds[1]))
+
+        day = since
+        while day <= until:
+            month_end = next_month(day) - timedelta(days=1)
+            if day == month_start(day) and month_end <= until:
+                self.sum_buckets(totals, "monthly", day.isoformat()[:7], day.isoformat()[:7])
+            else:
+                self.sum_buckets(totals, "daily", day.isoformat(), min(month_end, until).isoformat())
+            day = month_end + timedelta(days=1)
+        return totals
+
+    def series(self, tier, first="", last="~"):
+        """(bucket, Totals) pairs of a tier, e.g. for plotting activity over time."""
+        return [(bucket, Totals.from_dict(json.loads(data))) for bucket, data in self.db.execute(
+            "SELECT bucket, data FROM rollups WHERE tier = ? AND bucket BETWEEN ? AND ? ORDER BY bucket", (tier, first, last))]
+
+    def compact(self, storage, keep_days, today=None):
+        """Drops raw rows older than keep_days from the storage, they stay in the tiers."""
+        cutoff = (today or date.today()) - timedelta(days=keep_days)
+        self.sync(storage)
+        # A reader syncing between the delete and the new cursor would rebuild the tiers from the cut log
+        with self.write_transaction():
+            while self.sync_batch(storage)[1]:  # Rows appended since the sync above
+                pass
+            storage.delete_before(cutoff)
+            # The tiers already hold every row, continue from the end of the rewritten log
+            last_cursor = None
+            for _, last_cursor in storage.new_rows():
+                pass
+            self.set_meta("cursor", last_cursor)
+            compacted_before = self.compacted_before
+            if compacted_before is None or cutoff > compacted_before:
+                self.set_meta("compacted_before", cutoff.isoformat())
+        return cutoff
+
+    def close(self):
+        self.db.close()
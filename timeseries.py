@@ -0,0 +1,71 @@
+"""
+    File name: timeseries.py
+    Author: Emek Kırarslan (bozbulanik)
+    License: GNU-GPLv3
+"""
+
+from array import array
+from collections import deque
+
+TIME_SERIES_CAPACITY = 4096  # Points kept at most, older ones go first even inside the window
+
+
+class TimeSeries:
+    """(time, value) points of the last window seconds in fixed size ring buffers.
+
+    Points are numbered in append order. The min and max deques keep the numbers of the
+    points that can still become the window's minimum or maximum (monotonic deques), so
+    append, eviction and min()/max() are all amortised O(1).
+    """
+    def __init__(self, window=60, capacity=TIME_SERIES_CAPACITY):
+        self.window = window
+        self.capacity = capacity
+        self.times = array('d', [0.0] * capacity)
+        self.values = array('d', [0.0] * capacity)
+        self.first = 0  # Number of the oldest point kept
+        self.next = 0  # Number the next point gets
+        self.mins = deque()
+        self.maxs = deque()
+
+    def __len__(self):
+        return self.next - self.first
+
+    def append(self, t, value):
+        if self.next - self.first == self.capacity:
+            self.drop_oldest()
+        i = self.next % self.capacity
+        self.times[i] = t
+        self.values[i] = value
+        values, capacity = self.values, self.capacity
+        while self.mins and values[self.mins[-1] % capacity] >= value:
+            self.mins.pop()
+        self.mins.append(self.next)
+        while self.maxs and values[self.maxs[-1] % capacity] <= value:
+            self.maxs.pop()
+        self.maxs.append(self.next)
+        self.next += 1
+        self.evict(t)
+
+    def drop_oldest(self):
+        if self.mins and self.mins[0] == self.first:
+            self.mins.popleft()
+        if self.maxs and self.maxs[0] == self.first:
+            self.maxs.popleft()
+        self.first += 1
+
+    def evict(self, now):
+        """Drops the points older than the window."""
+        oldest = now - self.window
+        while self.first < self.next and self.times[self.first % self.capacity] < oldest:
+            self.drop_oldest()
+
+    def min(self):
+        return self.values[self.mins[0] % self.capacity] if self.mins else None
+
+    def max(self):
+        return self.values[self.maxs[0] % self.capacity] if self.maxs else None
+
+    def points(self):
+        for n in range(self.first, self.next):
+            i = n % self.capacity
+            yield self.times[i], self.values[i]
@@ -1,5 +1,11 @@
+import time
 import urwid
+from datetime import date, datetime, timedelta
 from plotter import *
+from storage import open_storage
+from tiers import RollupTiers
+from ipc import IpcClient, TrackerNotRunning
+from livefeed import LiveFeedReader
 
 class TerminalGraphWidget(urwid.WidgetWrap):
     def __init__(self, graph):
@@ -11,21 +17,34 @@ class TerminalGraphWidget(urwid.WidgetWrap):
         super().__init__(self.padding)
 
     def update(self):
-        canvas = "\n".join("".join(row).replace('\033[96m', '').replace('\033[0m', '') for row in self.graph.canvas)
-        self.text.set_text(canvas)
+        # An unchanged frame leaves the Text alone, so urwid reuses its cached canvas
+        if self.graph.render():
+            self.text.set_text(self.graph.markup())
 
 class LivePage(urwid.WidgetWrap):
+    """Last minute of activity from the running tracker's shared memory live feed, redrawn at 10 Hz."""
+    WINDOW = 60  # Seconds shown in the graphs
+    FRAME = 0.1
+    KEYS_REFRESH = 2.0  # Top keys come over the socket, not every frame
+
     def __init__(self):
+        self.feed = LiveFeedReader()
+        self.last_keys_refresh = 0.0
         self.text = urwid.Text("Live acitivities")
         
         # Graph setup
-        self.graph = TerminalGraph(title="Urwid Example", width=45, height=10, x_label="X", y_label="Value", x_divisions=5, y_divisions=8, x_min=0, x_max=15, y_min=0, y_max=15)
-        self.graph_widget = [TerminalGraphWidget(self.graph) for _ in range(4)]
+        self.graphs = [
+            (TerminalGraph(title="Keys / s", width=45, height=10, x_label="", y_label="keys", x_divisions=5, y_divisions=3), lambda s: s.keys),
+            (TerminalGraph(title="Clicks / s", width=45, height=10, x_label="", y_label="click", x_divisions=5, y_divisions=3), lambda s: s.clicks),
+            (TerminalGraph(title="Mouse cm / s", width=45, height=10, x_label="", y_label="cm", x_divisions=5, y_divisions=3), lambda s: s.mouse_distance * 100),
+            (TerminalGraph(title="Scroll / s", width=45, height=10, x_label="", y_label="delta", x_divisions=5, y_divisions=3), lambda s: s.scroll_distance),
+        ]
+        self.graph_widget = [TerminalGraphWidget(graph) for graph, _ in self.graphs]
         self.graph_grid = urwid.GridFlow(self.graph_widget, cell_width=50, h_sep=2, v_sep=1, align='left')
         
         # App pile with title and line box
         self.app_title = urwid.Text("Application Items")
-        self.app_texts = [urwid.Text(f"Item {i}") for i in range(1, 10)]
+        self.app_texts = [urwid.Text("") for i in range(1, 10)]
         self.app_pile = urwid.Pile([urwid.AttrMap(w, "list") for w in self.app_texts])
         
         # Combine app title and pile in a line box
@@ -33,7 +52,7 @@ class LivePage(urwid.WidgetWrap):
 
         # Key pile with title and line box
         self.key_title = urwid.Text("Key Items")
-        self.key_texts = [urwid.Text(f"Item {i}") for i in range(1, 10)]
+        self.key_texts = [urwid.Text("") for i in range(1, 10)]
         self.key_pile = urwid.Pile([urwid.AttrMap(w, "list") for w in self.key_texts])
         
         # Combine key title and pile in a line box
@@ -55,15 +74,46 @@ class LivePage(urwid.WidgetWrap):
         self.scrollable = urwid.Scrollable(self.padding)
         
         super().__init__(self.scrollable)
+
+    def set_texts(self, texts, lines):
+        for text, line in zip(texts, lines + [""] * len(texts)):
+            text.set_text(line)
+
     def update_graph(self, loop, user_data):
-        self.graph.clear()
-        x_range = (0, 2 * math.pi)
-        self.graph.plot_function(math.sin, x_range, x_shift=time.time(), y_shift=0)
-        self.graph.add_axes()
-        #self.graph.draw()
-        for x in self.graph_widget:
-            x.update()
-        loop.set_alarm_in(0.1, self.update_graph)
+        seconds = self.feed.seconds(self.WINDOW)
+        if not seconds:
+            self.text.set_text("Live acitivities - tracker is not running, start it with (tracker start).")
+        else:
+            self.text.set_text(f"Live acitivities - {seconds[-1].app}")
+        now = seconds[-1].second if seconds else 0
+        for (graph, value_of), widget in zip(self.graphs, self.graph_widget):
+            points = [(s.second - now, value_of(s)) for s in seconds]
+            graph.clear()
+            graph.x_min, graph.x_max = -self.WINDOW, 0
+            graph.y_min, graph.y_max = 0, max([y for _, y in points] + [1])
+            graph.plot_scatter(points, fixed=True)
+            graph.add_axes(time_chart=True)
+            widget.update()
+
+        app_seconds = {}
+        for s in seconds:
+            app_seconds[s.app] = app_seconds.get(s.app, 0) + 1
+        self.set_texts(self.app_texts, [f"{app} - {n}s" for app, n in sorted(app_seconds.items(), key=lambda x: x[1], reverse=True)])
+
+        if time.monotonic() - self.last_keys_refresh >= self.KEYS_REFRESH:
+            self.last_keys_refresh = time.monotonic()
+            self.refresh_keys()
+        loop.set_alarm_in(self.FRAME, self.update_graph)
+
+    def refresh_keys(self):
+        try:
+            with IpcClient() as client:
+                snapshot = client.request("top-keys", len(self.key_texts))
+        except TrackerNotRunning:
+            self.set_texts(self.key_texts, [])
+            return
+        key_counts = snapshot.get("totals", {}).get("key_counts", {})
+        self.set_texts(self.key_texts, [f"{key} - {count}" for key, count in key_counts.items()])
 
 
 class ReportType(urwid.WidgetWrap):
@@ -111,25 +161,96 @@ class ReportDetails(urwid.WidgetWrap):
 
 
 class TimelyStatistics(urwid.WidgetWrap):
-    def __init__(self, time):
-        t = urwid.Text(time)
-        f = urwid.Filler(t)
+    def __init__(self, time, storage=None, rollups=None, days=1):
+        self.time = time
+        self.storage = storage
+        self.rollups = rollups
+        self.days = days
+        self.text = urwid.Text(time)
+        f = urwid.Filler(self.text)
         p = urwid.Padding(f, align="center")
         super().__init__(p)
 
+    def refresh(self):
+        if self.storage is None or not self.storage.exists():
+            self.text.set_text(f"{self.time}\n\nNo logs yet.")
+            return
+        until = date.today() - timedelta(days=1)
+        since = until - timedelta(days=self.days - 1)
+        if self.rollups is not None:
+            # Whole months come from the monthly rollup, the rest from the daily one
+            self.rollups.sync(self.storage)
+            totals = self.rollups.totals(since=since, until=until)
+        else:
+            totals = self.storage.totals(since=since, until=until)
+        top_keys = sorted(totals.key_counts.items(), key=lambda x: x[1], reverse=True)[:5]
+        top_apps = sorted(totals.app_counts.items(), key=lambda x: x[1], reverse=True)[:5]
+        self.text.set_text("\n".join([
+            f"{self.time} ({since} - {until})",
+            "",
+            f"Left Mouse Click: {totals.left_click}",
+            f"Right Mouse Click: {totals.right_click}",
+            f"Middle Mouse Click: {totals.middle_click}",
+            f"Key Press: {totals.keypress}",
+            f"Mouse Movement: {totals.mouse_distance:.2f} meters",
+            f"Mouse Scroll: {totals.scroll_distance:.2f} px",
+            "",
+            "Most Used Keys: " + ", ".join(f"{k} ({v})" for k, v in top_keys),
+            "Most Used Apps: " + ", ".join(f"{a} ({int(v // 60)} min)" for a, v in top_apps),
+        ]))
 
-class ReportPage(urwid.WidgetWrap):
+
+class CurrentStatistics(urwid.WidgetWrap):
+    """The interval the running tracker has not logged yet, straight from its socket."""
     def __init__(self):
-        yesterday = TimelyStatistics("Yesterday")
-        lastweek = TimelyStatistics("Last Week")
-        lastmonth = TimelyStatistics("Last Month")
-        lastyear = TimelyStatistics("Last Year")
+        self.text = urwid.Text("Current Interval")
+        f = urwid.Filler(self.text)
+        p = urwid.Padding(f, align="center")
+        super().__init__(p)
+
+    def refresh(self):
+        try:
+            with IpcClient() as client:
+                snapshot = client.request("top-keys", 5)
+        except TrackerNotRunning:
+            self.text.set_text("Current Interval\n\nTracker is not running.")
+            return
+        if "error" in snapshot:
+            self.text.set_text(f"Current Interval\n\n{snapshot['error']}")
+            return
+        totals = snapshot["totals"]
+        top_apps = sorted(totals["app_counts"].items(), key=lambda x: x[1], reverse=True)[:5]
+        self.text.set_text("\n".join([
+            f"Current Interval (since {datetime.fromtimestamp(snapshot['since']).strftime('%H:%M')})",
+            "",
+            f"Left Mouse Click: {totals['left_click']}",
+            f"Right Mouse Click: {totals['right_click']}",
+            f"Middle Mouse Click: {totals['middle_click']}",
+            f"Key Press: {totals['keypress']}",
+            f"Mouse Movement: {totals['mouse_distance']:.2f} meters",
+            f"Mouse Scroll: {totals['scroll_distance']:.2f} px",
+            f"Typing Speed: {snapshot['live_wpm']:.0f} wpm",
+            "",
+            "Most Used Keys: " + ", ".join(f"{k} ({v})" for k, v in totals["key_counts"].items()),
+            "Most Used Apps: " + ", ".join(f"{a} ({int(v // 60)} min)" for a, v in top_apps),
+            f"Focused App: {snapshot['focused_app']}",
+        ]))
+
+
+class ReportPage(urwid.WidgetWrap):
+    def __init__(self, storage=None, rollups=None):
+        current = CurrentStatistics()
+        yesterday = TimelyStatistics("Yesterday", storage, rollups, days=1)
+        lastweek = TimelyStatistics("Last Week", storage, rollups, days=7)
+        lastmonth = TimelyStatistics("Last Month", storage, rollups, days=30)
+        lastyear = TimelyStatistics("Last Year", storage, rollups, days=365)
 
         detail2 = urwid.WidgetWrap(urwid.Pile([
             urwid.Text("Test2 Details"),
             urwid.Button("Perform Action")
         ]))
         self.report_types = [
+            ReportType("Current Interval", current),
             ReportType("Yesterday", yesterday),
             ReportType("Last Week", lastweek),
             ReportType("Last Month", lastmonth),
@@ -152,6 +273,8 @@ class ReportPage(urwid.WidgetWrap):
         super().__init__(columns)
         
     def show_details(self, detail_widget):
+        if isinstance(detail_widget, (TimelyStatistics, CurrentStatistics)):
+            detail_widget.refresh()
         self.detail_view.set_report_type(detail_widget)
 
 class FooterWidget(urwid.WidgetWrap):
@@ -166,9 +289,11 @@ class FooterWidget(urwid.WidgetWrap):
         self.footer_text_left.set_text(text)
          
 class TUI(object):
-    def __init__(self, log_dir, print_log):
+    def __init__(self, log_dir, print_log, storage="csv"):
+        self.storage = open_storage(log_dir, storage)
+        self.rollups = RollupTiers(self.storage.path + ".tiers.db")
         self.tab_names = ["Activity", "Reports"]
-        self.pages = [LivePage(), ReportPage()]
+        self.pages = [LivePage(), ReportPage(self.storage, self.rollups)]
         self.current_tab = 0
 
         self.header = self.build_header()
@@ -183,6 +308,10 @@ class TUI(object):
             ('list', 'light gray', 'black'),
             ("report_type", "light gray", "black"),
             ("report_type_selected", "black", "dark red"),
+            ("graph_cyan", "light cyan", "black"),
+            ("graph_red", "light red", "black"),
+            ("graph_green", "light green", "black"),
+            ("graph_yellow", "yellow", "black"),
         ]
 
     def build_header(self):